@@ -0,0 +1,175 @@
+"""User account documents and conflict-safe trade execution for the web app"""
+import copy
+import threading
+from collections import OrderedDict
+from datetime import datetime
+
+from metrics import counter, histogram
+from schema import now_ms
+
+TRADES = counter('trades_total', 'Executed trades', ['side'])
+for side in ('buy', 'sell'):
+    TRADES.labels(side)
+TRADE_ATTEMPTS = histogram('trade_attempts', 'Conditional write attempts per trade', buckets=(1, 2, 3, 5, 10))
+
+
+class TradeError(Exception):
+    """A trade that cannot execute (unknown user, not enough cash or shares)"""
+
+
+def ensure_user_fields(user_data):
+    """Ensure all required fields exist in user data"""
+    if 'portfolio' not in user_data:
+        user_data['portfolio'] = {}
+    if 'cash_balance' not in user_data:
+        user_data['cash_balance'] = 0.0
+    if 'total_portfolio_value' not in user_data:
+        user_data['total_portfolio_value'] = user_data['cash_balance']
+    if 'last_updated' not in user_data:
+        user_data['last_updated'] = now_ms()
+    return user_data
+
+
+def apply_buy(user_data, stock_name, quantity, price):
+    """Debit cash and add shares to a user document"""
+    if quantity <= 0:
+        raise TradeError('Quantity must be positive')
+    total_cost = price * quantity
+    if user_data['cash_balance'] < total_cost:
+        raise TradeError('Not enough cash')
+
+    # Update user's portfolio
+    if stock_name not in user_data['portfolio']:
+        user_data['portfolio'][stock_name] = {
+            'quantity': 0,
+            'current_price': price,
+            'total_value': 0
+        }
+
+    user_data['portfolio'][stock_name]['quantity'] += quantity
+    user_data['portfolio'][stock_name]['current_price'] = price
+    user_data['portfolio'][stock_name]['total_value'] = user_data['portfolio'][stock_name]['quantity'] * price
+
+    # Update cash balance
+    user_data['cash_balance'] -= total_cost
+    return total_cost
+
+
+def apply_sell(user_data, stock_name, quantity, price):
+    """Remove shares from a user document and credit the proceeds"""
+    if quantity <= 0:
+        raise TradeError('Quantity must be positive')
+    if stock_name not in user_data['portfolio'] or user_data['portfolio'][stock_name]['quantity'] < quantity:
+        raise TradeError('Not enough shares')
+    total_value = price * quantity
+
+    # Update portfolio
+    user_data['portfolio'][stock_name]['quantity'] -= quantity
+    user_data['portfolio'][stock_name]['total_value'] = user_data['portfolio'][stock_name]['quantity'] * price
+
+    # Remove stock if quantity is 0
+    if user_data['portfolio'][stock_name]['quantity'] == 0:
+        del user_data['portfolio'][stock_name]
+
+    # Update cash balance
+    user_data['cash_balance'] += total_value
+    return total_value
+
+
+def execute_trade(store, username, side, stock_name, quantity, price, max_attempts=10):
+    """Apply a buy or sell to users/<username> with a conditional write.
+
+    The document is re-read and the trade re-applied whenever another worker
+    wrote it first, so concurrent trades never overwrite each other. Returns
+    ``(transaction, stored document, attempts)``; raises TradeError or
+    ConflictError.
+    """
+    apply = apply_buy if side == 'buy' else apply_sell
+    result = {}
+
+    def update(user_data):
+        if user_data is None:
+            raise TradeError('User not found')
+        user_data = ensure_user_fields(user_data)
+        result['total'] = apply(user_data, stock_name, quantity, price)
+
+        # Update total portfolio value
+        portfolio_value = sum(stock['total_value'] for stock in user_data['portfolio'].values())
+        user_data['total_portfolio_value'] = user_data['cash_balance'] + portfolio_value
+        user_data['last_updated'] = now_ms()
+        user_data['revision'] = user_data.get('revision', 0) + 1
+        return user_data
+
+    user_data, attempts = store.transaction(f'users/{username}', update, max_attempts=max_attempts)
+    TRADES.labels(side).inc()
+    TRADE_ATTEMPTS.observe(attempts)
+    transaction = {
+        'type': side,
+        'stock': stock_name,
+        'quantity': quantity,
+        'price': price,
+        'total': result['total'],
+        'timestamp': datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+    }
+    return transaction, user_data, attempts
+
+
+def create_account(store, username, cash, max_attempts=10):
+    """Write a new users/<username> document unless one exists; returns it or raises TradeError"""
+
+    def create(user_data):
+        if user_data is not None:
+            raise TradeError(f'User {username} already exists')
+        return {
+            'username': username,
+            'cash_balance': cash,
+            'portfolio': {},
+            'total_portfolio_value': cash,
+            'last_updated': now_ms(),
+            'revision': 1
+        }
+
+    user_data, _ = store.transaction(f'users/{username}', create, max_attempts=max_attempts)
+    return user_data
+
+
+class DocumentCache:
+    """Per-worker copies of user documents, checked against users/<name>/revision.
+
+    Every write that changes an account's cash or holdings bumps its revision,
+    so a hit costs one small read of that counter instead of the whole
+    document. load(username) reads and prepares a document (or returns None);
+    callers get their own copy to modify.
+    """
+
+    def __init__(self, store, load, capacity=256):
+        self.store = store
+        self.load = load
+        self.capacity = capacity
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, username):
+        revision = self.store.get(f'users/{username}/revision')
+        with self._lock:
+            entry = self._entries.get(username)
+            if entry is not None and revision is not None and entry[0] == revision:
+                self._entries.move_to_end(username)
+                self.hits += 1
+                return copy.deepcopy(entry[1])
+            self.misses += 1
+
+        user_data = self.load(username)
+        with self._lock:
+            if user_data is None:
+                self._entries.pop(username, None)
+                return None
+            # Documents from before revisions existed are re-read until their next write
+            if user_data.get('revision') is not None:
+                self._entries[username] = (user_data['revision'], copy.deepcopy(user_data))
+                self._entries.move_to_end(username)
+                while len(self._entries) > self.capacity:
+                    self._entries.popitem(last=False)
+        return user_data
@@ -1,12 +1,27 @@
-from flask import Flask, render_template, request, redirect, url_for, flash, session
+from flask import Flask, render_template, request, redirect, url_for, flash, session, Response, g
 from flask_login import LoginManager, UserMixin, login_user, login_required, logout_user, current_user
 import firebase_admin
-from firebase_admin import credentials, db
+from firebase_admin import credentials
 from datetime import datetime
 import json
 import os
+import queue
+import threading
+import time
 import base64
+import hmac
+from concurrent.futures import ThreadPoolExecutor
 from dotenv import load_dotenv
+from storage import ConflictError, new_push_id, open_storage
+from accounts import DocumentCache, TradeError, create_account, ensure_user_fields, execute_trade
+from tick_history import MAX_OPEN_SEGMENTS, TickHistory, downsample
+from candles import RESOLUTIONS, bar_start, bar_dict
+from streaming import PriceBroadcaster, format_event
+from stock_cache import StockCache
+from heartbeat import HealthMonitor
+from ledger import history_page, migrate_legacy_transactions, record_transaction
+from schema import format_change, format_timestamp
+from metrics import CONTENT_TYPE, REGISTRY, histogram, track_cache
 
 # Load environment variables
 load_dotenv()
@@ -14,6 +29,35 @@ load_dotenv()
 app = Flask(__name__)
 app.secret_key = os.getenv('FLASK_SECRET_KEY', 'your-secret-key-here')
 
+# Stored numbers and epoch-ms times are formatted only when rendered
+app.add_template_filter(format_change, 'percent')
+app.add_template_filter(format_timestamp, 'timestamp')
+
+# Per-route latency; every worker process serves its own numbers at /metrics
+REQUEST_SECONDS = histogram('http_request_duration_seconds', 'Time to produce a response',
+                            ['method', 'route', 'status'])
+
+@app.before_request
+def start_request_timer():
+    g.request_started = time.perf_counter()
+
+def observe_request(status):
+    started = g.pop('request_started', None)
+    if started is not None:
+        route = request.url_rule.rule if request.url_rule else 'unmatched'
+        REQUEST_SECONDS.labels(request.method, route, status).observe(time.perf_counter() - started)
+
+@app.after_request
+def record_request_latency(response):
+    observe_request(response.status_code)
+    return response
+
+@app.teardown_request
+def record_failed_request(error):
+    # after_request is skipped when a view raises, so count those here as the 500s they became
+    if error is not None:
+        observe_request(500)
+
 # Initialize Firebase
 def initialize_firebase():
     try:
@@ -35,15 +79,41 @@ def initialize_firebase():
         print(f"Error initializing Firebase: {str(e)}")
         raise
 
-try:
-    cred = initialize_firebase()
-    firebase_admin.initialize_app(cred, {
-        'databaseURL': 'https://fakestocksim-default-rtdb.firebaseio.com'
-    })
-except Exception as e:
-    print(f"Failed to initialize Firebase: {str(e)}")
-    # You might want to handle this error differently in production
-    raise
+# Storage setup (STORAGE_BACKEND=memory or sqlite runs without Firebase)
+STORAGE_BACKEND = os.getenv('STORAGE_BACKEND', 'firebase')
+if STORAGE_BACKEND == 'firebase':
+    try:
+        cred = initialize_firebase()
+        firebase_admin.initialize_app(cred, {
+            'databaseURL': 'https://fakestocksim-default-rtdb.firebaseio.com'
+        })
+    except Exception as e:
+        print(f"Failed to initialize Firebase: {str(e)}")
+        # You might want to handle this error differently in production
+        raise
+store = open_storage(STORAGE_BACKEND)
+
+# Read-only view of the simulator's tick history
+tick_history = TickHistory(os.getenv('TICK_HISTORY_DIR', 'tick_history'),
+                           max_open=int(os.getenv('TICK_HISTORY_MAX_OPEN', MAX_OPEN_SEGMENTS)))
+
+# Updater health from the simulator's per-tick heartbeat
+health_monitor = HealthMonitor(store)
+
+# One shared upstream read of the stock table per worker, fanned out to every stream client.
+# An open stream holds a worker thread for as long as its tab stays open, so past
+# STREAM_MAX_CLIENTS per worker new clients get a 503 and poll /api/prices instead
+STREAM_MAX_CLIENTS = int(os.getenv('STREAM_MAX_CLIENTS', 8))
+price_broadcaster = PriceBroadcaster(lambda: stock_cache.get().by_name, max_clients=STREAM_MAX_CLIENTS)
+
+# Independent storage reads of one request run side by side on this pool
+read_pool = ThreadPoolExecutor(max_workers=int(os.getenv('STORAGE_READ_THREADS', 16)),
+                               thread_name_prefix='storage-read')
+
+def read_concurrently(**reads):
+    """Run independent zero-argument reads at once; {name: result}, raising the first error"""
+    futures = {name: read_pool.submit(read) for name, read in reads.items()}
+    return {name: future.result() for name, future in futures.items()}
 
 # Flask-Login setup
 login_manager = LoginManager()
@@ -55,45 +125,41 @@ class User(UserMixin):
         self.id = username
         self.data = user_data
 
-def ensure_user_fields(user_data):
-    """Ensure all required fields exist in user data"""
-    if 'portfolio' not in user_data:
-        user_data['portfolio'] = {}
-    if 'transactions' not in user_data:
-        user_data['transactions'] = []
-    if 'cash_balance' not in user_data:
-        user_data['cash_balance'] = 0.0
-    if 'total_portfolio_value' not in user_data:
-        user_data['total_portfolio_value'] = user_data['cash_balance']
-    if 'last_updated' not in user_data:
-        user_data['last_updated'] = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-    return user_data
+def read_user_document(username):
+    """Read users/<username>, moving any embedded transactions to the ledger"""
+    user_data = store.get(f'users/{username}')
+    if not user_data:
+        return None
+    # Older documents embed their transaction list; move it to the ledger
+    migrate_legacy_transactions(store, username, user_data)
+    return ensure_user_fields(user_data)
+
+# Recently used user documents, re-read only when their revision moves
+user_documents = DocumentCache(store, read_user_document,
+                               capacity=int(os.getenv('USER_DOCUMENT_CACHE_SIZE', 256)))
+track_cache('user_documents', user_documents)
 
 @login_manager.user_loader
 def load_user(username):
-    user_ref = db.reference(f'users/{username}')
-    user_data = user_ref.get()
+    # Called once per request; handlers reuse current_user.data instead of reading again
+    user_data = user_documents.get(username)
     if user_data:
-        user_data = ensure_user_fields(user_data)
         return User(username, user_data)
     return None
 
 @app.route('/')
 def index():
     # Get current stock prices
-    stocks_ref = db.reference('stocks')
-    stocks = stocks_ref.get() or {}
+    stocks = stock_cache.get().stocks
     return render_template('index.html', stocks=stocks)
 
 @app.route('/login', methods=['GET', 'POST'])
 def login():
     if request.method == 'POST':
         username = request.form['username']
-        user_ref = db.reference(f'users/{username}')
-        user_data = user_ref.get()
+        user_data = user_documents.get(username)
         
         if user_data:
-            user_data = ensure_user_fields(user_data)
             user = User(username, user_data)
             login_user(user)
             return redirect(url_for('dashboard'))
@@ -107,23 +173,13 @@ def register():
         username = request.form['username']
         starting_cash = 10000.00  # Fixed starting amount
         
-        # Check if user exists
-        user_ref = db.reference(f'users/{username}')
-        if user_ref.get():
+        # Create the user only if the name is free, even when two workers race for it
+        try:
+            new_user = create_account(store, username, starting_cash)
+        except (TradeError, ConflictError):
             flash('Username already exists')
             return redirect(url_for('register'))
         
-        # Create new user
-        new_user = {
-            'username': username,
-            'cash_balance': starting_cash,
-            'portfolio': {},
-            'total_portfolio_value': starting_cash,
-            'last_updated': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
-            'transactions': []
-        }
-        
-        user_ref.set(new_user)
         user = User(username, new_user)
         login_user(user)
         return redirect(url_for('dashboard'))
@@ -133,21 +189,7 @@ def register():
 def check_market_status():
     """Check if market should be open but isn't receiving updates"""
     try:
-        # Get market status from Firebase
-        market_status = db.reference('market_status').get()
-        if market_status == 'open':
-            # Check if we're getting updates
-            stocks_ref = db.reference('stocks')
-            stocks_data = stocks_ref.get() or {}
-            if not stocks_data:
-                return False
-            
-            # Check last update time
-            for stock_data in stocks_data.values():
-                last_updated = datetime.strptime(stock_data.get('last_updated', ''), '%Y-%m-%d %H:%M:%S')
-                if (datetime.now() - last_updated).total_seconds() > 60:  # No updates in last minute
-                    return False
-        return True
+        return health_monitor.is_healthy()
     except Exception as e:
         print(f"Error checking market status: {str(e)}")
         return False
@@ -155,8 +197,120 @@ def check_market_status():
 @app.route('/market-status')
 def market_status():
     """Market status check endpoint"""
-    is_healthy = check_market_status()
-    return {'status': 'healthy' if is_healthy else 'down'}
+    try:
+        return health_monitor.status()
+    except Exception as e:
+        print(f"Error checking market status: {str(e)}")
+        return {'status': 'down'}
+
+# Longest range one history request reads; older starts are moved up to fit
+HISTORY_MAX_DAYS = float(os.getenv('HISTORY_MAX_DAYS', 31))
+
+@app.route('/api/history/<stock_name>')
+def stock_history(stock_name):
+    """Price history for one stock, downsampled on the server"""
+    now_ms = int(datetime.now().timestamp() * 1000)
+    today_ms = int(datetime.combine(datetime.now().date(), datetime.min.time()).timestamp() * 1000)
+    try:
+        start = int(request.args.get('start', today_ms))
+        end = int(request.args.get('end', now_ms))
+        points = min(max(int(request.args.get('points', 500)), 3), 5000)
+    except ValueError:
+        return {'error': 'start, end and points must be integers'}, 400
+    if start < 0 or end < start:
+        return {'error': 'start and end must be epoch milliseconds with start <= end'}, 400
+
+    # Nothing is recorded after now, and each day in the range is a segment to open;
+    # a start after now is an empty range ending now, not a date past datetime's limits
+    end = min(end, now_ms)
+    start = min(max(start, end - int(HISTORY_MAX_DAYS * 86400 * 1000)), end)
+    name = from_firebase_name(stock_name)
+    timestamps, prices = tick_history.query(name, start, end)
+    total = len(timestamps)
+    timestamps, prices = downsample(timestamps, prices, points)
+    return {
+        'name': name,
+        'start': start,
+        'end': end,
+        'total_points': total,
+        'points': [[t, p] for t, p in zip(timestamps.tolist(), prices.tolist())]
+    }
+
+@app.route('/api/candles/<stock_name>')
+def stock_candles(stock_name):
+    """Completed OHLCV bars plus the bar in progress for one stock"""
+    resolution = request.args.get('resolution', '1m')
+    seconds = dict(RESOLUTIONS).get(resolution)
+    if seconds is None:
+        return {'error': f'resolution must be one of {", ".join(dict(RESOLUTIONS))}'}, 400
+    try:
+        limit = min(max(int(request.args.get('limit', 120)), 1), 1000)
+    except ValueError:
+        return {'error': 'limit must be an integer'}, 400
+
+    name = from_firebase_name(stock_name)
+    stored = store.query(f'candles/{resolution}/{to_firebase_name(name)}', limit_to_last=limit)
+    bars = [bar_dict(start, b['open'], b['high'], b['low'], b['close'], b['volume'])
+            for start, b in stored.items()]
+
+    # The bar being built lives in the simulator; rebuild its prices from the tick history
+    now = datetime.now().timestamp()
+    start = bar_start(now, seconds)
+    if not bars or bars[-1]['time'] < start:
+        _, prices = tick_history.query(name, start * 1000, int(now * 1000))
+        if len(prices):
+            bars.append(dict(bar_dict(start, prices[0], prices.max(), prices.min(), prices[-1], 0),
+                             partial=True))
+    return {'name': name, 'resolution': resolution, 'bars': bars[-limit:]}
+
+@app.route('/api/stream')
+def stream_prices():
+    """Server-Sent Events: a full snapshot, then only changed prices"""
+    subscription = price_broadcaster.subscribe()
+    if subscription is None:
+        return Response('Too many price streams, poll /api/prices instead\n', status=503,
+                        mimetype='text/plain', headers={'Retry-After': '30'})
+
+    def generate():
+        try:
+            yield format_event('snapshot', price_broadcaster.snapshot())
+            while True:
+                try:
+                    event, data = subscription.get(timeout=15)
+                except queue.Empty:
+                    yield ': keep-alive\n\n'
+                    continue
+                yield format_event(event, data)
+        finally:
+            price_broadcaster.unsubscribe(subscription)
+
+    return Response(generate(), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+@app.route('/api/prices')
+def current_prices():
+    """Current prices and changes, for clients that can't hold a stream open"""
+    return price_broadcaster.current()
+
+@app.route('/api/stream/stats')
+def stream_stats():
+    """Connected stream clients and upstream read counts for this worker"""
+    return price_broadcaster.stats()
+
+# /metrics answers only local scrapers, or ones sending "Authorization: Bearer
+# <METRICS_TOKEN>" when that is set; METRICS_ENABLED=0 removes it altogether
+METRICS_ENABLED = os.getenv('METRICS_ENABLED', '1') != '0'
+METRICS_TOKEN = os.getenv('METRICS_TOKEN')
+
+@app.route('/metrics')
+def metrics():
+    if METRICS_TOKEN:
+        allowed = hmac.compare_digest(request.headers.get('Authorization', ''), f'Bearer {METRICS_TOKEN}')
+    else:
+        allowed = request.remote_addr in ('127.0.0.1', '::1')
+    if not METRICS_ENABLED or not allowed:
+        return 'Not Found', 404
+    return Response(REGISTRY.render(), content_type=CONTENT_TYPE)
 
 @app.route('/market-down')
 def market_down():
@@ -166,28 +320,49 @@ def market_down():
 @app.route('/dashboard')
 @login_required
 def dashboard():
+    # The health check, the prices and the user's orders, triggers and
+    # notifications don't depend on each other, so read them all at once
+    username = current_user.id
+    reads = read_concurrently(
+        healthy=check_market_status,
+        snapshot=stock_cache.get,
+        orders=lambda: store.query(f'orders/{username}', limit_to_last=10),
+        triggers=lambda: store.query(f'triggers/{username}', limit_to_last=10),
+        notifications=lambda: store.query(f'notifications/{username}', limit_to_last=5))
+
     # Check market status first
-    if not check_market_status():
+    if not reads['healthy']:
         return redirect(url_for('market_down'))
         
-    # Get user's portfolio
-    user_ref = db.reference(f'users/{current_user.id}')
-    user_data = user_ref.get()
-    user_data = ensure_user_fields(user_data)
+    # Get user's portfolio, as loaded for this request
+    user_data = current_user.data
     
-    # Get current stock prices
-    stocks_ref = db.reference('stocks')
-    stocks_data = stocks_ref.get() or {}
+    # Current stock prices, already keyed by display name
+    snapshot = reads['snapshot']
+    stocks = snapshot.by_name
     
-    # Convert Firebase-safe names back to display format
-    stocks = {}
-    for firebase_name, stock_data in stocks_data.items():
-        display_name = from_firebase_name(firebase_name)
-        stocks[display_name] = stock_data
+    # Show holdings at the cached market prices, not the price of the last trade
+    for stock_name, position in user_data['portfolio'].items():
+        price = snapshot.prices.get(stock_name)
+        if price is not None:
+            position['current_price'] = price
+            position['total_value'] = position['quantity'] * price
+    user_data['total_portfolio_value'] = user_data['cash_balance'] + sum(
+        position['total_value'] for position in user_data['portfolio'].values())
+    
+    # Most recent limit/stop orders, newest first
+    orders = [dict(order, id=order_id) for order_id, order in reversed(list(reads['orders'].items()))]
+    
+    # Price triggers and the notifications they fired, newest first
+    triggers = [dict(trigger, id=trigger_id) for trigger_id, trigger in reversed(list(reads['triggers'].items()))]
+    notifications = list(reversed(list(reads['notifications'].values())))
     
     return render_template('dashboard.html', 
                          user=user_data,
-                         stocks=stocks)
+                         stocks=stocks,
+                         orders=orders,
+                         triggers=triggers,
+                         notifications=notifications)
 
 def to_firebase_name(stock_name):
     """Convert stock name to Firebase-safe format"""
@@ -197,127 +372,184 @@ def from_firebase_name(firebase_name):
     """Convert Firebase-safe name back to display format"""
     return firebase_name.replace("_", " ")
 
+# Shared snapshot of the stock table for this worker
+stock_cache = StockCache(lambda: store.get('stocks'), from_firebase_name,
+                         ttl=float(os.getenv('STOCK_CACHE_TTL', 1.0)))
+track_cache('stock_snapshot', stock_cache)
+
+# Trades never execute at a price read longer ago than this (seconds)
+TRADE_PRICE_MAX_AGE = float(os.getenv('TRADE_PRICE_MAX_AGE', 2.0))
+
+def record_execution(username, stock_name, quantity):
+    """Queue a trade for the simulator's candle volume and leaderboard"""
+    store.push('executions', {
+        'user': username,
+        'stock': stock_name,
+        'quantity': quantity,
+        'timestamp': int(datetime.now().timestamp() * 1000)
+    })
+
 @app.route('/buy', methods=['POST'])
 @login_required
 def buy():
+    return trade('buy')
+
+@app.route('/sell', methods=['POST'])
+@login_required
+def sell():
+    return trade('sell')
+
+def trade(side):
+    """Execute a market order at the cached price with a conflict-safe write"""
     stock_name = request.form['stock_name']
-    quantity = int(request.form['quantity'])
-    
-    # Convert to Firebase-safe name for lookup
-    firebase_name = to_firebase_name(stock_name)
+    try:
+        quantity = int(request.form['quantity'])
+    except ValueError:
+        flash('Quantity must be a whole number')
+        return redirect(url_for('dashboard'))
     
-    # Get current stock price
-    stocks_ref = db.reference(f'stocks/{firebase_name}')
-    stock_data = stocks_ref.get()
-    if not stock_data:
+    # Get current stock price, no older than the trade staleness limit
+    price = stock_cache.get(max_age=TRADE_PRICE_MAX_AGE).prices.get(stock_name)
+    if price is None:
         flash('Stock not found')
         return redirect(url_for('dashboard'))
     
-    price = float(stock_data['price'])
-    total_cost = price * quantity
-    
-    # Get user data
-    user_ref = db.reference(f'users/{current_user.id}')
-    user_data = user_ref.get()
-    user_data = ensure_user_fields(user_data)
-    
-    if user_data['cash_balance'] < total_cost:
-        flash('Not enough cash')
+    try:
+        transaction, _, _ = execute_trade(store, current_user.id, side, stock_name, quantity, price)
+    except TradeError as e:
+        flash(str(e))
+        return redirect(url_for('dashboard'))
+    except ConflictError:
+        flash('Your account is busy with another trade, please try again')
         return redirect(url_for('dashboard'))
-    
-    # Update user's portfolio
-    if stock_name not in user_data['portfolio']:
-        user_data['portfolio'][stock_name] = {
-            'quantity': 0,
-            'current_price': price,
-            'total_value': 0
-        }
-    
-    user_data['portfolio'][stock_name]['quantity'] += quantity
-    user_data['portfolio'][stock_name]['current_price'] = price
-    user_data['portfolio'][stock_name]['total_value'] = user_data['portfolio'][stock_name]['quantity'] * price
-    
-    # Update cash balance
-    user_data['cash_balance'] -= total_cost
     
     # Add transaction
-    transaction = {
-        'type': 'buy',
-        'stock': stock_name,
-        'quantity': quantity,
-        'price': price,
-        'total': total_cost,
-        'timestamp': datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-    }
-    user_data['transactions'].append(transaction)
+    record_transaction(store, current_user.id, transaction)
+    record_execution(current_user.id, stock_name, quantity)
     
-    # Update total portfolio value
-    portfolio_value = sum(stock['total_value'] for stock in user_data['portfolio'].values())
-    user_data['total_portfolio_value'] = user_data['cash_balance'] + portfolio_value
-    user_data['last_updated'] = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-    
-    # Save to Firebase
-    user_ref.set(user_data)
-    
-    flash(f'Successfully bought {quantity} shares of {stock_name}')
+    verb = 'bought' if side == 'buy' else 'sold'
+    flash(f'Successfully {verb} {quantity} shares of {stock_name}')
     return redirect(url_for('dashboard'))
 
-@app.route('/sell', methods=['POST'])
+@app.route('/orders', methods=['POST'])
 @login_required
-def sell():
-    stock_name = request.form['stock_name']
-    quantity = int(request.form['quantity'])
-    
-    # Get user data
-    user_ref = db.reference(f'users/{current_user.id}')
-    user_data = user_ref.get()
-    user_data = ensure_user_fields(user_data)
-    
-    if stock_name not in user_data['portfolio'] or user_data['portfolio'][stock_name]['quantity'] < quantity:
-        flash('Not enough shares')
+def place_order():
+    """Queue a limit or stop order for the simulator's matching engine"""
+    try:
+        order = {
+            'symbol': request.form['stock_name'],
+            'side': request.form['side'],
+            'kind': request.form['kind'],
+            'price': float(request.form['price']),
+            'quantity': int(request.form['quantity'])
+        }
+    except (KeyError, ValueError):
+        flash('Invalid order')
+        return redirect(url_for('dashboard'))
+    if order['side'] not in ('buy', 'sell') or order['kind'] not in ('limit', 'stop') \
+            or order['price'] <= 0 or order['quantity'] <= 0:
+        flash('Invalid order')
         return redirect(url_for('dashboard'))
     
-    # Convert to Firebase-safe name for lookup
-    firebase_name = to_firebase_name(stock_name)
-    
-    # Get current stock price
-    stocks_ref = db.reference(f'stocks/{firebase_name}')
-    stock_data = stocks_ref.get()
-    price = float(stock_data['price'])
-    total_value = price * quantity
-    
-    # Update portfolio
-    user_data['portfolio'][stock_name]['quantity'] -= quantity
-    user_data['portfolio'][stock_name]['total_value'] = user_data['portfolio'][stock_name]['quantity'] * price
-    
-    # Remove stock if quantity is 0
-    if user_data['portfolio'][stock_name]['quantity'] == 0:
-        del user_data['portfolio'][stock_name]
-    
-    # Update cash balance
-    user_data['cash_balance'] += total_value
-    
-    # Add transaction
-    transaction = {
-        'type': 'sell',
-        'stock': stock_name,
-        'quantity': quantity,
-        'price': price,
-        'total': total_value,
-        'timestamp': datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-    }
-    user_data['transactions'].append(transaction)
+    # The order id doubles as the request key, so requests are matched in time order
+    order_id = new_push_id()
+    store.update('', {
+        f'orders/{current_user.id}/{order_id}': dict(order, status='pending'),
+        f'order_requests/{order_id}': dict(order, action='place', owner=current_user.id)
+    })
+    flash(f"Placed {order['kind']} {order['side']} order for {order['quantity']} shares of {order['symbol']}")
+    return redirect(url_for('dashboard'))
+
+@app.route('/orders/<order_id>/cancel', methods=['POST'])
+@login_required
+def cancel_order(order_id):
+    """Ask the simulator to cancel one of the user's open orders"""
+    store.push('order_requests', {'action': 'cancel', 'order_id': order_id, 'owner': current_user.id})
+    flash('Cancel requested')
+    return redirect(url_for('dashboard'))
+
+@app.route('/triggers', methods=['POST'])
+@login_required
+def place_trigger():
+    """Queue a stop-loss, take-profit or price alert for the simulator's trigger index"""
+    try:
+        trigger = {
+            'symbol': request.form['stock_name'],
+            'kind': request.form['kind'],
+            'level': float(request.form['level']),
+            'quantity': int(request.form.get('quantity') or 0)
+        }
+    except (KeyError, ValueError):
+        flash('Invalid trigger')
+        return redirect(url_for('dashboard'))
+    if trigger['kind'] not in ('stop_loss', 'take_profit', 'alert') or trigger['level'] <= 0 \
+            or (trigger['kind'] != 'alert' and trigger['quantity'] <= 0):
+        flash('Invalid trigger')
+        return redirect(url_for('dashboard'))
     
-    # Update total portfolio value
-    portfolio_value = sum(stock['total_value'] for stock in user_data['portfolio'].values())
-    user_data['total_portfolio_value'] = user_data['cash_balance'] + portfolio_value
-    user_data['last_updated'] = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+    # Triggers share the order request queue, so they are taken in the same tick pass
+    trigger_id = new_push_id()
+    store.update('', {
+        f'triggers/{current_user.id}/{trigger_id}': dict(trigger, status='pending'),
+        f'order_requests/{trigger_id}': dict(trigger, action='trigger', owner=current_user.id)
+    })
+    flash(f"Set {trigger['kind'].replace('_', '-')} trigger on {trigger['symbol']} at ${trigger['level']:.2f}")
+    return redirect(url_for('dashboard'))
+
+@app.route('/triggers/<trigger_id>/cancel', methods=['POST'])
+@login_required
+def cancel_trigger(trigger_id):
+    """Ask the simulator to cancel one of the user's price triggers"""
+    store.push('order_requests', {'action': 'cancel_trigger', 'trigger_id': trigger_id, 'owner': current_user.id})
+    flash('Cancel requested')
+    return redirect(url_for('dashboard'))
+
+# The simulator publishes the top of its leaderboard every few seconds and every
+# account's rank about once a minute; each worker re-reads the top at most once
+# per LEADERBOARD_TTL seconds
+LEADERBOARD_TTL = float(os.getenv('LEADERBOARD_TTL', 5.0))
+published_leaderboard = {}
+leaderboard_lock = threading.Lock()
+leaderboard_loaded_at = None
+
+def current_leaderboard():
+    """The leaderboard document the simulator last published"""
+    global published_leaderboard, leaderboard_loaded_at
+    with leaderboard_lock:
+        if leaderboard_loaded_at is None or time.monotonic() - leaderboard_loaded_at >= LEADERBOARD_TTL:
+            published_leaderboard = store.get('leaderboard') or {}
+            leaderboard_loaded_at = time.monotonic()
+        return published_leaderboard
+
+@app.route('/leaderboard')
+@login_required
+def show_leaderboard():
+    """Top accounts by total value, plus the current user's rank"""
+    try:
+        count = min(max(int(request.args.get('count', 20)), 1), 100)
+    except ValueError:
+        count = 20
+    board = current_leaderboard()
+    top = [(i + 1, entry['user'], entry['value']) for i, entry in enumerate(board.get('top') or [])]
     
-    # Save to Firebase
-    user_ref.set(user_data)
+    # A rank in the top is fresher than the per-account ranks, so only look further down when needed
+    position = next(((rank, value) for rank, username, value in top if username == current_user.id), None)
+    if position is None:
+        mine = store.get(f'leaderboard_ranks/{current_user.id}')
+        position = (mine['rank'], mine['value']) if mine else None
     
-    flash(f'Successfully sold {quantity} shares of {stock_name}')
-    return redirect(url_for('dashboard'))
+    return render_template('leaderboard.html',
+                         leaders=top[:count],
+                         position=position,
+                         total=board.get('total', 0))
+
+@app.route('/history')
+@login_required
+def history():
+    """Transaction history, newest first, one page at a time"""
+    before = request.args.get('before')
+    transactions, next_cursor = history_page(store, current_user.id, before=before)
+    return render_template('history.html', transactions=transactions, next_cursor=next_cursor)
 
 @app.route('/logout')
 @login_required
@@ -0,0 +1,196 @@
+"""ASGI entry point: the Flask app served from an event loop.
+
+    uvicorn asgi:application --workers 4
+    gunicorn asgi:application -k uvicorn.workers.UvicornWorker --workers 4
+
+The loop accepts connections and moves bytes; each request runs the
+unchanged Flask app on a bounded pool of ASGI_THREADS threads per worker.
+A request waiting on storage round trips ties up one of those threads, not
+the worker, and the dashboard's independent reads run side by side on the
+app's read pool.
+
+The price stream is served on the loop itself: an open dashboard tab is one
+idle coroutine woken by the shared broadcaster, not a thread, so this mode
+takes any number of streams without STREAM_MAX_CLIENTS turning them away.
+"""
+import asyncio
+import io
+import os
+import queue
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from app import app, price_broadcaster
+from streaming import format_event
+
+# Seconds between keep-alive comments on an idle price stream
+STREAM_KEEPALIVE = 15.0
+
+
+def build_environ(scope, body):
+    """WSGI environ for one ASGI HTTP request"""
+    server = scope.get('server') or ('localhost', 80)
+    client = scope.get('client') or ('', 0)
+    root_path = scope.get('root_path', '')
+    path = scope['path']
+    if root_path and path.startswith(root_path):
+        path = path[len(root_path):]
+    environ = {
+        'REQUEST_METHOD': scope['method'],
+        'SCRIPT_NAME': root_path.encode('utf-8').decode('latin-1'),
+        'PATH_INFO': path.encode('utf-8').decode('latin-1'),
+        'QUERY_STRING': scope.get('query_string', b'').decode('latin-1'),
+        'SERVER_NAME': server[0],
+        'SERVER_PORT': str(server[1]),
+        'SERVER_PROTOCOL': f"HTTP/{scope.get('http_version', '1.1')}",
+        'REMOTE_ADDR': client[0],
+        'CONTENT_LENGTH': str(len(body)),
+        'wsgi.version': (1, 0),
+        'wsgi.url_scheme': scope.get('scheme', 'http'),
+        'wsgi.input': io.BytesIO(body),
+        'wsgi.errors': sys.stderr,
+        'wsgi.multithread': True,
+        'wsgi.multiprocess': True,
+        'wsgi.run_once': False,
+    }
+    for name, value in scope.get('headers', []):
+        name = name.decode('latin-1').upper().replace('-', '_')
+        value = value.decode('latin-1')
+        if name == 'CONTENT_LENGTH':
+            continue
+        key = name if name == 'CONTENT_TYPE' else 'HTTP_' + name
+        environ[key] = f'{environ[key]},{value}' if key in environ else value
+    return environ
+
+
+class WSGIBridge:
+    """ASGI application running a WSGI app on a dedicated thread pool"""
+
+    def __init__(self, wsgi_app, threads=64, streams=None):
+        self.wsgi_app = wsgi_app
+        self.executor = ThreadPoolExecutor(max_workers=threads, thread_name_prefix='asgi')
+        self.streams = streams
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'lifespan':
+            return await self._lifespan(receive, send)
+        if scope['type'] != 'http':
+            return
+        if self.streams is not None and scope['method'] == 'GET' and scope['path'] == '/api/stream':
+            return await self._stream(receive, send)
+
+        body = bytearray()
+        while True:
+            message = await receive()
+            if message['type'] == 'http.disconnect':
+                return
+            body += message.get('body', b'')
+            if not message.get('more_body'):
+                break
+
+        # Watch for the client going away so long responses can stop early
+        disconnected = threading.Event()
+
+        async def watch():
+            while (await receive())['type'] != 'http.disconnect':
+                pass
+            disconnected.set()
+
+        watcher = asyncio.ensure_future(watch())
+        loop = asyncio.get_running_loop()
+        try:
+            await loop.run_in_executor(self.executor, self._respond, loop, scope, bytes(body), send, disconnected)
+        finally:
+            watcher.cancel()
+
+    def _respond(self, loop, scope, body, send, disconnected):
+        """Run the WSGI app in a pool thread, handing each message back to the loop"""
+        def send_message(message):
+            asyncio.run_coroutine_threadsafe(send(message), loop).result()
+
+        response = {}
+
+        def start_response(status, headers, exc_info=None):
+            if exc_info and response.get('sent'):
+                raise exc_info[1].with_traceback(exc_info[2])
+            response['status'] = int(status.split(' ', 1)[0])
+            response['headers'] = [(name.lower().encode('latin-1'), value.encode('latin-1'))
+                                   for name, value in headers]
+
+        def start():
+            if not response.get('sent'):
+                response['sent'] = True
+                send_message({'type': 'http.response.start', 'status': response['status'],
+                              'headers': response['headers']})
+
+        result = self.wsgi_app(build_environ(scope, body), start_response)
+        try:
+            for chunk in result:
+                if disconnected.is_set():
+                    return
+                start()
+                if chunk:
+                    send_message({'type': 'http.response.body', 'body': chunk, 'more_body': True})
+            start()
+            send_message({'type': 'http.response.body', 'body': b''})
+        finally:
+            if hasattr(result, 'close'):
+                result.close()
+
+    async def _stream(self, receive, send):
+        """Server-Sent Events from the broadcaster, awaited on the loop without a thread"""
+        loop = asyncio.get_running_loop()
+        ready = asyncio.Event()
+        subscription = self.streams.subscribe(wake=lambda: loop.call_soon_threadsafe(ready.set))
+
+        async def until_disconnect():
+            while (await receive())['type'] != 'http.disconnect':
+                pass
+
+        async def write(text):
+            await send({'type': 'http.response.body', 'body': text.encode('utf-8'), 'more_body': True})
+
+        disconnected = asyncio.ensure_future(until_disconnect())
+        try:
+            await send({'type': 'http.response.start', 'status': 200, 'headers': [
+                (b'content-type', b'text/event-stream; charset=utf-8'),
+                (b'cache-control', b'no-cache'),
+                (b'x-accel-buffering', b'no')]})
+            # The first snapshot may have to read storage, so it runs off the loop
+            snapshot = await loop.run_in_executor(self.executor, self.streams.snapshot)
+            await write(format_event('snapshot', snapshot))
+            while not disconnected.done():
+                try:
+                    event, data = subscription.queue.get_nowait()
+                except queue.Empty:
+                    # Clear before re-checking, so a message queued in between still wakes us
+                    ready.clear()
+                    if not subscription.queue.empty():
+                        continue
+                    waiting = asyncio.ensure_future(ready.wait())
+                    done, _ = await asyncio.wait({waiting, disconnected}, timeout=STREAM_KEEPALIVE,
+                                                 return_when=asyncio.FIRST_COMPLETED)
+                    waiting.cancel()
+                    if not done:
+                        await write(': keep-alive\n\n')
+                    continue
+                await write(format_event(event, data))
+        finally:
+            disconnected.cancel()
+            self.streams.unsubscribe(subscription)
+
+    async def _lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                self.executor.shutdown(wait=False)
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+
+# Streams here hold no thread, so the per-worker cap the threaded servers need is lifted
+price_broadcaster.max_clients = None
+application = WSGIBridge(app, threads=int(os.getenv('ASGI_THREADS', 64)), streams=price_broadcaster)
@@ -0,0 +1,96 @@
+"""Throughput and retry rate of conflict-safe trade execution as workers grow.
+
+Each worker process trades against a small set of shared accounts through
+one SQLite file, the same way several gunicorn workers share one database.
+At the end the balances are checked: every share bought must be paid for.
+
+Run from the repository root:  python -m benchmarks.contention
+"""
+import argparse
+import multiprocessing
+import os
+import random
+import tempfile
+import time
+
+from accounts import TradeError, execute_trade
+from storage import ConflictError, SQLiteStorage
+
+PRICE = 10.0
+START_CASH = 1_000_000.0
+
+
+def worker(filename, accounts, trades, seed, results):
+    store = SQLiteStorage(filename)
+    rng = random.Random(seed)
+    attempts = conflicts = rejected = bought = 0
+    for _ in range(trades):
+        username = f'user{rng.randrange(accounts)}'
+        try:
+            _, _, used = execute_trade(store, username, 'buy', 'UMAE', 1, PRICE, max_attempts=50)
+            attempts += used
+            bought += 1
+        except ConflictError:
+            conflicts += 1
+        except TradeError:
+            rejected += 1
+    results.put((attempts, bought, conflicts, rejected))
+    store.close()
+
+
+def run(workers, accounts, trades):
+    with tempfile.TemporaryDirectory() as tmp:
+        filename = os.path.join(tmp, 'contention.db')
+        store = SQLiteStorage(filename)
+        store.update('users', {
+            f'user{i}': {'username': f'user{i}', 'cash_balance': START_CASH, 'portfolio': {}}
+            for i in range(accounts)
+        })
+
+        results = multiprocessing.Queue()
+        processes = [multiprocessing.Process(target=worker, args=(filename, accounts, trades, seed, results))
+                     for seed in range(workers)]
+        start = time.perf_counter()
+        for p in processes:
+            p.start()
+        totals = [results.get() for _ in processes]
+        for p in processes:
+            p.join()
+        elapsed = time.perf_counter() - start
+
+        attempts = sum(t[0] for t in totals)
+        bought = sum(t[1] for t in totals)
+        conflicts = sum(t[2] for t in totals)
+
+        # No lost updates: shares held and cash spent must both match the trade count
+        users = store.get('users')
+        shares = sum(u.get('portfolio', {}).get('UMAE', {}).get('quantity', 0) for u in users.values())
+        spent = sum(START_CASH - u['cash_balance'] for u in users.values())
+        consistent = shares == bought and abs(spent - bought * PRICE) < 1e-6
+        store.close()
+
+    return {
+        'workers': workers,
+        'trades_per_second': bought / elapsed,
+        'retry_rate': (attempts - bought) / attempts if attempts else 0.0,
+        'gave_up': conflicts,
+        'consistent': consistent,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 2, 4, 8])
+    parser.add_argument('--accounts', type=int, default=4, help='shared accounts (fewer = more contention)')
+    parser.add_argument('--trades', type=int, default=300, help='trades per worker')
+    args = parser.parse_args()
+
+    print(f"{'workers':>7} {'trades/s':>10} {'retry rate':>11} {'gave up':>8} {'consistent':>11}")
+    for workers in args.workers:
+        r = run(workers, args.accounts, args.trades)
+        print(f"{r['workers']:>7} {r['trades_per_second']:>10.1f} {r['retry_rate']:>10.1%} "
+              f"{r['gave_up']:>8} {str(r['consistent']):>11}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,61 @@
+"""Restart time from the event log as the history grows.
+
+Writes histories of increasing length (ticks with a trade every so often,
+snapshotting every --snapshot-every events the way update_stocks does),
+then times EventLog.recover. Recovery should stay flat: one snapshot load
+plus at most one segment of replay.
+
+Run from the repository root:  python -m benchmarks.event_log
+"""
+import argparse
+import os
+import random
+import tempfile
+import time
+
+from event_log import TRADE, EventLog
+
+
+def build(root, events, symbols, users, snapshot_every, rng):
+    log = EventLog(root, snapshot_every=snapshot_every)
+    prices = [rng.uniform(10, 1000) for _ in range(symbols)]
+    accounts = {f'user{i}': {'cash': 10_000.0, 'portfolio': {}} for i in range(users)}
+    started = time.perf_counter()
+    for i in range(events):
+        if i % 50 == 0:
+            username = f'user{rng.randrange(users)}'
+            log.record(TRADE, i, {'user': username, 'side': 'buy', 'stock': 'SYN0', 'quantity': 1,
+                                  'price': prices[0], 'cash': accounts[username]['cash'], 'portfolio': {}})
+        else:
+            prices = [p * (1 + rng.uniform(-0.002, 0.002)) for p in prices]
+            log.tick(i, prices)
+        if log.due():
+            log.snapshot({'price': prices, 'users': accounts})
+    log.close()
+    return time.perf_counter() - started
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--histories', type=int, nargs='+', default=[10_000, 100_000, 1_000_000])
+    parser.add_argument('--symbols', type=int, default=100)
+    parser.add_argument('--users', type=int, default=1_000)
+    parser.add_argument('--snapshot-every', type=int, default=3600)
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+
+    print(f"{'events':>10} {'write s':>8} {'log MB':>8} {'replayed':>9} {'recover ms':>11}")
+    for events in args.histories:
+        with tempfile.TemporaryDirectory() as root:
+            write_time = build(root, events, args.symbols, args.users, args.snapshot_every,
+                               random.Random(args.seed))
+            size = sum(os.path.getsize(os.path.join(root, name)) for name in os.listdir(root))
+            started = time.perf_counter()
+            state, replayed = EventLog(root).recover()
+            recover_time = time.perf_counter() - started
+            print(f"{events:>10,} {write_time:>8.1f} {size / 1e6:>8.1f} {len(replayed):>9,} "
+                  f"{recover_time * 1000:>11.1f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,89 @@
+"""Tick and query cost of the incremental leaderboard at 100k accounts.
+
+Builds accounts holding a few of many symbols, then drives random-walk ticks
+where only some symbols move, timing the holdings matrix revalue plus the
+re-rank of the accounts it moved, top-N and rank lookups. With --check the
+board is compared against a full recomputation after every tick.
+
+Run from the repository root:  python -m benchmarks.leaderboard
+"""
+import argparse
+import random
+import time
+
+from leaderboard import Leaderboard
+from valuation import HoldingsMatrix
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--users', type=int, default=100_000)
+    parser.add_argument('--symbols', type=int, default=500)
+    parser.add_argument('--holdings', type=int, default=3, help='symbols held per user')
+    parser.add_argument('--moving', type=float, default=0.05, help='fraction of symbols that move each tick')
+    parser.add_argument('--ticks', type=int, default=100)
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--check', action='store_true', help='compare with a full re-sort every tick')
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    symbols = [f'SYN{i:05d}' for i in range(args.symbols)]
+    prices = {symbol: rng.uniform(10, 1000) for symbol in symbols}
+    accounts = {
+        f'user{i}': (rng.uniform(0, 100_000),
+                     {symbol: rng.randint(1, 100) for symbol in rng.sample(symbols, args.holdings)})
+        for i in range(args.users)
+    }
+    matrix = HoldingsMatrix(symbols, [prices[symbol] for symbol in symbols], capacity=args.users)
+    board = Leaderboard(matrix)
+    start = time.perf_counter()
+    board.refresh(matrix.add_missing(accounts))
+    print(f"Loaded {len(board):,} accounts in {time.perf_counter() - start:.2f}s")
+
+    tick_time = 0.0
+    worst_tick = 0.0
+    revalued = 0
+    for _ in range(args.ticks):
+        moved = {symbol: prices[symbol] * (1 + rng.uniform(-0.01, 0.01))
+                 for symbol in rng.sample(symbols, max(1, int(args.symbols * args.moving)))}
+        prices.update(moved)
+        t = time.perf_counter()
+        revalued += board.refresh_rows(matrix.revalue([prices[symbol] for symbol in symbols]))
+        elapsed = time.perf_counter() - t
+        tick_time += elapsed
+        worst_tick = max(worst_tick, elapsed)
+
+        # A trade now and then, the way users reshuffle between ticks
+        username = f'user{rng.randrange(args.users)}'
+        cash, holdings = accounts[username]
+        accounts[username] = (cash * 0.99, holdings)
+        matrix.set_account(username, *accounts[username])
+        board.refresh([username])
+
+        if args.check:
+            values = {u: c + sum(q * prices[s] for s, q in h.items()) for u, (c, h) in accounts.items()}
+            expected = sorted(values, key=lambda u: (-values[u], u))[:100]
+            got = [u for _, u, v in board.top(100)]
+            if [round(values[u], 4) for u in expected] != [round(board.value(u), 4) for u in got]:
+                raise SystemExit("❌ Leaderboard differs from a full recomputation")
+
+    t = time.perf_counter()
+    for i in range(10_000):
+        board.rank(f'user{rng.randrange(args.users)}')
+    rank_time = (time.perf_counter() - t) / 10_000
+    t = time.perf_counter()
+    for i in range(1_000):
+        board.top(20)
+    top_time = (time.perf_counter() - t) / 1_000
+
+    print(f"Accounts revalued:  {revalued / args.ticks:,.0f} per tick")
+    print(f"Mean tick update:   {tick_time / args.ticks * 1000:.3f} ms")
+    print(f"Worst tick update:  {worst_tick * 1000:.3f} ms")
+    print(f"Rank lookup:        {rank_time * 1e6:.2f} us")
+    print(f"Top 20:             {top_time * 1e6:.2f} us")
+    if args.check:
+        print("✅ Every tick matched a full recomputation")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,262 @@
+"""End-to-end load test of the web app with the simulator ticking alongside.
+
+Starts app.py either in-process (a threaded Werkzeug server) or under
+gunicorn, backed by a throwaway SQLite file so the app and the simulator
+share one local storage stand-in. Many simulated users then register, log
+in and browse/trade with a weighted mix of requests while update_stocks runs
+once per tick interval in this process. Latency percentiles and throughput
+per route, plus tick durations, are printed and written as JSON so runs can
+be compared across commits. A trade only counts as successful when the page
+it redirects to confirms it; a rejected trade is an error.
+
+Run from the repository root:  python -m benchmarks.load_test --output load.json
+"""
+import argparse
+import json
+import logging
+import os
+import random
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime
+
+import requests
+
+# (route name, weight) for each request after the user has signed up
+MIX = [('dashboard', 40), ('index', 15), ('buy', 15), ('sell', 10), ('login', 5),
+       ('history', 5), ('leaderboard', 5), ('candles', 5)]
+SYMBOLS = ['John Lawyers', 'Tidli Co', 'UMAE']
+
+
+def percentile(sorted_values, q):
+    if not sorted_values:
+        return None
+    index = min(len(sorted_values) - 1, max(0, int(round(q / 100 * (len(sorted_values) - 1)))))
+    return sorted_values[index]
+
+
+def summarize(samples, elapsed):
+    """count, errors, throughput and latency percentiles (ms) for a list of (seconds, ok)"""
+    latencies = sorted(seconds * 1000 for seconds, _ in samples)
+    return {
+        'count': len(samples),
+        'errors': sum(1 for _, ok in samples if not ok),
+        'throughput': len(samples) / elapsed if elapsed else 0.0,
+        'mean_ms': sum(latencies) / len(latencies) if latencies else None,
+        'p50_ms': percentile(latencies, 50),
+        'p95_ms': percentile(latencies, 95),
+        'p99_ms': percentile(latencies, 99),
+        'max_ms': latencies[-1] if latencies else None,
+    }
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def wait_for(url, timeout=30):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            requests.get(url, timeout=1)
+            return
+        except requests.ConnectionError:
+            time.sleep(0.1)
+    raise SystemExit(f"❌ Server at {url} did not come up")
+
+
+class SimulatedUser:
+    """One browser session following the request mix"""
+
+    def __init__(self, base_url, username, rng, results, lock):
+        self.base_url = base_url
+        self.username = username
+        self.rng = rng
+        self.results = results
+        self.lock = lock
+        self.session = requests.Session()
+        self.shares = {}
+
+    def request(self, route, method, path, expect=None, **kwargs):
+        """Time one request; it succeeds on a status below 400 with expect (if given) in the page"""
+        start = time.perf_counter()
+        try:
+            response = self.session.request(method, self.base_url + path, timeout=30, **kwargs)
+            ok = response.status_code < 400 and (expect is None or expect in response.text)
+        except requests.RequestException:
+            ok = False
+        elapsed = time.perf_counter() - start
+        with self.lock:
+            self.results.setdefault(route, []).append((elapsed, ok))
+        return ok
+
+    def sign_up(self):
+        self.request('register', 'POST', '/register', data={'username': self.username})
+
+    def step(self):
+        route = self.rng.choices([name for name, _ in MIX], weights=[weight for _, weight in MIX])[0]
+        symbol = self.rng.choice(SYMBOLS)
+        if route == 'dashboard':
+            self.request(route, 'GET', '/dashboard')
+        elif route == 'index':
+            self.request(route, 'GET', '/')
+        elif route == 'login':
+            self.request(route, 'POST', '/login', data={'username': self.username})
+        elif route == 'history':
+            self.request(route, 'GET', '/history')
+        elif route == 'leaderboard':
+            self.request(route, 'GET', '/leaderboard')
+        elif route == 'candles':
+            self.request(route, 'GET', f"/api/candles/{symbol.replace(' ', '_')}")
+        elif route == 'buy':
+            if self.request(route, 'POST', '/buy', data={'stock_name': symbol, 'quantity': 1},
+                            expect='Successfully bought'):
+                self.shares[symbol] = self.shares.get(symbol, 0) + 1
+        elif route == 'sell':
+            held = [s for s, quantity in self.shares.items() if quantity]
+            if not held:
+                return self.request('dashboard', 'GET', '/dashboard')
+            symbol = self.rng.choice(held)
+            if self.request(route, 'POST', '/sell', data={'stock_name': symbol, 'quantity': 1},
+                            expect='Successfully sold'):
+                self.shares[symbol] -= 1
+
+
+def run_users(base_url, users, duration, think_time, seed, results):
+    lock = threading.Lock()
+    stop_at = time.monotonic() + duration
+
+    def loop(i):
+        rng = random.Random(seed * 100_003 + i)
+        user = SimulatedUser(base_url, f'load{seed}_{i}', rng, results, lock)
+        user.sign_up()
+        while time.monotonic() < stop_at:
+            user.step()
+            if think_time:
+                time.sleep(rng.expovariate(1 / think_time))
+
+    threads = [threading.Thread(target=loop, args=(i,), daemon=True) for i in range(users)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'], text=True,
+                                       stderr=subprocess.DEVNULL).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--server', choices=('inprocess', 'gunicorn'), default='inprocess')
+    parser.add_argument('--users', type=int, default=50, help='concurrent simulated users')
+    parser.add_argument('--duration', type=float, default=30.0, help='seconds of traffic')
+    parser.add_argument('--think-time', type=float, default=0.1, help='mean pause between requests (s)')
+    parser.add_argument('--tick-interval', type=float, default=1.0, help='seconds between simulator ticks')
+    parser.add_argument('--workers', type=int, default=4, help='gunicorn workers')
+    parser.add_argument('--threads', type=int, default=32, help='gunicorn threads per worker')
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--output', help='write results as JSON to this file')
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix='loadtest-')
+    os.environ.update({
+        'STORAGE_BACKEND': 'sqlite',
+        'STORAGE_PATH': os.path.join(workdir, 'load.db'),
+        'TICK_HISTORY_DIR': os.path.join(workdir, 'tick_history'),
+        'EVENT_LOG_DIR': os.path.join(workdir, 'event_log'),
+        'METRICS_PORT': '0',
+        'DOW_FIXTURE': os.environ.get('DOW_FIXTURE', '40000'),
+        'FLASK_SECRET_KEY': 'load-test',
+    })
+
+    # The simulator runs here, writing ticks, heartbeats and fills into the shared file
+    import main as simulator
+    simulator.update_stocks()
+
+    port = free_port()
+    base_url = f'http://127.0.0.1:{port}'
+    server = None
+    if args.server == 'gunicorn':
+        server = subprocess.Popen(
+            [sys.executable, '-m', 'gunicorn', 'app:app', '--bind', f'127.0.0.1:{port}',
+             '--workers', str(args.workers), '--worker-class', 'gthread', '--threads', str(args.threads),
+             '--log-level', 'warning'],
+            env=os.environ.copy())
+    else:
+        from werkzeug.serving import make_server
+        import app as web
+        logging.getLogger('werkzeug').setLevel(logging.ERROR)
+        server = make_server('127.0.0.1', port, web.app, threaded=True)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+    wait_for(base_url + '/')
+
+    # Tick the simulator on its own thread for as long as the traffic runs
+    ticks = []
+    stop = threading.Event()
+
+    def tick_loop():
+        while not stop.is_set():
+            start = time.perf_counter()
+            try:
+                simulator.update_stocks()
+                ok = True
+            except Exception as e:
+                print(f"🔥 Tick failed: {e}")
+                ok = False
+            elapsed = time.perf_counter() - start
+            ticks.append((elapsed, ok))
+            stop.wait(max(0.0, args.tick_interval - elapsed))
+
+    ticker = threading.Thread(target=tick_loop, daemon=True)
+    ticker.start()
+
+    print(f"Driving {args.users} users against {args.server} for {args.duration:.0f}s...")
+    results = {}
+    start = time.perf_counter()
+    run_users(base_url, args.users, args.duration, args.think_time, args.seed, results)
+    elapsed = time.perf_counter() - start
+    stop.set()
+    ticker.join()
+
+    if args.server == 'gunicorn':
+        server.terminate()
+        server.wait()
+    else:
+        server.shutdown()
+    shutil.rmtree(workdir, ignore_errors=True)
+
+    report = {
+        'commit': git_commit(),
+        'timestamp': datetime.now().isoformat(timespec='seconds'),
+        'config': vars(args),
+        'elapsed_s': elapsed,
+        'routes': {route: summarize(samples, elapsed) for route, samples in sorted(results.items())},
+        'total': summarize([s for samples in results.values() for s in samples], elapsed),
+        'ticks': summarize(ticks, elapsed),
+    }
+
+    print(f"\n{'route':<12} {'count':>7} {'errors':>6} {'req/s':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8}")
+    for route, stats in list(report['routes'].items()) + [('TOTAL', report['total']), ('tick', report['ticks'])]:
+        print(f"{route:<12} {stats['count']:>7} {stats['errors']:>6} {stats['throughput']:>8.1f} "
+              f"{stats['p50_ms'] or 0:>8.1f} {stats['p95_ms'] or 0:>8.1f} {stats['p99_ms'] or 0:>8.1f}")
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"\n✅ Results written to {args.output}")
+
+
+if __name__ == '__main__':
+    main()
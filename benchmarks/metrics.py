@@ -0,0 +1,74 @@
+"""Recording cost of the metrics registry on the hot path.
+
+Times each recording call the tick loop, storage wrapper and request hooks
+make, single-threaded and with --threads threads recording into the same
+series, and reports nanoseconds per call. Rendering a scrape of the result
+is timed too.
+
+Run from the repository root:  python -m benchmarks.metrics
+"""
+import argparse
+import threading
+import time
+
+from metrics import Registry, Counter, Gauge, Histogram
+
+
+def per_call_ns(fn, calls, threads):
+    """Wall nanoseconds per call with threads threads each making calls calls"""
+    barrier = threading.Barrier(threads + 1)
+
+    def worker():
+        barrier.wait()
+        for _ in range(calls):
+            fn()
+
+    workers = [threading.Thread(target=worker) for _ in range(threads)]
+    for thread in workers:
+        thread.start()
+    barrier.wait()
+    start = time.perf_counter()
+    for thread in workers:
+        thread.join()
+    return (time.perf_counter() - start) / (calls * threads) * 1e9
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--calls', type=int, default=200_000, help='calls per thread')
+    parser.add_argument('--threads', type=int, default=8)
+    args = parser.parse_args()
+
+    registry = Registry()
+    counter = registry.register(Counter('c_total', 'counter'))
+    gauge = registry.register(Gauge('g', 'gauge'))
+    histogram = registry.register(Histogram('h_seconds', 'histogram'))
+    labelled = registry.register(Histogram('l_seconds', 'labelled histogram', ['operation', 'path']))
+    for path in ('users', 'stocks', 'orders', 'root'):
+        labelled.labels('get', path)
+
+    def timed_block():
+        with histogram.time():
+            pass
+
+    cases = [
+        ('counter.inc', counter.inc),
+        ('gauge.set', lambda: gauge.set(1.5)),
+        ('histogram.observe', lambda: histogram.observe(0.003)),
+        ('labels().observe', lambda: labelled.labels('get', 'users').observe(0.003)),
+        ('histogram.time', timed_block),
+        ('empty call', lambda: None),
+    ]
+    print(f"{'call':<20} {'1 thread ns':>12} {f'{args.threads} threads ns':>14}")
+    for name, fn in cases:
+        single = per_call_ns(fn, args.calls, 1)
+        contended = per_call_ns(fn, args.calls // args.threads, args.threads)
+        print(f"{name:<20} {single:>12.0f} {contended:>14.0f}")
+
+    start = time.perf_counter()
+    text = registry.render()
+    print(f"\nRendered {len(text.splitlines())} lines in {(time.perf_counter() - start) * 1000:.2f}ms")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,72 @@
+"""Orders matched per second by the heap-based matching engine.
+
+Rests a large book of limit and stop orders around each symbol's price, then
+drives random-walk ticks through it and times MatchingEngine.match, topping
+the book back up so its size stays constant.
+
+Run from the repository root:  python -m benchmarks.order_book
+"""
+import argparse
+import random
+import time
+
+from order_book import MatchingEngine, Order
+
+
+def random_order(rng, order_id, symbol, price):
+    side = rng.choice(('buy', 'sell'))
+    kind = rng.choice(('limit', 'stop'))
+    # Rest on the far side of the price, the way real limit and stop orders do
+    fires_below = (side == 'buy') == (kind == 'limit')
+    trigger = round(price * (rng.uniform(0.95, 0.999) if fires_below else rng.uniform(1.001, 1.05)), 2)
+    return Order(order_id, f'user{rng.randrange(10_000)}', symbol, side, kind, trigger, rng.randint(1, 100))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--orders', type=int, default=300_000, help='resting orders')
+    parser.add_argument('--symbols', type=int, default=100)
+    parser.add_argument('--ticks', type=int, default=500)
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    symbols = [f'SYN{i:05d}' for i in range(args.symbols)]
+    prices = [rng.uniform(10, 1000) for _ in symbols]
+    engine = MatchingEngine()
+    next_id = 0
+
+    start = time.perf_counter()
+    for _ in range(args.orders):
+        i = rng.randrange(args.symbols)
+        engine.place(random_order(rng, next_id, symbols[i], prices[i]))
+        next_id += 1
+    print(f"Placed {args.orders:,} orders in {time.perf_counter() - start:.2f}s")
+
+    matched = 0
+    match_time = 0.0
+    worst_tick = 0.0
+    for _ in range(args.ticks):
+        prices = [max(1, round(p * (1 + rng.uniform(-0.002, 0.002)), 2)) for p in prices]
+        t = time.perf_counter()
+        fills = engine.match(symbols, prices)
+        elapsed = time.perf_counter() - t
+        match_time += elapsed
+        worst_tick = max(worst_tick, elapsed)
+        matched += len(fills)
+
+        # Replace what filled so the book stays the same size
+        for order, _ in fills:
+            i = rng.randrange(args.symbols)
+            engine.place(random_order(rng, next_id, symbols[i], prices[i]))
+            next_id += 1
+
+    print(f"Resting orders:        {len(engine):,}")
+    print(f"Orders matched:        {matched:,} over {args.ticks} ticks")
+    print(f"Matched per second:    {matched / match_time:,.0f}")
+    print(f"Mean tick match time:  {match_time / args.ticks * 1000:.3f} ms")
+    print(f"Worst tick match time: {worst_tick * 1000:.3f} ms")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,84 @@
+"""Ticks per second of the vectorized price engine against ticker count.
+
+Run from the repository root:  python -m benchmarks.price_engine [--check]
+"""
+import argparse
+import random
+import time
+
+import numpy as np
+
+from price_engine import PriceBook
+
+
+def loop_tick(prices, probability, impacts):
+    """The original per-company update_stocks model, for comparison"""
+    new_prices = []
+    for old_price in prices:
+        if random.random() < probability:
+            impact = impacts[random.choice(list(impacts.keys()))]
+            new_price = round(old_price + old_price * impact, 2)
+        else:
+            base_change = random.uniform(-0.2, 0.2)
+            dow_factor = random.uniform(0.9, 1.1)
+            new_price = round(old_price + old_price * (base_change / 100) * dow_factor, 2)
+        new_prices.append(max(1, new_price))
+    return new_prices
+
+
+def time_ticks(fn, min_seconds):
+    ticks = 0
+    start = time.perf_counter()
+    while True:
+        fn()
+        ticks += 1
+        elapsed = time.perf_counter() - start
+        if elapsed >= min_seconds:
+            return ticks / elapsed
+
+
+def check_distribution(samples=200_000, seed=7):
+    """Compare one-tick return statistics of both models on the same universe"""
+    book = PriceBook.synthetic(samples, seed=seed)
+    impacts = dict(zip(book.event_names[0], book.event_impacts[0].tolist()))
+    start = book.price.copy()
+    random.seed(seed)
+    loop_returns = np.array(loop_tick(start.tolist(), 0.05, impacts)) / start - 1
+    vector_returns = book.tick(np.random.default_rng(seed)).new_prices / start - 1
+
+    print(f"{'model':<8} {'mean':>10} {'std':>10} {'event rate':>11} {'p01':>10} {'p99':>10}")
+    for name, returns in (('loop', loop_returns), ('vector', vector_returns)):
+        events = np.mean(np.abs(returns) > 0.01)
+        p01, p99 = np.percentile(returns, [1, 99])
+        print(f"{name:<8} {returns.mean():>10.5f} {returns.std():>10.5f} {events:>11.4f} {p01:>10.5f} {p99:>10.5f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=[3, 100, 1000, 10_000, 50_000])
+    parser.add_argument('--seconds', type=float, default=1.0, help='minimum time per measurement')
+    parser.add_argument('--loop-limit', type=int, default=10_000, help='skip the Python loop above this size')
+    parser.add_argument('--check', action='store_true', help='also compare return distributions')
+    args = parser.parse_args()
+
+    print(f"{'tickers':>8} {'vector ticks/s':>15} {'loop ticks/s':>13} {'speedup':>8}")
+    for size in args.sizes:
+        book = PriceBook.synthetic(size, seed=1)
+        rng = np.random.default_rng(1)
+        vector_rate = time_ticks(lambda: book.tick(rng), args.seconds)
+
+        if size <= args.loop_limit:
+            prices = book.price.tolist()
+            impacts = dict(zip(book.event_names[0], book.event_impacts[0].tolist()))
+            loop_rate = time_ticks(lambda: loop_tick(prices, 0.05, impacts), args.seconds)
+            print(f"{size:>8} {vector_rate:>15.1f} {loop_rate:>13.1f} {vector_rate / loop_rate:>7.1f}x")
+        else:
+            print(f"{size:>8} {vector_rate:>15.1f} {'-':>13} {'-':>8}")
+
+    if args.check:
+        print()
+        check_distribution()
+
+
+if __name__ == '__main__':
+    main()
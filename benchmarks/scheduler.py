@@ -0,0 +1,73 @@
+"""Tick drift and jitter of the fixed-rate scheduler against sleep-after-tick.
+
+Both loops run a synthetic tick that takes --work-ms on average (exponentially
+distributed, so some ticks overrun the interval) for --ticks intervals. The
+sleep loop is the old stock_updater: tick, then sleep one interval. Reported
+per loop: ticks completed, how far the last tick started from its ideal
+time (drift), and the start lateness percentiles of the scheduler.
+
+Run from the repository root:  python -m benchmarks.scheduler --interval-ms 20
+"""
+import argparse
+import random
+import threading
+import time
+
+from scheduler import CATCH_UP, SKIP, TickScheduler
+
+
+def make_work(mean_ms, seed):
+    rng = random.Random(seed)
+    return lambda: time.sleep(rng.expovariate(1000 / mean_ms) if mean_ms else 0)
+
+
+def sleep_loop(interval, ticks, work):
+    """(ticks run, drift of the last tick in seconds) for tick-then-sleep"""
+    start = time.monotonic()
+    for _ in range(ticks):
+        last = time.monotonic()
+        work()
+        time.sleep(interval)
+    return ticks, last - (start + (ticks - 1) * interval)
+
+
+def scheduled_loop(interval, ticks, work, policy):
+    """(ticks run, drift of the last tick in seconds, scheduler stats)"""
+    scheduler = TickScheduler(interval, policy=policy)
+    started = []
+    end = time.monotonic() + ticks * interval
+
+    def tick(k):
+        started.append((k, time.monotonic()))
+        work()
+        if time.monotonic() >= end:
+            scheduler.stop()
+
+    thread = threading.Thread(target=scheduler.run, args=(tick,))
+    thread.start()
+    thread.join()
+    k, last = started[-1]
+    return len(started), last - (scheduler._anchor + k * interval), scheduler.stats()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--interval-ms', type=float, default=20.0)
+    parser.add_argument('--ticks', type=int, default=250, help='intervals to run each loop for')
+    parser.add_argument('--work-ms', type=float, default=5.0, help='mean tick duration')
+    args = parser.parse_args()
+    interval = args.interval_ms / 1000
+
+    print(f"{args.ticks} intervals of {args.interval_ms:g}ms, ticks of {args.work_ms:g}ms on average\n")
+    print(f"{'loop':<10} {'ticks':>6} {'missed':>7} {'drift ms':>9} {'p50 ms':>8} {'p99 ms':>8} {'max ms':>8}")
+    count, drift = sleep_loop(interval, args.ticks, make_work(args.work_ms, 1))
+    print(f"{'sleep':<10} {count:>6} {'-':>7} {drift * 1000:>9.1f} {'-':>8} {'-':>8} {'-':>8}")
+    for policy in (SKIP, CATCH_UP):
+        count, drift, stats = scheduled_loop(interval, args.ticks, make_work(args.work_ms, 1), policy)
+        jitter = stats['jitter_ms']
+        print(f"{policy:<10} {count:>6} {stats['missed']:>7} {drift * 1000:>9.1f} "
+              f"{jitter['p50']:>8.2f} {jitter['p99']:>8.2f} {jitter['max']:>8.2f}")
+
+
+if __name__ == '__main__':
+    main()
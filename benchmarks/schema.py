@@ -0,0 +1,87 @@
+"""Payload size and parse cost of version 1 vs version 2 stock records.
+
+Builds one tick's stock updates for a table of synthetic symbols in both
+formats (see schema.py), then compares the JSON bytes written per tick, the
+cost of encoding a tick, and the cost of the web app turning a read of the
+table into a StockSnapshot.
+
+Run from the repository root:  python -m benchmarks.schema
+"""
+import argparse
+import json
+import random
+import time
+from datetime import datetime
+
+from schema import change_ratio, encode_stock
+from stock_cache import StockSnapshot
+
+
+def encode_v1(name, old_price, new_price, now):
+    """The record update_stocks wrote before the numeric schema"""
+    percent_change = (new_price - old_price) / old_price * 100
+    return {
+        'name': name,
+        'price': str(new_price),
+        'change': f"{'+' if percent_change >= 0 else ''}{percent_change:.2f}%",
+        'last_updated': now.strftime('%Y-%m-%d %H:%M:%S')
+    }
+
+
+def encode_v2(name, old_price, new_price, now):
+    return encode_stock(name, new_price, change_ratio(old_price, new_price), int(now.timestamp() * 1000))
+
+
+def best_of(repeat, fn):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--symbols', type=int, default=1000)
+    parser.add_argument('--repeat', type=int, default=20)
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    names = [f'Synthetic Co {i}' for i in range(args.symbols)]
+    old = [rng.uniform(1, 1000) for _ in names]
+    new = [price * (1 + rng.uniform(-0.01, 0.01)) for price in old]
+    keys = [name.replace(' ', '_') for name in names]
+    to_display = lambda key: key.replace('_', ' ')
+    now = datetime.now()
+
+    print(f"{args.symbols} symbols, best of {args.repeat}\n")
+    print(f"{'':<24} {'v1':>12} {'v2':>12} {'v2/v1':>8}")
+    rows = []
+    tables = {}
+    for version, encode in (('v1', encode_v1), ('v2', encode_v2)):
+        build = lambda: {key: encode(name, o, n, now) for key, name, o, n in zip(keys, names, old, new)}
+        table = tables[version] = build()
+        payload = json.loads(json.dumps(table))
+        rows.append((
+            len(json.dumps(table, separators=(',', ':')).encode()),
+            best_of(args.repeat, build),
+            best_of(args.repeat, lambda: StockSnapshot(1, payload, to_display)),
+        ))
+
+    (v1_bytes, v1_encode, v1_parse), (v2_bytes, v2_encode, v2_parse) = rows
+    print(f"{'tick payload (bytes)':<24} {v1_bytes:>12,} {v2_bytes:>12,} {v2_bytes / v1_bytes:>8.2f}")
+    print(f"{'encode tick (ms)':<24} {v1_encode * 1000:>12.3f} {v2_encode * 1000:>12.3f} {v2_encode / v1_encode:>8.2f}")
+    print(f"{'parse snapshot (ms)':<24} {v1_parse * 1000:>12.3f} {v2_parse * 1000:>12.3f} {v2_parse / v1_parse:>8.2f}")
+
+    # Both formats must read back to the same numbers
+    v1 = StockSnapshot(1, tables['v1'], to_display)
+    v2 = StockSnapshot(1, tables['v2'], to_display)
+    for name in names:
+        assert abs(v1.prices[name] - v2.prices[name]) < 1e-4
+        assert abs(v1.by_name[name]['change'] - v2.by_name[name]['change']) <= 1e-4
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,183 @@
+"""Dashboard throughput of the sync, threaded and ASGI serving modes.
+
+Runs app.py under gunicorn sync workers, gunicorn gthread workers (the
+Procfile setup) and uvicorn with asgi.py, one after another, against the
+same throwaway SQLite file with STORAGE_LATENCY_MS added to every storage
+call so round trips cost what a remote database would. The simulator ticks
+in this process to keep the heartbeat fresh. Each client logs in once and
+then loads /dashboard as fast as it can; requests per second and latency
+percentiles are reported per mode.
+
+--streams keeps that many price streams open for the whole run, like idle
+dashboard tabs. The threaded modes turn streams past STREAM_MAX_CLIENTS per
+worker away (those tabs would poll instead); the ASGI mode holds them all
+on its event loop. The "streams" column counts the ones that were accepted.
+Sync workers get none: a single stream would take a whole worker.
+
+Run from the repository root:  python -m benchmarks.serving --latency-ms 20
+"""
+import argparse
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+import requests
+
+from benchmarks.load_test import free_port, git_commit, summarize, wait_for
+
+
+def server_command(mode, port, args):
+    if mode == 'asgi':
+        return [sys.executable, '-m', 'uvicorn', 'asgi:application', '--port', str(port),
+                '--workers', str(args.workers), '--log-level', 'warning']
+    command = [sys.executable, '-m', 'gunicorn', 'app:app', '--bind', f'127.0.0.1:{port}',
+               '--workers', str(args.workers), '--log-level', 'warning']
+    if mode == 'gthread':
+        command += ['--worker-class', 'gthread', '--threads', str(args.threads)]
+    return command
+
+
+def hold_streams(base_url, count):
+    """Open count price streams at once, each read on its own thread; returns the accepted ones"""
+    accepted = []
+    lock = threading.Lock()
+    answered = threading.Semaphore(0)
+
+    def hold():
+        try:
+            # Keep-alives arrive every 15s, inside the read timeout
+            response = requests.get(base_url + '/api/stream', stream=True, timeout=(5, 30))
+        except requests.RequestException:
+            answered.release()
+            return
+        if response.status_code == 200:
+            with lock:
+                accepted.append(response)
+        answered.release()
+        try:
+            for _ in response.iter_content(chunk_size=None):
+                pass
+        except Exception:
+            pass
+        finally:
+            response.close()
+
+    for _ in range(count):
+        threading.Thread(target=hold, daemon=True).start()
+    for _ in range(count):
+        answered.acquire()
+    return accepted
+
+
+def drive(base_url, mode, clients, duration):
+    """[(seconds, ok)] for every dashboard load by clients concurrent sessions"""
+    samples = []
+    lock = threading.Lock()
+    stop_at = []
+    ready = threading.Barrier(clients + 1, action=lambda: stop_at.append(time.monotonic() + duration))
+
+    def client(i):
+        session = requests.Session()
+        session.post(base_url + '/register', data={'username': f'{mode}_{i}'}, timeout=60)
+        ready.wait()
+        while time.monotonic() < stop_at[0]:
+            start = time.perf_counter()
+            try:
+                response = session.get(base_url + '/dashboard', timeout=60, allow_redirects=False)
+                ok = response.status_code == 200
+            except requests.RequestException:
+                ok = False
+            elapsed = time.perf_counter() - start
+            with lock:
+                samples.append((elapsed, ok))
+
+    threads = [threading.Thread(target=client, args=(i,), daemon=True) for i in range(clients)]
+    for thread in threads:
+        thread.start()
+    ready.wait()
+    started = time.perf_counter()
+    for thread in threads:
+        thread.join()
+    return samples, time.perf_counter() - started
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--modes', default='sync,gthread,asgi', help='comma separated: sync, gthread, asgi')
+    parser.add_argument('--clients', type=int, default=64, help='concurrent dashboard clients')
+    parser.add_argument('--duration', type=float, default=15.0, help='seconds per mode')
+    parser.add_argument('--latency-ms', type=float, default=20.0, help='added to every storage call')
+    parser.add_argument('--workers', type=int, default=2, help='server processes')
+    parser.add_argument('--threads', type=int, default=16, help='gthread threads per worker')
+    parser.add_argument('--asgi-threads', type=int, default=64, help='ASGI pool threads per worker')
+    parser.add_argument('--streams', type=int, default=0, help='price streams held open during the run')
+    parser.add_argument('--output', help='write results as JSON to this file')
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix='serving-')
+    os.environ.update({
+        'STORAGE_BACKEND': 'sqlite',
+        'STORAGE_PATH': os.path.join(workdir, 'serving.db'),
+        'TICK_HISTORY_DIR': os.path.join(workdir, 'tick_history'),
+        'EVENT_LOG_DIR': os.path.join(workdir, 'event_log'),
+        'DOW_FIXTURE': os.environ.get('DOW_FIXTURE', '40000'),
+        'FLASK_SECRET_KEY': 'serving-benchmark',
+    })
+
+    # Ticks keep the heartbeat fresh so the dashboard doesn't redirect to market-down
+    import main as simulator
+    simulator.update_stocks()
+    stop = threading.Event()
+
+    def tick_loop():
+        while not stop.wait(1.0):
+            simulator.update_stocks()
+
+    threading.Thread(target=tick_loop, daemon=True).start()
+
+    server_env = dict(os.environ, STORAGE_LATENCY_MS=str(args.latency_ms), ASGI_THREADS=str(args.asgi_threads))
+    results = {}
+    try:
+        for mode in args.modes.split(','):
+            port = free_port()
+            base_url = f'http://127.0.0.1:{port}'
+            server = subprocess.Popen(server_command(mode, port, args), env=server_env)
+            try:
+                wait_for(base_url + '/')
+                streams = hold_streams(base_url, 0 if mode == 'sync' else args.streams)
+                print(f"Driving {args.clients} clients against {mode} for {args.duration:.0f}s "
+                      f"with {len(streams)} streams open...")
+                try:
+                    samples, elapsed = drive(base_url, mode, args.clients, args.duration)
+                finally:
+                    for response in streams:
+                        response.close()
+                results[mode] = dict(summarize(samples, elapsed), streams=len(streams))
+            finally:
+                server.terminate()
+                server.wait()
+    finally:
+        stop.set()
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    print(f"\n{args.latency_ms:g} ms per storage call, {args.workers} workers\n")
+    print(f"{'mode':<10} {'streams':>7} {'count':>7} {'errors':>6} {'req/s':>8} {'p50 ms':>8} {'p95 ms':>8} "
+          f"{'p99 ms':>8}")
+    for mode, stats in results.items():
+        print(f"{mode:<10} {stats['streams']:>7} {stats['count']:>7} {stats['errors']:>6} "
+              f"{stats['throughput']:>8.1f} {stats['p50_ms'] or 0:>8.1f} {stats['p95_ms'] or 0:>8.1f} "
+              f"{stats['p99_ms'] or 0:>8.1f}")
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({'commit': git_commit(), 'config': vars(args), 'modes': results}, f, indent=2)
+        print(f"\n✅ Results written to {args.output}")
+
+
+if __name__ == '__main__':
+    main()
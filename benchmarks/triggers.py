@@ -0,0 +1,96 @@
+"""Tick time of the sorted trigger index with a million registered triggers.
+
+Registers stop-loss, take-profit and alert triggers around each symbol's
+price, drives random-walk ticks through them and times TriggerIndex.fire,
+re-registering what fired so the index stays the same size. With --check,
+every tick's fired set is compared against a brute-force scan.
+
+Run from the repository root:  python -m benchmarks.triggers
+"""
+import argparse
+import random
+import time
+
+from triggers import KINDS, Trigger, TriggerIndex
+
+
+def random_trigger(rng, trigger_id, symbol, price):
+    kind = rng.choice(tuple(KINDS))
+    if kind == 'stop_loss':
+        level = price * rng.uniform(0.9, 0.999)
+    elif kind == 'take_profit':
+        level = price * rng.uniform(1.001, 1.1)
+    else:
+        level = price * rng.uniform(0.9, 1.1)
+    return Trigger(trigger_id, f'user{rng.randrange(10_000)}', symbol, kind, round(level, 2),
+                   rng.randint(1, 100))
+
+
+def crossed(trigger, old, new):
+    """Brute-force reference for which triggers a move from old to new fires"""
+    direction = KINDS[trigger.kind]
+    if new < old and direction in ('down', 'both'):
+        return new <= trigger.level < old
+    if new > old and direction in ('up', 'both'):
+        return old < trigger.level <= new
+    return False
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--triggers', type=int, default=1_000_000)
+    parser.add_argument('--symbols', type=int, default=100)
+    parser.add_argument('--ticks', type=int, default=200)
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--check', action='store_true', help='verify against a brute-force scan (slow)')
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    symbols = [f'SYN{i:05d}' for i in range(args.symbols)]
+    prices = [rng.uniform(10, 1000) for _ in symbols]
+    index = TriggerIndex()
+    next_id = 0
+
+    start = time.perf_counter()
+    for _ in range(args.triggers):
+        i = rng.randrange(args.symbols)
+        index.add(random_trigger(rng, str(next_id), symbols[i], prices[i]), prices[i])
+        next_id += 1
+    print(f"Registered {args.triggers:,} triggers in {time.perf_counter() - start:.2f}s")
+
+    fired_total = 0
+    fire_time = 0.0
+    worst_tick = 0.0
+    for _ in range(args.ticks):
+        old_prices = prices
+        prices = [max(1, round(p * (1 + rng.uniform(-0.005, 0.005)), 2)) for p in prices]
+        if args.check:
+            by_symbol = dict(zip(symbols, zip(old_prices, prices)))
+            expected = {t.id for t in index.open_triggers() if crossed(t, *by_symbol[t.symbol])}
+
+        t = time.perf_counter()
+        fired = index.fire(symbols, old_prices, prices)
+        elapsed = time.perf_counter() - t
+        fire_time += elapsed
+        worst_tick = max(worst_tick, elapsed)
+        fired_total += len(fired)
+
+        if args.check and {trigger.id for trigger, _ in fired} != expected:
+            raise SystemExit("❌ Fired set differs from the brute-force scan")
+
+        # Replace what fired so the index stays the same size
+        for _ in fired:
+            i = rng.randrange(args.symbols)
+            index.add(random_trigger(rng, str(next_id), symbols[i], prices[i]), prices[i])
+            next_id += 1
+
+    print(f"Open triggers:        {len(index):,}")
+    print(f"Triggers fired:       {fired_total:,} over {args.ticks} ticks")
+    print(f"Mean tick fire time:  {fire_time / args.ticks * 1000:.3f} ms")
+    print(f"Worst tick fire time: {worst_tick * 1000:.3f} ms")
+    if args.check:
+        print("✅ Every tick matched the brute-force scan")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,71 @@
+"""Revaluing every account per tick: holdings matrix versus a per-user loop.
+
+Fills a HoldingsMatrix with random accounts, then times one tick's
+matrix-vector revaluation and the write-back selection against the
+per-user dictionary loop the simulator used before.
+
+Run from the repository root:  python -m benchmarks.valuation
+"""
+import argparse
+import random
+import time
+
+import numpy as np
+
+from valuation import HoldingsMatrix
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--users', type=int, default=100_000)
+    parser.add_argument('--symbols', type=int, default=100)
+    parser.add_argument('--holdings', type=int, default=5, help='symbols held per user')
+    parser.add_argument('--ticks', type=int, default=20)
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    symbols = [f'SYN{i:05d}' for i in range(args.symbols)]
+    prices = np.array([rng.uniform(10, 1000) for _ in symbols])
+    accounts = {
+        f'user{i}': (rng.uniform(0, 100_000),
+                     {symbol: rng.randint(1, 100) for symbol in rng.sample(symbols, args.holdings)})
+        for i in range(args.users)
+    }
+    matrix = HoldingsMatrix(symbols)
+    for username, (cash, positions) in accounts.items():
+        matrix.set_account(username, cash, positions)
+
+    matrix_time = loop_time = stale_time = 0.0
+    stale = 0
+    for _ in range(args.ticks):
+        prices = prices * (1 + np.array([rng.uniform(-0.002, 0.002) for _ in symbols]))
+
+        t = time.perf_counter()
+        matrix.revalue(prices)
+        matrix_time += time.perf_counter() - t
+
+        t = time.perf_counter()
+        rows = matrix.stale()
+        changed = matrix.accounts(rows)
+        matrix.mark_written(rows)
+        stale_time += time.perf_counter() - t
+        stale += len(changed)
+
+        by_symbol = dict(zip(symbols, prices.tolist()))
+        t = time.perf_counter()
+        looped = {username: cash + sum(by_symbol[s] * q for s, q in positions.items())
+                  for username, (cash, positions) in accounts.items()}
+        loop_time += time.perf_counter() - t
+
+    worst = max(abs(matrix.values[matrix.rows[u]] - v) for u, v in looped.items())
+    print(f"Accounts:               {len(matrix):,} x {args.symbols} symbols")
+    print(f"Matrix revalue:         {matrix_time / args.ticks * 1000:.2f} ms per tick")
+    print(f"Per-user loop:          {loop_time / args.ticks * 1000:.2f} ms per tick")
+    print(f"Write-back selection:   {stale_time / args.ticks * 1000:.2f} ms per tick "
+          f"({stale / args.ticks:,.0f} accounts moved)")
+    print(f"Largest difference:     {worst:.2e}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,175 @@
+"""Tick cadence of the real update_stocks path while storage latency spikes.
+
+Runs main.update_stocks on a fixed-rate TickScheduler against the memory
+backend, with every storage call (reads, writes, conditional writes and
+ledger pushes) taking --latency-ms, and storage stalling for --spike-seconds
+every --spike-every seconds: a call made during a stall waits it out.
+Meanwhile a web client keeps adding executions and marketable limit orders
+straight to storage, so each tick has requests to take in and fills to
+settle. Two modes run one after the other:
+
+    sync   the tick's writes go straight to storage (the old behaviour)
+    queue  the write-behind queue
+
+Reported per mode: ticks run and missed, tick duration percentiles, how far
+stored data fell behind, and how many web orders were filled by the end
+(plus up to --drain-seconds for settlement to catch up).
+
+Run from the repository root:  python -m benchmarks.write_behind --spike-seconds 2
+"""
+import argparse
+import os
+import shutil
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+
+import numpy as np
+
+from scheduler import TickScheduler
+from storage import DelayedStorage, new_push_id
+
+
+class SpikyStorage(DelayedStorage):
+    """DelayedStorage that stalls for spike_seconds at the start of every spike_every seconds"""
+
+    def __init__(self, inner, latency, spike_every, spike_seconds):
+        self.inner = inner
+        self.latency = latency
+        self.spike_every = spike_every
+        self.spike_seconds = spike_seconds
+        self.started = time.monotonic()
+
+    @property
+    def delay(self):
+        phase = (time.monotonic() - self.started) % self.spike_every
+        return self.latency + max(0.0, self.spike_seconds - phase)
+
+
+class SyncWrites:
+    """The write-behind interface, writing on the caller's thread"""
+
+    def __init__(self, store):
+        self.store = store
+
+    def put(self, updates):
+        if updates:
+            self.store.update('', updates)
+
+    def get(self, path=''):
+        return self.store.get(path)
+
+    def flush(self, timeout=None):
+        return True
+
+    def stats(self):
+        return {'depth': 0, 'lag_seconds': 0.0}
+
+
+def web_client(store, stop, symbols, interval):
+    """Add an execution and a marketable buy order every interval, like the web app"""
+    i = 0
+    while not stop.wait(interval):
+        username = f'web_{i % 20}'
+        symbol = symbols[i % len(symbols)]
+        store.set(f'executions/{new_push_id()}', {'stock': symbol, 'quantity': 1, 'user': username})
+        store.set(f'order_requests/{new_push_id()}', {'owner': username, 'symbol': symbol, 'side': 'buy',
+                                                      'kind': 'limit', 'price': 1e6, 'quantity': 1})
+        i += 1
+
+
+def run(simulator, mode, args):
+    from write_behind import WriteBehindQueue
+    if mode == 'sync':
+        simulator.writes = SyncWrites(simulator.store)
+    else:
+        simulator.writes = WriteBehindQueue(simulator.store)
+    simulator.settlement = ThreadPoolExecutor(max_workers=1, thread_name_prefix='settlement')
+
+    web_store = simulator.store.inner.inner
+    for i in range(20):
+        web_store.set(f'users/web_{i}', {'username': f'web_{i}', 'cash_balance': 1e12, 'portfolio': {},
+                                         'total_portfolio_value': 1e12, 'revision': 1})
+    scheduler = TickScheduler(args.interval)
+    durations = []
+    max_lag = [0.0]
+    end = time.monotonic() + args.seconds
+
+    def tick(k):
+        started = time.perf_counter()
+        simulator.update_stocks()
+        durations.append(time.perf_counter() - started)
+        max_lag[0] = max(max_lag[0], simulator.writes.stats()['lag_seconds'])
+        if time.monotonic() >= end:
+            scheduler.stop()
+
+    stop = threading.Event()
+    client = threading.Thread(target=web_client, args=(web_store, stop, simulator.price_book.symbols, 0.2),
+                              daemon=True)
+    client.start()
+    thread = threading.Thread(target=scheduler.run, args=(tick,))
+    thread.start()
+    thread.join()
+    stop.set()
+    client.join()
+
+    # Give the fills and writes of the last ticks a moment to land before counting
+    wait([simulator.settlement.submit(lambda: None)], timeout=args.drain_seconds)
+    simulator.settlement.shutdown(wait=False, cancel_futures=True)
+    simulator.writes.flush(timeout=args.drain_seconds)
+    orders = web_store.get('orders') or {}
+    filled = sum(1 for user_orders in orders.values() for order in user_orders.values()
+                 if order.get('status') == 'filled')
+    web_store.set('orders', None)
+    stats = scheduler.stats()
+    return {
+        'ticks': stats['ticks'],
+        'missed': stats['missed'],
+        'p50_ms': float(np.percentile(durations, 50)) * 1000,
+        'p99_ms': float(np.percentile(durations, 99)) * 1000,
+        'max_ms': max(durations) * 1000,
+        'max_lag_s': max_lag[0],
+        'filled': filled,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--interval', type=float, default=0.1, help='seconds between ticks')
+    parser.add_argument('--seconds', type=float, default=10.0, help='run time per mode')
+    parser.add_argument('--latency-ms', type=float, default=20.0, help='normal storage round trip')
+    parser.add_argument('--spike-every', type=float, default=5.0, help='seconds between stalls')
+    parser.add_argument('--spike-seconds', type=float, default=2.0, help='length of each stall')
+    parser.add_argument('--drain-seconds', type=float, default=10.0, help='wait for settlement at the end')
+    parser.add_argument('--modes', default='sync,queue')
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix='write-behind-')
+    os.environ.update({
+        'STORAGE_BACKEND': 'memory',
+        'TICK_HISTORY_DIR': os.path.join(workdir, 'tick_history'),
+        'EVENT_LOG_DIR': os.path.join(workdir, 'event_log'),
+        'DOW_FIXTURE': os.environ.get('DOW_FIXTURE', '40000'),
+        'METRICS_PORT': '0',
+    })
+    try:
+        import main as simulator
+        simulator.store.inner = SpikyStorage(simulator.store.inner, args.latency_ms / 1000,
+                                             args.spike_every, args.spike_seconds)
+        simulator.inbox.start()
+
+        print(f"{args.interval * 1000:.0f}ms ticks for {args.seconds:g}s; storage {args.latency_ms:g}ms, "
+              f"stalling {args.spike_seconds:g}s every {args.spike_every:g}s\n")
+        print(f"{'mode':<6} {'ticks':>6} {'missed':>7} {'p50 ms':>8} {'p99 ms':>8} {'max ms':>8} "
+              f"{'max lag s':>10} {'filled':>7}")
+        for mode in args.modes.split(','):
+            r = run(simulator, mode, args)
+            print(f"{mode:<6} {r['ticks']:>6} {r['missed']:>7} {r['p50_ms']:>8.1f} {r['p99_ms']:>8.1f} "
+                  f"{r['max_ms']:>8.1f} {r['max_lag_s']:>10.2f} {r['filled']:>7}")
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,116 @@
+"""Incrementally maintained OHLCV candles at several resolutions"""
+import threading
+import time
+
+import numpy as np
+
+RESOLUTIONS = (('1s', 1), ('1m', 60), ('5m', 300), ('1h', 3600), ('1d', 86400))
+
+# 1-second bars repeat the tick history, so only coarser bars are stored
+PERSISTED = ('1m', '5m', '1h', '1d')
+
+
+def bar_start(timestamp, seconds):
+    """Start (epoch seconds) of the bar containing timestamp, aligned to local time"""
+    offset = time.localtime(timestamp).tm_gmtoff
+    return int((timestamp + offset) // seconds * seconds - offset)
+
+
+class CandleSeries:
+    """The bars currently being built for every symbol at one resolution"""
+
+    def __init__(self, name, seconds, size):
+        self.name = name
+        self.seconds = seconds
+        self.start = None
+        self.open = np.zeros(size)
+        self.high = np.zeros(size)
+        self.low = np.zeros(size)
+        self.close = np.zeros(size)
+        self.volume = np.zeros(size)
+
+    def reset(self, start, prices):
+        self.start = start
+        self.open[:] = prices
+        self.high[:] = prices
+        self.low[:] = prices
+        self.close[:] = prices
+        self.volume[:] = 0
+
+    def snapshot(self):
+        return (self.name, self.start, self.open.copy(), self.high.copy(),
+                self.low.copy(), self.close.copy(), self.volume.copy())
+
+
+class CandleBook:
+    """Candles for a fixed list of symbols, updated in O(1) per symbol per tick.
+
+    ``update`` folds one tick of prices into every resolution; bars that roll
+    over are queued until ``drain_updates`` hands them to storage in bulk.
+    """
+
+    def __init__(self, symbols, keys=None, resolutions=RESOLUTIONS, persisted=PERSISTED):
+        self.symbols = list(symbols)
+        self.keys = list(keys or self.symbols)
+        self.index = {symbol: i for i, symbol in enumerate(self.symbols)}
+        self.series = [CandleSeries(name, seconds, len(self.symbols)) for name, seconds in resolutions]
+        self.persisted = set(persisted)
+        self._completed = []
+        self._lock = threading.Lock()
+
+    def update(self, timestamp, prices):
+        """Fold one tick (epoch seconds, prices ordered like symbols) into every bar"""
+        with self._lock:
+            for series in self.series:
+                start = bar_start(timestamp, series.seconds)
+                if series.start is None:
+                    series.reset(start, prices)
+                elif start != series.start:
+                    self._completed.append(series.snapshot())
+                    series.reset(start, prices)
+                else:
+                    np.maximum(series.high, prices, out=series.high)
+                    np.minimum(series.low, prices, out=series.low)
+                    series.close[:] = prices
+
+    def add_volume(self, symbol, quantity):
+        """Count traded shares towards the bars in progress"""
+        i = self.index.get(symbol)
+        if i is None:
+            return
+        with self._lock:
+            for series in self.series:
+                series.volume[i] += quantity
+
+    def current(self, symbol, resolution):
+        """The bar being built right now, or None before the first tick"""
+        i = self.index[symbol]
+        for series in self.series:
+            if series.name == resolution:
+                if series.start is None:
+                    return None
+                return bar_dict(series.start, series.open[i], series.high[i],
+                                series.low[i], series.close[i], series.volume[i])
+        raise KeyError(resolution)
+
+    def drain_updates(self):
+        """Completed bars as one multi-path update: candles/<res>/<key>/<start>"""
+        with self._lock:
+            completed, self._completed = self._completed, []
+
+        updates = {}
+        for name, start, opens, highs, lows, closes, volumes in completed:
+            if name not in self.persisted:
+                continue
+            rows = zip(self.keys, opens.tolist(), highs.tolist(), lows.tolist(),
+                       closes.tolist(), volumes.tolist())
+            for key, o, h, l, c, v in rows:
+                updates[f'candles/{name}/{key}/{start}'] = {
+                    'open': o, 'high': h, 'low': l, 'close': c, 'volume': v
+                }
+        return updates
+
+
+def bar_dict(start, o, h, l, c, v):
+    return {'time': int(start), 'open': float(o), 'high': float(h),
+            'low': float(l), 'close': float(c), 'volume': float(v)}
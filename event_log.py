@@ -0,0 +1,162 @@
+"""Append-only log of simulator state changes, with periodic snapshots.
+
+The log is a directory of numbered segments and snapshots::
+
+    <root>/events-000000000000.log     events 0 .. n-1
+    <root>/snapshot-000000003600.pkl   full state after event 3600
+    <root>/events-000000003600.log     events 3600 ..
+
+Every record is a fixed header (payload length, kind, epoch-ms) and a
+payload: raw float64 prices for ticks, compact JSON for everything else. A
+snapshot closes the current segment and starts the next, so recovery loads
+the newest snapshot and replays one short segment, however long the history.
+A record cut off by a crash is ignored on replay.
+"""
+import json
+import os
+import pickle
+import struct
+import threading
+from array import array
+
+TICK = 1
+TRADE = 2
+ACCOUNT = 3
+MARKET = 4
+SPECIAL = 5
+
+_HEADER = struct.Struct('<IBq')
+
+
+def _name(prefix, seq, suffix):
+    return f'{prefix}-{seq:012d}.{suffix}'
+
+
+def _numbered(root, prefix, suffix):
+    """Sorted (seq, path) for every file named <prefix>-<seq>.<suffix> in root"""
+    found = []
+    for name in os.listdir(root):
+        if name.startswith(prefix + '-') and name.endswith('.' + suffix):
+            try:
+                found.append((int(name[len(prefix) + 1:-len(suffix) - 1]), os.path.join(root, name)))
+            except ValueError:
+                pass
+    return sorted(found)
+
+
+def read_segment(path):
+    """Yield (kind, timestamp_ms, value) for every complete record in a segment"""
+    with open(path, 'rb') as f:
+        data = f.read()
+    offset = 0
+    while offset + _HEADER.size <= len(data):
+        length, kind, timestamp_ms = _HEADER.unpack_from(data, offset)
+        start = offset + _HEADER.size
+        if start + length > len(data):
+            break
+        payload = data[start:start + length]
+        if kind == TICK:
+            value = array('d', payload).tolist()
+        else:
+            value = json.loads(payload)
+        yield kind, timestamp_ms, value
+        offset = start + length
+
+
+class EventLog:
+    """Writer and recovery for one log directory (safe to share between threads)"""
+
+    def __init__(self, root, snapshot_every=3600, keep=2):
+        self.root = root
+        self.snapshot_every = snapshot_every
+        self.keep = keep
+        os.makedirs(root, exist_ok=True)
+        self._lock = threading.Lock()
+        self._file = None
+        self.seq = 0
+        self.snapshot_seq = 0
+
+    def _open_segment(self):
+        self._file = open(os.path.join(self.root, _name('events', self.seq, 'log')), 'ab')
+
+    def _append(self, kind, timestamp_ms, payload):
+        with self._lock:
+            if self._file is None:
+                self._open_segment()
+            self._file.write(_HEADER.pack(len(payload), kind, timestamp_ms) + payload)
+            self._file.flush()
+            self.seq += 1
+
+    def tick(self, timestamp_ms, prices):
+        """Log a tick's new prices as raw float64"""
+        self._append(TICK, timestamp_ms, array('d', prices).tobytes())
+
+    def record(self, kind, timestamp_ms, data):
+        """Log any other state change as compact JSON"""
+        self._append(kind, timestamp_ms, json.dumps(data, separators=(',', ':')).encode())
+
+    def due(self):
+        return self.seq - self.snapshot_seq >= self.snapshot_every
+
+    def snapshot(self, state):
+        """Write state as of the current event and start a new segment"""
+        with self._lock:
+            path = os.path.join(self.root, _name('snapshot', self.seq, 'pkl'))
+            with open(path + '.tmp', 'wb') as f:
+                pickle.dump({'seq': self.seq, 'state': state}, f, protocol=pickle.HIGHEST_PROTOCOL)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(path + '.tmp', path)
+            if self._file is not None:
+                self._file.close()
+            self._open_segment()
+            self.snapshot_seq = self.seq
+            self._prune()
+
+    def _prune(self):
+        """Keep the newest keep snapshots and the segments needed to replay from them"""
+        snapshots = _numbered(self.root, 'snapshot', 'pkl')
+        if len(snapshots) <= self.keep:
+            return
+        oldest_kept = snapshots[-self.keep][0]
+        for seq, path in snapshots[:-self.keep]:
+            os.remove(path)
+        for seq, path in _numbered(self.root, 'events', 'log'):
+            if seq < oldest_kept:
+                os.remove(path)
+
+    def recover(self):
+        """(state or None, [(kind, timestamp_ms, value)] logged after it)
+
+        Also positions the writer so new events continue the sequence.
+        """
+        state = None
+        start = 0
+        for seq, path in reversed(_numbered(self.root, 'snapshot', 'pkl')):
+            try:
+                with open(path, 'rb') as f:
+                    saved = pickle.load(f)
+            except (OSError, EOFError, pickle.UnpicklingError):
+                continue
+            state, start = saved['state'], saved['seq']
+            break
+
+        events = []
+        for seq, path in _numbered(self.root, 'events', 'log'):
+            if seq >= start:
+                events.extend(read_segment(path))
+
+        with self._lock:
+            self.snapshot_seq = start
+            self.seq = start + len(events)
+            # Later events go to a fresh segment so a torn tail is never appended to
+            if self._file is not None:
+                self._file.close()
+            self._file = None
+        return state, events
+
+    def close(self):
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
@@ -0,0 +1,111 @@
+"""Per-tick heartbeat published by the simulator and checked by the web app"""
+import threading
+import time
+
+# The updater counts as down when its last tick is older than this (seconds)
+MAX_LAG = 60
+
+
+class Heartbeat:
+    """Simulator side: builds the small record written with every tick"""
+
+    def __init__(self, smoothing=0.1):
+        self.smoothing = smoothing
+        self.seq = 0
+        self.started_at = int(time.time() * 1000)
+        self.last_duration_ms = None
+        self.interval_ms = None
+        self._tick_started = None
+        self._last_tick_started = None
+
+    def begin(self):
+        """Mark the start of a tick"""
+        now = time.monotonic()
+        if self._last_tick_started is not None:
+            interval = (now - self._last_tick_started) * 1000
+            if self.interval_ms is None:
+                self.interval_ms = interval
+            else:
+                # Exponentially weighted so one slow tick doesn't dominate
+                self.interval_ms += self.smoothing * (interval - self.interval_ms)
+        self._last_tick_started = self._tick_started = now
+
+    def record(self, market_status='open', schedule=None):
+        """The heartbeat for the tick in progress, with the scheduler's stats if given"""
+        self.seq += 1
+        record = {
+            'seq': self.seq,
+            'timestamp': int(time.time() * 1000),
+            'started_at': self.started_at,
+            'duration_ms': None if self.last_duration_ms is None else round(self.last_duration_ms, 3),
+            'interval_ms': None if self.interval_ms is None else round(self.interval_ms, 3),
+            'market_status': market_status,
+        }
+        if schedule is not None:
+            record['missed_ticks'] = schedule['missed']
+            record['jitter_ms'] = schedule['jitter_ms']
+        return record
+
+    def end(self):
+        """Mark the end of a tick (after its writes were handed off)"""
+        if self._tick_started is not None:
+            self.last_duration_ms = (time.monotonic() - self._tick_started) * 1000
+            self._tick_started = None
+
+
+class HealthMonitor:
+    """Web side: one small cached read of the heartbeat instead of a stock scan"""
+
+    def __init__(self, store, ttl=1.0, max_lag=MAX_LAG):
+        self.store = store
+        self.ttl = ttl
+        self.max_lag = max_lag
+        self._lock = threading.Lock()
+        self._checked_at = None
+        self._heartbeat = None
+        self._market_status = None
+        self._previous = None
+
+    def _refresh(self):
+        heartbeat = self.store.get('heartbeat') or {}
+        market_status = heartbeat.get('market_status')
+        if market_status is None:
+            # Simulators that predate the heartbeat only publish the flag
+            market_status = self.store.get('market_status')
+        if self._heartbeat and self._heartbeat.get('seq') != heartbeat.get('seq'):
+            self._previous = self._heartbeat
+        self._heartbeat = heartbeat
+        self._market_status = market_status
+        self._checked_at = time.monotonic()
+
+    def status(self):
+        """Health of the updater and its tick statistics"""
+        with self._lock:
+            if self._checked_at is None or time.monotonic() - self._checked_at > self.ttl:
+                self._refresh()
+            heartbeat, market_status, previous = self._heartbeat, self._market_status, self._previous
+
+        timestamp = heartbeat.get('timestamp')
+        lag = None if timestamp is None else max(0.0, time.time() - timestamp / 1000)
+        healthy = market_status != 'open' or (lag is not None and lag <= self.max_lag)
+
+        interval_ms = heartbeat.get('interval_ms')
+        observed_rate = None
+        if previous and timestamp and timestamp > previous.get('timestamp', timestamp):
+            observed_rate = (heartbeat['seq'] - previous['seq']) * 1000 / (timestamp - previous['timestamp'])
+
+        return {
+            'status': 'healthy' if healthy else 'down',
+            'market_status': market_status,
+            'lag_seconds': None if lag is None else round(lag, 3),
+            'seq': heartbeat.get('seq'),
+            'tick_duration_ms': heartbeat.get('duration_ms'),
+            'tick_interval_ms': interval_ms,
+            'ticks_per_second': round(1000 / interval_ms, 3) if interval_ms else None,
+            'observed_ticks_per_second': None if observed_rate is None else round(observed_rate, 3),
+            'missed_ticks': heartbeat.get('missed_ticks'),
+            'tick_jitter_ms': heartbeat.get('jitter_ms'),
+        }
+
+    def is_healthy(self):
+        return self.status()['status'] == 'healthy'
@@ -0,0 +1,77 @@
+"""Requests the web app leaves in storage, collected off the tick thread"""
+import threading
+
+
+class Inbox:
+    """Children of storage paths the web app appends to, read by a poller thread.
+
+    Every interval the poller reads each path and keeps the children it has
+    not handed out yet; the tick takes them from memory and queues their
+    deletion with its own writes. Keys stay remembered until a read no
+    longer returns them, so nothing is handed out twice while its deletion
+    is on its way to storage. on_new(path, children) runs on the poller
+    thread for every batch that arrives.
+    """
+
+    def __init__(self, read, paths, interval=0.25, on_new=None, on_error=None):
+        self.read = read
+        self.paths = list(paths)
+        self.interval = interval
+        self.on_new = on_new
+        self.on_error = on_error
+        self._lock = threading.Lock()
+        self._waiting = {path: {} for path in self.paths}
+        self._seen = {path: set() for path in self.paths}
+        self._stop = threading.Event()
+        self._thread = None
+        self.polls = 0
+        self.errors = 0
+
+    def poll(self):
+        """Read every path once; returns how many new children arrived"""
+        arrived = 0
+        for path in self.paths:
+            children = self.read(path) or {}
+            with self._lock:
+                seen = self._seen[path]
+                new = {key: value for key, value in children.items() if key not in seen}
+                # Keys that are gone have been deleted for good (push ids are never reused)
+                seen.intersection_update(children)
+                seen.update(new)
+                self._waiting[path].update(new)
+            if new and self.on_new is not None:
+                self.on_new(path, new)
+            arrived += len(new)
+        self.polls += 1
+        return arrived
+
+    def take(self, path):
+        """Everything that arrived under path since the last take (starts the poller)"""
+        if self._thread is None:
+            self.start()
+        with self._lock:
+            waiting, self._waiting[path] = self._waiting[path], {}
+        return waiting
+
+    def start(self):
+        """Start the poller (idempotent)"""
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._stop.clear()
+                self._thread = threading.Thread(target=self._run, name='inbox', daemon=True)
+                self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+
+    def _run(self):
+        while True:
+            try:
+                self.poll()
+            except Exception as e:
+                self.errors += 1
+                if self.on_error is not None:
+                    self.on_error(e)
+            if self._stop.wait(self.interval):
+                return
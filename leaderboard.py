@@ -0,0 +1,113 @@
+"""Leaderboard of total account value, kept up to date incrementally.
+
+Values come from valuation.HoldingsMatrix, which marks every account to
+market once per tick; the board only keeps them ranked. Accounts sit in one
+list sorted by (-value, username), so a user's rank is a binary search and
+the top N is a slice. A tick hands over just the rows whose value changed;
+when those are more than a small share of the board, the moved entries are
+merged back in one pass instead of being repositioned one at a time.
+
+Repositioning one account is a list delete and insert, so it shifts every
+entry after it: an O(n) memmove, about 0.4ms per account at a million
+accounts. That is cheap next to a trade's storage write, and a tick that
+moves many accounts takes the merge path instead; a balanced tree would make
+the single moves O(log n) at the cost of slower ranks and slices.
+"""
+import bisect
+import threading
+
+
+def account_from_document(user_data):
+    """(cash, {symbol: quantity}) from a console or web user document"""
+    cash = user_data.get('cash_balance', user_data.get('cash', 0.0))
+    holdings = {}
+    for symbol, position in (user_data.get('portfolio') or {}).items():
+        quantity = position['quantity'] if isinstance(position, dict) else position
+        if quantity:
+            holdings[symbol] = quantity
+    return float(cash), holdings
+
+
+class Leaderboard:
+    """Accounts of a HoldingsMatrix ranked by their value there (thread safe).
+
+    Values are read from the matrix while the board's lock is held, so
+    whichever refresh runs last ranks the newest value, however trades and
+    ticks interleave.
+    """
+
+    def __init__(self, holdings, rebuild_fraction=0.01):
+        self.holdings = holdings
+        self.rebuild_fraction = rebuild_fraction
+        self._values = {}
+        self._order = []
+        self._lock = threading.Lock()
+
+    def _place(self, username, value):
+        old = self._values.get(username)
+        if old is not None:
+            del self._order[bisect.bisect_left(self._order, (-old, username))]
+        if value is None:
+            self._values.pop(username, None)
+            return
+        self._values[username] = value
+        bisect.insort(self._order, (-value, username))
+
+    def _apply(self, changed):
+        """Rank {username: value or None}, merging when many entries moved"""
+        values = self._values
+        if len(changed) <= self.rebuild_fraction * len(values):
+            for username, value in changed.items():
+                self._place(username, value)
+            return
+        # Drop the moved entries and merge them back in sorted: two runs, one linear merge
+        order = [entry for entry in self._order if entry[1] not in changed]
+        order += sorted((-value, username) for username, value in changed.items() if value is not None)
+        order.sort()
+        self._order = order
+        for username, value in changed.items():
+            if value is None:
+                values.pop(username, None)
+            else:
+                values[username] = value
+
+    def refresh(self, usernames):
+        """Re-rank named accounts after they traded, joined or left the matrix"""
+        with self._lock:
+            self._apply({username: self.holdings.value(username) for username in usernames})
+
+    def refresh_rows(self, rows):
+        """Re-rank the matrix rows a revalue reported as moved; returns how many accounts moved"""
+        with self._lock:
+            changed = dict(self.holdings.accounts(rows))
+            self._apply(changed)
+            return len(changed)
+
+    def rank(self, username):
+        """(1-based rank, value) for one user, or None"""
+        with self._lock:
+            value = self._values.get(username)
+            if value is None:
+                return None
+            return bisect.bisect_left(self._order, (-value, username)) + 1, value
+
+    def top(self, n=10):
+        """[(rank, username, value)] for the n most valuable accounts"""
+        with self._lock:
+            return [(i + 1, username, -negative) for i, (negative, username) in enumerate(self._order[:n])]
+
+    def standings(self):
+        """[(rank, username, value)] for every account, best first.
+
+        Only the sorted list is copied under the lock; the rows are built
+        after releasing it, so a large board never holds up a tick.
+        """
+        with self._lock:
+            order = list(self._order)
+        return [(i + 1, username, -negative) for i, (negative, username) in enumerate(order)]
+
+    def value(self, username):
+        return self._values.get(username)
+
+    def __len__(self):
+        return len(self._values)
@@ -0,0 +1,68 @@
+"""Append-only, per-user transaction ledger stored apart from the user document.
+
+Transactions live under ``transactions/<username>/<push id>``. Push IDs sort
+chronologically, so key order is time order and history can be paged with
+key-range queries instead of downloading the whole list.
+"""
+from storage import new_push_id
+
+PAGE_SIZE = 20
+
+
+def ledger_path(username):
+    return f'transactions/{username}'
+
+
+def record_transaction(store, username, transaction):
+    """Append one transaction with a constant-size push; returns its id"""
+    return store.push(ledger_path(username), transaction)
+
+
+def history_page(store, username, limit=PAGE_SIZE, before=None):
+    """Up to `limit` transactions older than cursor `before`, newest first.
+
+    Returns ``(transactions, next_cursor)``; pass next_cursor back as
+    ``before`` for the following page. It is None on the last page.
+    """
+    if before is None:
+        rows = store.query(ledger_path(username), limit_to_last=limit + 1)
+    else:
+        # end_at is inclusive, so ask for one extra and drop the cursor itself
+        rows = store.query(ledger_path(username), end_at=before, limit_to_last=limit + 2)
+        rows.pop(before, None)
+
+    keys = sorted(rows)
+    has_more = len(keys) > limit
+    keys = keys[-limit:] if limit else []
+    transactions = [dict(rows[key], id=key) for key in reversed(keys)]
+    return transactions, (keys[0] if has_more and keys else None)
+
+
+def iter_history(store, username, page_size=PAGE_SIZE):
+    """Every transaction, newest first, fetched one page at a time"""
+    cursor = None
+    while True:
+        transactions, cursor = history_page(store, username, page_size, cursor)
+        yield from transactions
+        if cursor is None:
+            return
+
+
+def migrate_legacy_transactions(store, username, user_data):
+    """Move a transactions list embedded in the user document into the ledger.
+
+    Removes the list from user_data and, if there was one, writes the ledger
+    entries and deletes the embedded copy in one multi-path update.
+    """
+    legacy = user_data.pop('transactions', None)
+    if not legacy:
+        return False
+    if isinstance(legacy, dict):
+        legacy = [legacy[key] for key in sorted(legacy, key=int)]
+
+    updates = {f'users/{username}/transactions': None}
+    for transaction in legacy:
+        if transaction:
+            updates[f'{ledger_path(username)}/{new_push_id()}'] = transaction
+    store.update('', updates)
+    return True
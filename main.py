@@ -1,229 +1,609 @@
 import firebase_admin
-from firebase_admin import credentials, db
-import random
-from datetime import datetime, time as dt_time
+from firebase_admin import credentials
+import numpy as np
+from datetime import datetime
 import time
-import requests
-from requests.adapters import HTTPAdapter
-from urllib3.util.retry import Retry
 import cmd
+import os
+import queue
 import threading
+from concurrent.futures import ThreadPoolExecutor
+from reference_data import dow_reference
+from price_engine import PriceBook
+from tick_history import TickHistory, day_capacity
+from candles import CandleBook
+from heartbeat import Heartbeat
+from ledger import history_page, migrate_legacy_transactions, record_transaction
+from order_book import MatchingEngine, Order
+from triggers import Trigger, TriggerIndex
+from leaderboard import Leaderboard, account_from_document
+from valuation import HoldingsMatrix
+from accounts import TradeError, create_account, execute_trade
+from storage import ConflictError, child_page, iter_child_pages, new_push_id, open_storage
+from user_cache import UserCache
+from market_data import MARKET_CLOSE, MARKET_OPEN, special_events, stocks, symbol_groups, tick_intervals
+from event_log import ACCOUNT, MARKET, SPECIAL, TICK, TRADE, EventLog
+from schema import change_ratio, encode_stock, now_ms, stock_field
+from scheduler import MarketHours, SymbolSchedule, TickScheduler
+from metrics import counter, gauge, histogram, start_http_server, track_cache
+from write_behind import WriteBehindQueue
+from inbox import Inbox
 
-# Firebase Setup
-cred = credentials.Certificate('FakeStockSim Firebase Service Account.json')  # Replace with your actual path
-firebase_admin.initialize_app(cred, {
-    'databaseURL': 'https://fakestocksim-default-rtdb.firebaseio.com'
-})
-
-# Initial Stock Data
-stocks = {
-    'John Lawyers': {'name': 'John Lawyers', 'price': 94, 'previous_price': 94, 'closing_price': 94},
-    'Tidli Co': {'name': 'Tidli Co', 'price': 150, 'previous_price': 150, 'closing_price': 150},
-    'UMAE': {'name': 'UMAE', 'price': 500, 'previous_price': 500, 'closing_price': 500}
-}
-
-eevents = {
-    'John Lawyers': [
-        "launches strategic advertising campaign (+15%)",
-        "experiences critical equipment failure (-20%)",
-        "enters strategic partnership with Tesla (+25%)",
-        "secures victory in high-profile litigation (+30%)",
-        "suffers reputational damage from data breach (-40%)",
-        "completes merger with major competitor (+50%)"
-    ],
-    'Tidli Co': [
-        "successfully enters Tokyo market (+10%)",
-        "issues mass product recall due to safety concerns (-25%)",
-        "receives international environmental excellence award (+15%)",
-        "unveils groundbreaking product innovation (+40%)",
-        "faces leadership uncertainty after CEO resignation (-30%)",
-        "awarded high-value government infrastructure contract (+60%)"
-    ],
-    'UMAE': [
-        "launches Tokyo-based operations (+12%)",
-        "announces voluntary recall following product flaw (-22%)",
-        "recognized for sustainability innovation (+18%)",
-        "reveals breakthrough in renewable energy technology (+80%)",
-        "undergoes regulatory scrutiny amid compliance concerns (-45%)",
-        "forms alliance with SpaceX for joint development (+70%)"
-    ]
-}
-
-
-# Special event probabilities and impacts
-special_events = {
-    'John Lawyers': {
-        'probability': 0.05,  # 5% chance per update
-        'impacts': {
-            'wins major lawsuit': 0.30,  # +30%
-            'data breach scandal': -0.40,  # -40%
-            'merges with rival firm': 0.50  # +50%
-        }
-    },
-    'Tidli Co': {
-        'probability': 0.05,
-        'impacts': {
-            'launches revolutionary product': 0.40,
-            'CEO resigns': -0.30,
-            'secures government contract': 0.60
-        }
-    },
-    'UMAE': {
-        'probability': 0.05,
-        'impacts': {
-            'discovers new energy source': 0.80,
-            'regulatory investigation': -0.45,
-            'partners with SpaceX': 0.70
-        }
-    }
-}
+# Storage Setup (STORAGE_BACKEND=memory or sqlite runs without Firebase)
+STORAGE_BACKEND = os.getenv('STORAGE_BACKEND', 'firebase')
+if STORAGE_BACKEND == 'firebase':
+    cred = credentials.Certificate('FakeStockSim Firebase Service Account.json')  # Replace with your actual path
+    firebase_admin.initialize_app(cred, {
+        'databaseURL': 'https://fakestocksim-default-rtdb.firebaseio.com'
+    })
+store = open_storage(STORAGE_BACKEND)
 
-# User Management
-users = {}
+# Simulator writes go through a write-behind queue, so a slow or unavailable backend
+# delays them instead of the ticks; the backlog is bounded by WRITE_QUEUE_MAX_PATHS
+def report_write_error(error, attempt, delay):
+    if attempt == 1 or attempt % 10 == 0:
+        print(f"\n⚠️ Storage write failed ({error}), attempt {attempt}, retrying in {delay:.1f}s")
 
-# Market status
-market_open = True
+def report_write_recovery(attempts):
+    print(f"\n✅ Storage writes caught up after {attempts} failed attempt{'s' if attempts != 1 else ''}")
 
-def get_dow_previous_close():
-    try:
-        url = "https://query1.finance.yahoo.com/v8/finance/chart/%5EDJI?range=1d&interval=1d"
-        
-        headers = {
-            "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 "
-                          "(KHTML, like Gecko) Chrome/113.0.0.0 Safari/537.36"
-        }
+writes = WriteBehindQueue(store, max_paths=int(os.getenv('WRITE_QUEUE_MAX_PATHS', 100_000)),
+                          max_delay=float(os.getenv('WRITE_QUEUE_MAX_BACKOFF', 30.0)),
+                          on_error=report_write_error, on_recover=report_write_recovery)
 
-        # Set up a session with retry strategy
-        session = requests.Session()
-        retries = Retry(total=3, backoff_factor=1, status_forcelist=[502, 503, 504])
-        session.mount('https://', HTTPAdapter(max_retries=retries))
+# Executions and order requests from the web app are read by a poller thread, so the
+# tick never waits on storage; it takes whatever arrived since the last tick
+def refresh_traders(path, children):
+    """Re-read the accounts of web users who traded, on the settlement thread"""
+    if path == 'executions':
+        for username in {e['user'] for e in children.values() if 'user' in e}:
+            settlement.submit(refresh_account, username)
 
-        response = session.get(url, headers=headers, timeout=10)
-        response.raise_for_status()
+def report_inbox_error(error):
+    print(f"\n🔥 Error reading web requests: {error}")
 
-        data = response.json()
-        meta = data["chart"]["result"][0]["meta"]
-        return meta["chartPreviousClose"]
+inbox = Inbox(lambda path: writes.get(path), ['executions', 'order_requests'],
+              interval=float(os.getenv('INBOX_POLL_INTERVAL', 0.25)),
+              on_new=refresh_traders, on_error=report_inbox_error)
 
-    except Exception as e:
-        # Silent error handling
-        return 35000  # fallback
+# Fills and fired triggers settle on one thread after their tick's writes are queued:
+# web fills are conditional account writes and every fill appends to a ledger.
+# Volume traded off the tick thread reaches the candles through settled_volume.
+settlement = ThreadPoolExecutor(max_workers=1, thread_name_prefix='settlement')
+settled_volume = queue.SimpleQueue()
 
+# Array-backed price engine over the stock table
+price_book = PriceBook.from_tables(stocks, special_events)
+price_rng = np.random.default_rng()
 
-def market_open_now():
-    now = datetime.now().time()
-    return dt_time(9, 0) <= now <= dt_time(16, 0)
+# OHLCV candles built from the ticks and trade executions
+candle_book = CandleBook(price_book.symbols,
+                         keys=[comp.replace(" ", "_").replace(".", "") for comp in price_book.symbols])
 
-def calculate_percent_change(old_price, new_price):
-    """Calculate percentage change with + or - sign"""
-    if old_price == 0:
-        return "+0.00%"
-    
-    percent_change = ((new_price - old_price) / old_price) * 100
-    sign = "+" if percent_change >= 0 else ""
-    return f"{sign}{percent_change:.2f}%"
+# Tick heartbeat published with every update
+heartbeat = Heartbeat()
+
+# Simulator metrics, served at http://127.0.0.1:METRICS_PORT/metrics (0 turns it off)
+METRICS_PORT = int(os.getenv('METRICS_PORT', 9101))
+TICK_SECONDS = histogram('tick_duration_seconds', 'Time to run one tick, up to queueing its writes')
+TICK_ERRORS = counter('tick_errors_total', 'Ticks that raised')
+gauge('write_queue_depth', 'Paths waiting to be stored').set_function(lambda: writes.stats()['depth'])
+gauge('write_queue_lag_seconds', 'Age of the oldest write not yet stored').set_function(
+    lambda: writes.stats()['lag_seconds'])
+counter('write_queue_writes_total', 'Paths queued').set_function(lambda: writes.writes)
+counter('write_queue_coalesced_total', 'Queued paths superseded before they were stored').set_function(
+    lambda: writes.coalesced)
+counter('write_queue_failures_total', 'Storage updates that failed and were retried').set_function(
+    lambda: writes.failures)
+counter('inbox_poll_errors_total', 'Failed reads of web requests').set_function(lambda: inbox.errors)
+SETTLEMENT_ERRORS = counter('settlement_errors_total', 'Fill batches that raised')
+
+# Resting limit and stop orders, matched against every tick
+matching_engine = MatchingEngine()
+
+# Stop-loss, take-profit and price-alert triggers, fired by price crossings
+trigger_index = TriggerIndex()
+
+# Holdings of every account, revalued with one matrix-vector product per tick and
+# written back every VALUATION_INTERVAL seconds in updates of VALUATION_BATCH users
+holdings = HoldingsMatrix(price_book.symbols, price_book.price)
+
+# Every account ranked by the value the holdings matrix gives it, re-ranked on trades
+# and for the accounts each tick moved
+leaderboard = Leaderboard(holdings)
+VALUATION_INTERVAL = float(os.getenv('VALUATION_INTERVAL', 5.0))
+VALUATION_BATCH = int(os.getenv('VALUATION_BATCH', 1000))
+last_valuation_write = 0.0
+
+# The web app serves the leaderboard the simulator publishes from the settlement thread:
+# the top LEADERBOARD_SIZE accounts with every valuation write, and the ranks that moved
+# at most every LEADERBOARD_RANKS_INTERVAL seconds, since nearly every rank moves each time
+LEADERBOARD_SIZE = int(os.getenv('LEADERBOARD_SIZE', 100))
+LEADERBOARD_RANKS_INTERVAL = float(os.getenv('LEADERBOARD_RANKS_INTERVAL', 60.0))
+published_ranks = {}
+last_ranks_publish = 0.0
+leaderboard_publish = None
+
+# Every state change is logged locally and snapshotted every SNAPSHOT_EVERY events,
+# so a restart resumes from the last prices instead of the initial table
+event_log = EventLog(os.getenv('EVENT_LOG_DIR', 'event_log'),
+                     snapshot_every=int(os.getenv('SNAPSHOT_EVERY', 3600)))
+
+# Console users are loaded on first use and kept in a bounded LRU; changes are written
+# to storage with conditional writes, like web trades, before they reach the cache
+USER_CACHE_SIZE = int(os.getenv('USER_CACHE_SIZE', 1024))
+USER_PAGE_SIZE = int(os.getenv('USER_PAGE_SIZE', 1000))
+users = UserCache(lambda username: load_user(username), capacity=USER_CACHE_SIZE)
+track_cache('console_users', users)
+
+# Ticks are due every TICK_INTERVAL seconds on the monotonic clock during market
+# hours; TICK_POLICY (skip or catch_up) decides what happens to ticks missed
+# while one overran. Symbols in market_data.tick_intervals tick less often.
+TICK_INTERVAL = float(os.getenv('TICK_INTERVAL', 1.0))
+symbol_schedule = SymbolSchedule(price_book.symbols, TICK_INTERVAL, tick_intervals, symbol_groups)
+
+# Every tick is appended to the memory-mapped history store, in segments sized for a
+# session of TICK_INTERVAL ticks; a day with more ticks than that continues in a new one
+SESSION_SECONDS = (datetime.combine(datetime.min, MARKET_CLOSE) - datetime.combine(datetime.min, MARKET_OPEN)).seconds
+tick_history = TickHistory(os.getenv('TICK_HISTORY_DIR', 'tick_history'), price_book.symbols,
+                           capacity=day_capacity(TICK_INTERVAL, SESSION_SECONDS or 86400))
+HISTORY_ERRORS = counter('tick_history_errors_total', 'Ticks that could not be added to the history')
+
+def report_missed_ticks(count, overrun):
+    print(f"\n⏱️ Tick overran by {overrun * 1000:.0f}ms, skipped {count} tick{'s' if count != 1 else ''}")
+
+scheduler = TickScheduler(TICK_INTERVAL, policy=os.getenv('TICK_POLICY', 'skip'),
+                          max_catch_up=int(os.getenv('TICK_MAX_CATCH_UP', 10)),
+                          hours=MarketHours(MARKET_OPEN, MARKET_CLOSE),
+                          on_missed=report_missed_ticks)
+counter('ticks_missed_total', 'Scheduled ticks dropped after an overrun').set_function(lambda: scheduler.missed)
+
+# Market status
+market_open = True
 
-def update_stocks():
+# Dow reference, refreshed in the background (DOW_FIXTURE=<chart json> for offline runs)
+dow_provider = dow_reference(fixture=os.getenv('DOW_FIXTURE'))
+
+def get_dow_previous_close():
+    """Latest cached Dow previous close (never blocks on the network)"""
+    return dow_provider.get()
+
+
+def update_stocks(due=None):
+    """One tick; due optionally masks the symbols that move this tick"""
     if not market_open:
         return  # Don't update prices if market is closed
         
-    dow_reference = get_dow_previous_close()
+    heartbeat.begin()
 
-    for comp in stocks:
-        old_price = stocks[comp]['price']
-        stocks[comp]['previous_price'] = old_price
+    # Collect every write for this tick and send them as one multi-path update
+    now = datetime.now()
+    timestamp_ms = int(now.timestamp() * 1000)
+    updates = {}
 
-        # Check for special event
-        if random.random() < special_events[comp]['probability']:
-            event = random.choice(list(special_events[comp]['impacts'].keys()))
-            impact = special_events[comp]['impacts'][event]
-            price_change = old_price * impact
-            new_price = round(old_price + price_change, 2)
-            
-            # Log the special event
-            event_text = f"SPECIAL EVENT: {comp} {event} ({'+' if impact > 0 else ''}{impact*100:.0f}%)"
-            db.reference(f'events/{datetime.now().strftime("%Y-%m-%d_%H-%M-%S")}').set(event_text)
-            
-        else:
-            # Regular market movement
-            base_change = random.uniform(-0.2, 0.2)
-            dow_factor = random.uniform(0.9, 1.1)
-            price_change = old_price * (base_change / 100) * dow_factor
-            new_price = round(old_price + price_change, 2)
+    # Advance every due price in one vectorized step
+    tick = price_book.tick(price_rng, due)
+    try:
+        tick_history.append(timestamp_ms, tick.new_prices)
+    except (OSError, OverflowError, ValueError) as e:
+        # The prices have moved already; a gap in the chart beats dropping the tick's writes
+        HISTORY_ERRORS.inc()
+        print(f"\n⚠️ Tick not added to the history: {e}")
+    event_log.tick(timestamp_ms, tick.new_prices)
 
-        # Ensure price stays positive
-        new_price = max(1, new_price)
+    # Count web trades and settled fills towards volume, then fold the tick into the candles
+    for key, execution in inbox.take('executions').items():
+        candle_book.add_volume(execution['stock'], execution['quantity'])
+        updates[f'executions/{key}'] = None
+    while True:
+        try:
+            candle_book.add_volume(*settled_volume.get_nowait())
+        except queue.Empty:
+            break
+    candle_book.update(now.timestamp(), tick.new_prices)
+    updates.update(candle_book.drain_updates())
+    old_prices = tick.old_prices.tolist()
+    new_prices = tick.new_prices.tolist()
+
+    # Take in orders from the web app, then fill the resting orders this tick crossed
+    take_order_requests(updates)
+    fills = matching_engine.match(price_book.symbols, new_prices)
+
+    # Fire every trigger whose level this tick's move crossed
+    fired = trigger_index.fire(price_book.symbols, old_prices, new_prices)
+
+    # Log the special events
+    for i in tick.event_mask.nonzero()[0].tolist():
+        comp = price_book.symbols[i]
+        event = price_book.event_names[i][tick.event_index[i]]
+        impact = price_book.event_impacts[i, tick.event_index[i]]
+        event_text = f"SPECIAL EVENT: {comp} {event} ({'+' if impact > 0 else ''}{impact*100:.0f}%)"
+        updates[f'events/{now.strftime("%Y-%m-%d_%H-%M-%S")}'] = event_text
+        event_log.record(SPECIAL, timestamp_ms, {'stock': comp, 'event': event, 'impact': float(impact)})
+
+    # Mark every account to market and re-rank the ones whose value moved
+    leaderboard.refresh_rows(holdings.revalue(tick.new_prices))
+
+    for i, (comp, old_price, new_price) in enumerate(zip(price_book.symbols, old_prices, new_prices)):
+        if due is not None and not due[i]:
+            continue  # Not due this tick, so nothing changed
 
         # Update in local dict
+        stocks[comp]['previous_price'] = old_price
         stocks[comp]['price'] = new_price
-        
-        # Calculate percentage change
-        percent_change = calculate_percent_change(old_price, new_price)
 
         # Firebase-safe company name
         safe_name = comp.replace(" ", "_").replace(".", "")
 
-        # Push to Firebase
-        db.reference(f'stocks/{safe_name}').set({
-            'name': comp,
-            'price': str(new_price),
-            'change': percent_change,
-            'last_updated': datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-        })
+        # Numeric price and change, epoch-ms time (see schema.py)
+        updates[f'stocks/{safe_name}'] = encode_stock(comp, new_price, change_ratio(old_price, new_price),
+                                                      timestamp_ms)
 
-def load_users_from_firebase():
-    """Load existing users from Firebase"""
-    users_ref = db.reference('users')
-    users_data = users_ref.get()
-    if users_data:
-        # Ensure all users have required fields
-        for username, user_data in users_data.items():
-            if 'portfolio' not in user_data:
-                user_data['portfolio'] = {}
-            if 'transactions' not in user_data:
-                user_data['transactions'] = []
-            if 'cash' not in user_data:
-                user_data['cash'] = 0.0
-        return users_data
-    return {}
-
-def save_user_to_firebase(username, user_data):
-    """Save a user and their investment data to Firebase"""
-    # Ensure user data has all required fields
-    if 'portfolio' not in user_data:
-        user_data['portfolio'] = {}
-    if 'transactions' not in user_data:
-        user_data['transactions'] = []
-    if 'cash' not in user_data:
-        user_data['cash'] = 0.0
-    
-    # Calculate total portfolio value using current prices
-    portfolio_value = 0
-    formatted_portfolio = {}
-    for stock, qty in user_data['portfolio'].items():
-        current_price = get_stock_price(stock)
-        if current_price is not None:
-            stock_value = current_price * qty
-            portfolio_value += stock_value
-            formatted_portfolio[stock] = {
-                'quantity': qty,
-                'current_price': current_price,
-                'total_value': stock_value
-            }
-
-    total_value = user_data['cash'] + portfolio_value
-
-    # Create the user data structure
-    firebase_data = {
-        'username': username,
-        'cash_balance': user_data['cash'],
-        'portfolio': formatted_portfolio,
-        'total_portfolio_value': total_value,
-        'last_updated': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
-        'transactions': user_data['transactions']  # Keep transaction history
+    # Publish the heartbeat the web app uses to check the updater is alive
+    updates['heartbeat'] = heartbeat.record(schedule=scheduler.stats())
+
+    # Hand the whole tick to the write-behind queue, then settle its fills behind it
+    writes.put(updates)
+    if fills or fired:
+        settlement.submit(settle, fills, fired, timestamp_ms)
+    heartbeat.end()
+    TICK_SECONDS.observe(heartbeat.last_duration_ms / 1000)
+
+    if time.monotonic() - last_valuation_write >= VALUATION_INTERVAL:
+        write_valuations(timestamp_ms)
+        schedule_leaderboard(timestamp_ms)
+    if event_log.due():
+        event_log.snapshot(capture_state())
+
+def write_valuations(last_updated):
+    """Write back the account values that moved since they were last written, in batches"""
+    global last_valuation_write
+    last_valuation_write = time.monotonic()
+    stale = holdings.stale()
+    for start in range(0, len(stale), VALUATION_BATCH):
+        rows = stale[start:start + VALUATION_BATCH]
+        batch_updates = {}
+        for username, value in holdings.accounts(rows):
+            batch_updates[f'users/{username}/total_portfolio_value'] = value
+            batch_updates[f'users/{username}/last_updated'] = last_updated
+        writes.put(batch_updates)
+        holdings.mark_written(rows)
+    return len(stale)
+
+def schedule_leaderboard(last_updated):
+    """Publish the leaderboard on the settlement thread, unless the last publish is still pending"""
+    global leaderboard_publish
+    if leaderboard_publish is None or leaderboard_publish.done():
+        leaderboard_publish = settlement.submit(publish_leaderboard, last_updated)
+
+def publish_leaderboard(last_updated):
+    """Queue the top of the leaderboard, and the ranks that changed when they are due"""
+    global last_ranks_publish
+    top = [{'user': username, 'value': round(value, 2)}
+           for _, username, value in leaderboard.top(LEADERBOARD_SIZE)]
+    writes.put({'leaderboard': {'top': top, 'total': len(leaderboard), 'last_updated': last_updated}})
+    if time.monotonic() - last_ranks_publish < LEADERBOARD_RANKS_INTERVAL:
+        return 0
+    last_ranks_publish = time.monotonic()
+
+    changed = {}
+    ranked = set()
+    for rank, username, value in leaderboard.standings():
+        ranked.add(username)
+        entry = (rank, round(value, 2))
+        if published_ranks.get(username) != entry:
+            published_ranks[username] = entry
+            changed[f'leaderboard_ranks/{username}'] = {'rank': rank, 'value': entry[1]}
+    for username in [username for username in published_ranks if username not in ranked]:
+        del published_ranks[username]
+        changed[f'leaderboard_ranks/{username}'] = None
+
+    paths = list(changed)
+    for start in range(0, len(paths), VALUATION_BATCH):
+        writes.put({path: changed[path] for path in paths[start:start + VALUATION_BATCH]})
+    return len(changed)
+
+def place_order(order, updates):
+    """Rest an order in the matching engine and queue its status writes"""
+    path = f'orders/{order.owner}/{order.id}'
+    if order.symbol not in stocks:
+        order.status = 'rejected'
+        updates[f'{path}/status'] = 'rejected'
+        updates[f'{path}/reason'] = 'Unknown stock'
+        return False
+    matching_engine.place(order)
+    updates[f'{path}/status'] = 'open'
+    updates[f'open_orders/{order.id}'] = dict(order.to_dict(), owner=order.owner)
+    return True
+
+def cancel_order(order_id, owner, updates):
+    """Cancel an open order and queue its status writes"""
+    order = matching_engine.cancel(order_id, owner)
+    if order is None:
+        return False
+    updates[f'orders/{owner}/{order_id}/status'] = 'cancelled'
+    updates[f'open_orders/{order_id}'] = None
+    return True
+
+def place_trigger(trigger, updates):
+    """Register a trigger in the index and queue its status writes"""
+    path = f'triggers/{trigger.owner}/{trigger.id}'
+    if trigger.symbol not in stocks:
+        trigger.status = 'rejected'
+        updates[f'{path}/status'] = 'rejected'
+        updates[f'{path}/reason'] = 'Unknown stock'
+        return False
+    trigger_index.add(trigger, stocks[trigger.symbol]['price'])
+    updates[f'{path}/status'] = 'open'
+    updates[f'open_triggers/{trigger.id}'] = dict(trigger.to_dict(), owner=trigger.owner)
+    return True
+
+def cancel_trigger(trigger_id, owner, updates):
+    """Cancel an open trigger and queue its status writes"""
+    trigger = trigger_index.cancel(trigger_id, owner)
+    if trigger is None:
+        return False
+    updates[f'triggers/{owner}/{trigger_id}/status'] = 'cancelled'
+    updates[f'open_triggers/{trigger_id}'] = None
+    return True
+
+def settle(fills, fired, timestamp):
+    """Settlement thread: execute one tick's fills and fired triggers"""
+    try:
+        for order, price in fills:
+            settle_fill(order, price)
+        if fired:
+            deliver_triggers(fired, timestamp)
+    except Exception as e:
+        SETTLEMENT_ERRORS.inc()
+        print(f"\n🔥 Error settling fills: {str(e)}")
+
+def take_order_requests(updates):
+    """Apply the order and trigger requests the web app queued since the last tick"""
+    pending = inbox.take('order_requests')
+    for key in sorted(pending):
+        request = pending[key]
+        updates[f'order_requests/{key}'] = None
+        action = request.get('action')
+        if action == 'cancel':
+            cancel_order(request['order_id'], request['owner'], updates)
+            continue
+        if action == 'cancel_trigger':
+            cancel_trigger(request['trigger_id'], request['owner'], updates)
+            continue
+        if action == 'trigger':
+            try:
+                trigger = Trigger(key, request['owner'], request['symbol'], request['kind'],
+                                  request['level'], request.get('quantity', 0), source='web')
+            except (KeyError, ValueError) as e:
+                updates[f"triggers/{request.get('owner', 'unknown')}/{key}/status"] = 'rejected'
+                updates[f"triggers/{request.get('owner', 'unknown')}/{key}/reason"] = str(e)
+                continue
+            place_trigger(trigger, updates)
+            continue
+        try:
+            order = Order(key, request['owner'], request['symbol'], request['side'], request['kind'],
+                          request['price'], request['quantity'], source='web')
+        except (KeyError, ValueError) as e:
+            updates[f"orders/{request.get('owner', 'unknown')}/{key}/status"] = 'rejected'
+            updates[f"orders/{request.get('owner', 'unknown')}/{key}/reason"] = str(e)
+            continue
+        place_order(order, updates)
+
+def execute_fill(owner, source, side, stock_name, quantity, price):
+    """Execute a simulator-initiated trade for a web or console user; returns (transaction, error)"""
+    try:
+        transaction, user_data, _ = execute_trade(store, owner, side, stock_name, quantity, price)
+    except (TradeError, ConflictError) as e:
+        return None, str(e) or 'Account busy'
+    if source == 'console':
+        record_account(owner, user_data, trade={'side': side, 'stock': stock_name, 'quantity': quantity,
+                                               'price': price})
+    else:
+        account_changed(owner, *account_from_document(user_data))
+    return transaction, None
+
+def settle_fill(order, price):
+    """Execute a triggered order at the tick price and record the outcome"""
+    updates = {}
+    transaction, error = execute_fill(order.owner, order.source, order.side, order.symbol,
+                                      order.quantity, price)
+
+    path = f'orders/{order.owner}/{order.id}'
+    updates[f'open_orders/{order.id}'] = None
+    if error:
+        order.status = 'rejected'
+        updates[f'{path}/status'] = 'rejected'
+        updates[f'{path}/reason'] = error
+        writes.put(updates)
+        if order.source == 'console':
+            print(f"\n❌ {order.kind.title()} {order.side} order {order.id} for {order.symbol} rejected: {error}")
+        return
+
+    order.status = 'filled'
+    updates[f'{path}/status'] = 'filled'
+    updates[f'{path}/fill_price'] = price
+    updates[f'{path}/filled_at'] = transaction['timestamp']
+    transaction['order_id'] = order.id
+    record_transaction(store, order.owner, transaction)
+    writes.put(updates)
+    settled_volume.put((order.symbol, order.quantity))
+    if order.source == 'console':
+        print(f"\n🔔 {order.kind.title()} {order.side} order {order.id} filled: "
+              f"{order.quantity} {order.symbol} @ ${price:.2f}")
+
+def deliver_triggers(fired, timestamp):
+    """Settle this tick's fired triggers and hand them out in one batch"""
+    updates = {}
+    console_messages = []
+    for trigger, price in fired:
+        path = f'triggers/{trigger.owner}/{trigger.id}'
+        updates[f'open_triggers/{trigger.id}'] = None
+        updates[f'{path}/status'] = 'fired'
+        updates[f'{path}/fired_price'] = price
+        updates[f'{path}/fired_at'] = timestamp
+        label = trigger.kind.replace('_', '-')
+        message = f"{trigger.symbol} crossed ${trigger.level:.2f} (now ${price:.2f})"
+
+        # Stop-loss and take-profit sell the position at the tick price
+        if trigger.kind != 'alert':
+            transaction, error = execute_fill(trigger.owner, trigger.source, 'sell', trigger.symbol,
+                                              trigger.quantity, price)
+            if error:
+                updates[f'{path}/reason'] = error
+                message += f": {label} sell of {trigger.quantity} rejected ({error})"
+            else:
+                transaction['trigger_id'] = trigger.id
+                record_transaction(store, trigger.owner, transaction)
+                settled_volume.put((trigger.symbol, trigger.quantity))
+                message += f": {label} sold {trigger.quantity} @ ${price:.2f}"
+
+        updates[f'notifications/{trigger.owner}/{new_push_id()}'] = {
+            'trigger_id': trigger.id,
+            'kind': trigger.kind,
+            'symbol': trigger.symbol,
+            'level': trigger.level,
+            'price': price,
+            'message': message,
+            'timestamp': timestamp
+        }
+        if trigger.source == 'console':
+            console_messages.append(f"  {trigger.owner}: {label} {trigger.id} - {message}")
+
+    writes.put(updates)
+    if console_messages:
+        print(f"\n🔔 {len(console_messages)} trigger(s) fired:")
+        print("\n".join(console_messages))
+
+def load_open_orders():
+    """Restore resting orders saved by a previous run"""
+    saved = store.get('open_orders') or {}
+    for order_id, data in sorted(saved.items()):
+        order = Order(order_id, data['owner'], data['symbol'], data['side'], data['kind'],
+                      data['price'], data['quantity'], source=data.get('source', 'console'))
+        matching_engine.place(order)
+    return len(saved)
+
+def load_open_triggers():
+    """Restore open triggers saved by a previous run"""
+    saved = store.get('open_triggers') or {}
+    for trigger_id, data in sorted(saved.items()):
+        trigger = Trigger(trigger_id, data['owner'], data['symbol'], data['kind'], data['level'],
+                          data.get('quantity', 0), source=data.get('source', 'console'))
+        trigger_index.add(trigger, stocks.get(trigger.symbol, {}).get('price'))
+    return len(saved)
+
+def capture_state():
+    """Everything a restart needs to resume where this process is now"""
+    return {
+        'symbols': price_book.symbols,
+        'price': price_book.price.copy(),
+        'previous_price': price_book.previous_price.copy(),
+        'closing_price': price_book.closing_price.copy(),
+        'market_open': market_open,
     }
-        
-    db.reference(f'users/{username}').set(firebase_data)
+
+def restore_state():
+    """Load the latest snapshot and replay the log after it; returns (restored, events replayed)"""
+    global market_open
+    state, events = event_log.recover()
+    if state is not None and state['symbols'] != price_book.symbols:
+        print("⚠️ Saved market state is for a different stock table, starting fresh")
+        return False, 0
+    if state is not None:
+        price_book.price = np.array(state['price'])
+        price_book.previous_price = np.array(state['previous_price'])
+        price_book.closing_price = np.array(state['closing_price'])
+        market_open = state['market_open']
+    elif not events:
+        return False, 0
+
+    # TRADE and ACCOUNT events are logged only once their conditional write is stored,
+    # so storage already has them, or something newer from the web app: accounts are
+    # never rebuilt from the log, load_accounts ranks them from storage instead
+    for kind, _, value in events:
+        if kind == TICK and len(value) == len(price_book.symbols):
+            price_book.previous_price = price_book.price
+            price_book.price = np.array(value)
+        elif kind == MARKET and value['status'] == 'closed':
+            price_book.close_market()
+            market_open = False
+        elif kind == MARKET and value['status'] == 'open':
+            price_book.open_market()
+            market_open = True
+
+    for i, comp in enumerate(price_book.symbols):
+        stocks[comp]['price'] = float(price_book.price[i])
+        stocks[comp]['previous_price'] = float(price_book.previous_price[i])
+        stocks[comp]['closing_price'] = float(price_book.closing_price[i])
+    return state is not None, len(events)
+
+def republish_state():
+    """Queue the restored prices and market status, in case their last writes were lost"""
+    status = 'open' if market_open else 'closed'
+    timestamp_ms = now_ms()
+    updates = {'market_status': status, 'heartbeat/market_status': status}
+    for comp, data in stocks.items():
+        record = encode_stock(comp, data['price'], change_ratio(data['previous_price'], data['price']),
+                              timestamp_ms)
+        record[stock_field('previous_price')] = data['previous_price']
+        record[stock_field('closing_price')] = data['closing_price']
+        record[stock_field('market_status')] = status
+        updates[f"stocks/{comp.replace(' ', '_').replace('.', '')}"] = record
+    writes.put(updates)
+
+def console_account(user_data):
+    """The console's view of a stored user document"""
+    cash, positions = account_from_document(user_data)
+    return {'cash': cash, 'portfolio': {stock: int(quantity) for stock, quantity in positions.items()},
+            'revision': user_data.get('revision', 0)}
+
+def load_user(username):
+    """Read one user from Firebase as a console account, or None"""
+    user_data = writes.get(f'users/{username}')
+    if user_data is None:
+        return None
+    # Older documents embed their transaction list; move it to the ledger
+    migrate_legacy_transactions(store, username, user_data)
+    return console_account(user_data)
+
+def load_accounts():
+    """Fill the leaderboard and holdings matrix from every stored user, page by page"""
+    started = time.perf_counter()
+    loaded = 0
+    for page in iter_child_pages(store, 'users', USER_PAGE_SIZE):
+        # Accounts that traded since startup are already ranked and newer than the page
+        accounts = {username: account_from_document(data) for username, data in page.items()
+                    if isinstance(data, dict)}
+        leaderboard.refresh(holdings.add_missing(accounts))
+        loaded += len(accounts)
+    print(f"\n📊 Ranked {loaded} stored accounts in {time.perf_counter() - started:.1f}s")
+    return loaded
+
+def account_changed(username, cash, positions):
+    """Keep the leaderboard and holdings matrix in step with one account"""
+    holdings.set_account(username, cash, positions)
+    leaderboard.refresh([username])
+
+def refresh_account(username):
+    """Re-read a web user's document after they trade"""
+    user_data = writes.get(f'users/{username}')
+    if user_data is None:
+        users.refresh(username, None)
+        holdings.remove(username)
+        leaderboard.refresh([username])
+    else:
+        # A console session logged in as the same user sees the web trade too
+        users.refresh(username, console_account(user_data))
+        account_changed(username, *account_from_document(user_data))
+
+def record_account(username, user_data, trade=None):
+    """Bring the cache, rankings and event log in step with a stored user document"""
+    account = console_account(user_data)
+    users.put(username, account)
+    account_changed(username, account['cash'], account['portfolio'])
+    event_log.record(TRADE if trade else ACCOUNT, int(time.time() * 1000),
+                     dict(trade or {}, user=username, cash=account['cash'], portfolio=account['portfolio']))
 
 def get_stock_price(stock_name):
     """Get current price of a stock"""
@@ -246,6 +626,9 @@ class StockConsole(cmd.Cmd):
     def __init__(self):
         super().__init__()
         self.current_user = None
+        self.history_user = None
+        self.history_cursor = None
+        self.users_cursor = None
         
     def do_create_user(self, arg):
         """Create a new user: create_user <username> <starting_cash>"""
@@ -261,18 +644,15 @@ class StockConsole(cmd.Cmd):
             print("❌ Cash amount must be a number")
             return
             
-        if username in users:
+        try:
+            user_data = create_account(store, username, cash)
+        except TradeError:
             print(f"❌ User {username} already exists!")
             return
-            
-        # Initialize with all required fields
-        users[username] = {
-            'cash': cash,
-            'portfolio': {},
-            'transactions': []
-        }
-        
-        save_user_to_firebase(username, users[username])
+        except ConflictError:
+            print(f"❌ User {username} is being created elsewhere, try again")
+            return
+        record_account(username, user_data)
         print(f"✅ Created user {username} with ${cash:.2f}")
         
     def do_login(self, username):
@@ -281,17 +661,10 @@ class StockConsole(cmd.Cmd):
             print("❌ Please specify a username")
             return
             
-        if username not in users:
+        # Loads the account into the cache, so later commands find it in memory
+        if users.get(username) is None:
             print(f"❌ User {username} does not exist. Create it first.")
             return
-        
-        # Ensure user has required fields
-        if 'portfolio' not in users[username]:
-            users[username]['portfolio'] = {}
-        if 'transactions' not in users[username]:
-            users[username]['transactions'] = []
-        if 'cash' not in users[username]:
-            users[username]['cash'] = 0.0
             
         self.current_user = username
         print(f"✅ Logged in as {username}")
@@ -309,20 +682,45 @@ class StockConsole(cmd.Cmd):
         print(f"✅ Logged out from {prev_user}")
         
     def do_list_users(self, arg):
-        """List all users"""
-        if not users:
+        """List users a page at a time, in name order: list_users [more]"""
+        if arg.strip() != 'more':
+            self.users_cursor = None
+        elif self.users_cursor is None:
+            print("No more users.")
+            return
+            
+        # Accounts are stored by create_account before create_user returns, never left in
+        # the write-behind queue, so storage has every user; values come from the leaderboard,
+        # which is ahead of the valuations still queued
+        page, self.users_cursor = child_page(store, 'users', self.users_cursor, USER_PAGE_SIZE)
+        if not page:
             print("No users exist yet.")
             return
             
         print("\n=== Users ===")
-        for username, data in users.items():
-            portfolio_value = sum(
-                get_stock_price(stock) * qty 
-                for stock, qty in data['portfolio'].items()
-                if get_stock_price(stock) is not None
-            )
-            total_value = data['cash'] + portfolio_value
-            print(f"{username}: ${data['cash']:.2f} cash + ${portfolio_value:.2f} stocks = ${total_value:.2f}")
+        for username, user_data in page.items():
+            value = leaderboard.value(username)
+            if value is None:
+                value = user_data.get('total_portfolio_value', 0.0) if isinstance(user_data, dict) else 0.0
+            print(f"{username}: ${value:.2f}")
+        if self.users_cursor is not None:
+            print("Type 'list_users more' for the next page.")
+            
+    def do_leaderboard(self, arg):
+        """Show the top accounts by total value: leaderboard [count]"""
+        try:
+            count = int(arg) if arg.strip() else 10
+        except ValueError:
+            print("❌ Usage: leaderboard [count]")
+            return
+            
+        print(f"\n=== Leaderboard ({len(leaderboard)} accounts) ===")
+        for rank, username, total_value in leaderboard.top(count):
+            print(f"{rank:>4}. {username}: ${total_value:.2f}")
+        if self.current_user:
+            position = leaderboard.rank(self.current_user)
+            if position:
+                print(f"You are #{position[0]} with ${position[1]:.2f}")
             
     def do_stocks(self, arg):
         """List all available stocks"""
@@ -366,41 +764,22 @@ class StockConsole(cmd.Cmd):
             return
             
         price = stocks[stock_name]['price']
-        total_cost = price * quantity
-        
-        # Ensure user has required fields
-        if 'cash' not in users[self.current_user]:
-            users[self.current_user]['cash'] = 0.0
-        if 'portfolio' not in users[self.current_user]:
-            users[self.current_user]['portfolio'] = {}
-        if 'transactions' not in users[self.current_user]:
-            users[self.current_user]['transactions'] = []
-        
-        if users[self.current_user]['cash'] < total_cost:
-            print(f"❌ Not enough cash. Need ${total_cost:.2f}, have ${users[self.current_user]['cash']:.2f}")
+        try:
+            transaction, user_data, _ = execute_trade(store, self.current_user, 'buy', stock_name,
+                                                      quantity, price)
+        except TradeError as e:
+            print(f"❌ {e}")
             return
-            
-        # Update user cash
-        users[self.current_user]['cash'] -= total_cost
-        
-        # Update portfolio
-        if stock_name not in users[self.current_user]['portfolio']:
-            users[self.current_user]['portfolio'][stock_name] = 0
-        users[self.current_user]['portfolio'][stock_name] += quantity
+        except ConflictError:
+            print("❌ Your account is busy with another trade, please try again")
+            return
+        total_cost = transaction['total']
         
         # Record transaction
-        transaction = {
-            'type': 'buy',
-            'stock': stock_name,
-            'quantity': quantity,
-            'price': price,
-            'total': total_cost,
-            'timestamp': datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-        }
-        users[self.current_user]['transactions'].append(transaction)
-        
-        # Save to Firebase
-        save_user_to_firebase(self.current_user, users[self.current_user])
+        record_transaction(store, self.current_user, transaction)
+        settled_volume.put((stock_name, quantity))
+        record_account(self.current_user, user_data,
+                       trade={'side': 'buy', 'stock': stock_name, 'quantity': quantity, 'price': price})
         
         print(f"✅ Bought {quantity} shares of {stock_name} at ${price:.2f} each. Total: ${total_cost:.2f}")
         
@@ -437,45 +816,25 @@ class StockConsole(cmd.Cmd):
         except ValueError:
             print("❌ Quantity must be a number")
             return
-        
-        # Ensure user has required fields
-        if 'portfolio' not in users[self.current_user]:
-            users[self.current_user]['portfolio'] = {}
-        if 'transactions' not in users[self.current_user]:
-            users[self.current_user]['transactions'] = []
-        if 'cash' not in users[self.current_user]:
-            users[self.current_user]['cash'] = 0.0
-            
-        # Check if user has enough shares
-        if stock_name not in users[self.current_user]['portfolio'] or users[self.current_user]['portfolio'][stock_name] < quantity:
-            owned = users[self.current_user]['portfolio'].get(stock_name, 0)
-            print(f"❌ Not enough shares. Want to sell {quantity}, but only have {owned}")
-            return
             
+        # execute_trade checks the holding against the stored account, not a cached copy
         price = stocks[stock_name]['price']
-        total_value = price * quantity
-        
-        # Update user cash
-        users[self.current_user]['cash'] += total_value
-        
-        # Update portfolio
-        users[self.current_user]['portfolio'][stock_name] -= quantity
-        if users[self.current_user]['portfolio'][stock_name] == 0:
-            del users[self.current_user]['portfolio'][stock_name]
+        try:
+            transaction, user_data, _ = execute_trade(store, self.current_user, 'sell', stock_name,
+                                                      quantity, price)
+        except TradeError as e:
+            print(f"❌ {e}")
+            return
+        except ConflictError:
+            print("❌ Your account is busy with another trade, please try again")
+            return
+        total_value = transaction['total']
         
         # Record transaction
-        transaction = {
-            'type': 'sell',
-            'stock': stock_name,
-            'quantity': quantity,
-            'price': price,
-            'total': total_value,
-            'timestamp': datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-        }
-        users[self.current_user]['transactions'].append(transaction)
-        
-        # Save to Firebase
-        save_user_to_firebase(self.current_user, users[self.current_user])
+        record_transaction(store, self.current_user, transaction)
+        settled_volume.put((stock_name, quantity))
+        record_account(self.current_user, user_data,
+                       trade={'side': 'sell', 'stock': stock_name, 'quantity': quantity, 'price': price})
         
         print(f"✅ Sold {quantity} shares of {stock_name} at ${price:.2f} each. Total: ${total_value:.2f}")
         
@@ -485,13 +844,11 @@ class StockConsole(cmd.Cmd):
             print("❌ You must log in first")
             return
         
-        # Ensure user has required fields
-        if 'portfolio' not in users[self.current_user]:
-            users[self.current_user]['portfolio'] = {}
-        if 'cash' not in users[self.current_user]:
-            users[self.current_user]['cash'] = 0.0
+        user_data = users.get(self.current_user)
+        if user_data is None:
+            print(f"❌ User {self.current_user} no longer exists")
+            return
             
-        user_data = users[self.current_user]
         print(f"\n=== {self.current_user}'s Portfolio ===")
         print(f"Cash: ${user_data['cash']:.2f}")
         
@@ -507,28 +864,155 @@ class StockConsole(cmd.Cmd):
                 print(f"{stock}: {quantity} shares @ ${price:.2f} = ${value:.2f}")
                 
             print(f"\nTotal Portfolio Value: ${user_data['cash'] + total_value:.2f}")
-            
-        # Save updated portfolio value to Firebase
-        save_user_to_firebase(self.current_user, user_data)
         
     def do_history(self, arg):
-        """Show transaction history for current user"""
+        """Show transaction history, newest first: history [older]"""
         if not self.current_user:
             print("❌ You must log in first")
             return
         
-        # Ensure user has required fields
-        if 'transactions' not in users[self.current_user]:
-            users[self.current_user]['transactions'] = []
+        # "history" starts from the newest page, "history older" continues
+        if arg.strip() != 'older' or self.history_user != self.current_user:
+            self.history_cursor = None
+        elif self.history_cursor is None:
+            print("No older transactions.")
+            return
             
-        transactions = users[self.current_user]['transactions']
+        transactions, self.history_cursor = history_page(store, self.current_user, before=self.history_cursor)
+        self.history_user = self.current_user
         if not transactions:
             print("No transaction history.")
             return
             
         print(f"\n=== {self.current_user}'s Transaction History ===")
-        for i, t in enumerate(transactions):
-            print(f"{i+1}. {t['timestamp']} - {t['type'].upper()} {t['quantity']} {t['stock']} @ ${t['price']:.2f} = ${t['total']:.2f}")
+        for t in transactions:
+            print(f"{t['timestamp']} - {t['type'].upper()} {t['quantity']} {t['stock']} @ ${t['price']:.2f} = ${t['total']:.2f}")
+        if self.history_cursor is not None:
+            print("Type 'history older' for earlier transactions.")
+            
+    def do_order(self, arg):
+        """Place a resting order: order <buy|sell> <limit|stop> <stock_name> <quantity> <price>"""
+        if not self.current_user:
+            print("❌ You must log in first")
+            return
+            
+        args = arg.split()
+        if len(args) < 5:
+            print("❌ Usage: order <buy|sell> <limit|stop> <stock_name> <quantity> <price>")
+            return
+            
+        side, kind, stock_name = args[0].lower(), args[1].lower(), " ".join(args[2:-2])
+        if stock_name not in stocks:
+            print(f"❌ Stock '{stock_name}' not found")
+            return
+            
+        try:
+            order = Order(new_push_id(), self.current_user, stock_name, side, kind,
+                          float(args[-1]), int(args[-2]))
+        except ValueError as e:
+            print(f"❌ Invalid order: {e}")
+            return
+            
+        # Save the order before it can be matched so a fill never races this write
+        writes.put({
+            f'orders/{order.owner}/{order.id}': order.to_dict(),
+            f'open_orders/{order.id}': dict(order.to_dict(), owner=order.owner)
+        })
+        matching_engine.place(order)
+        print(f"✅ Placed {kind} {side} order {order.id}: {order.quantity} {stock_name} @ ${order.price:.2f}")
+        
+    def do_cancel(self, order_id):
+        """Cancel an open order: cancel <order_id>"""
+        if not self.current_user:
+            print("❌ You must log in first")
+            return
+            
+        updates = {}
+        if not cancel_order(order_id.strip(), self.current_user, updates):
+            print(f"❌ No open order {order_id.strip()}")
+            return
+        writes.put(updates)
+        print(f"✅ Cancelled order {order_id.strip()}")
+        
+    def do_orders(self, arg):
+        """List your open limit and stop orders"""
+        if not self.current_user:
+            print("❌ You must log in first")
+            return
+            
+        orders = matching_engine.open_orders(self.current_user)
+        if not orders:
+            print("No open orders.")
+            return
+            
+        print(f"\n=== {self.current_user}'s Open Orders ===")
+        for o in orders:
+            print(f"{o.id}: {o.kind.upper()} {o.side.upper()} {o.quantity} {o.symbol} @ ${o.price:.2f}")
+            
+    def do_trigger(self, arg):
+        """Set a price trigger: trigger <stop_loss|take_profit> <stock_name> <level> <quantity> or trigger alert <stock_name> <level>"""
+        if not self.current_user:
+            print("❌ You must log in first")
+            return
+            
+        args = arg.split()
+        kind = args[0].lower() if args else ''
+        needed = 3 if kind == 'alert' else 4
+        if len(args) < needed:
+            print("❌ Usage: trigger <stop_loss|take_profit> <stock_name> <level> <quantity>")
+            print("         trigger alert <stock_name> <level>")
+            return
+            
+        if kind == 'alert':
+            stock_name, level, quantity = " ".join(args[1:-1]), args[-1], 0
+        else:
+            stock_name, level, quantity = " ".join(args[1:-2]), args[-2], args[-1]
+        if stock_name not in stocks:
+            print(f"❌ Stock '{stock_name}' not found")
+            return
+            
+        try:
+            trigger = Trigger(new_push_id(), self.current_user, stock_name, kind, float(level), int(quantity))
+        except ValueError as e:
+            print(f"❌ Invalid trigger: {e}")
+            return
+            
+        # Save the trigger before it can fire so the fired status never races this write
+        writes.put({
+            f'triggers/{trigger.owner}/{trigger.id}': trigger.to_dict(),
+            f'open_triggers/{trigger.id}': dict(trigger.to_dict(), owner=trigger.owner)
+        })
+        trigger_index.add(trigger, stocks[stock_name]['price'])
+        print(f"✅ Set {kind.replace('_', '-')} trigger {trigger.id} on {stock_name} at ${trigger.level:.2f}")
+        
+    def do_untrigger(self, trigger_id):
+        """Cancel a price trigger: untrigger <trigger_id>"""
+        if not self.current_user:
+            print("❌ You must log in first")
+            return
+            
+        updates = {}
+        if not cancel_trigger(trigger_id.strip(), self.current_user, updates):
+            print(f"❌ No open trigger {trigger_id.strip()}")
+            return
+        writes.put(updates)
+        print(f"✅ Cancelled trigger {trigger_id.strip()}")
+        
+    def do_triggers(self, arg):
+        """List your open price triggers"""
+        if not self.current_user:
+            print("❌ You must log in first")
+            return
+            
+        triggers = trigger_index.open_triggers(self.current_user)
+        if not triggers:
+            print("No open triggers.")
+            return
+            
+        print(f"\n=== {self.current_user}'s Price Triggers ===")
+        for t in triggers:
+            quantity = f" (sell {t.quantity})" if t.kind != 'alert' else ""
+            print(f"{t.id}: {t.kind.replace('_', '-').upper()} {t.symbol} @ ${t.level:.2f}{quantity}")
             
     def do_exit(self, arg):
         """Exit the program"""
@@ -544,6 +1028,22 @@ class StockConsole(cmd.Cmd):
         status = "OPEN" if market_open else "CLOSED"
         print(f"\n=== Market Status ===")
         print(f"Market is currently {status}")
+        dow = dow_provider.status()
+        age = "never fetched" if dow['age_seconds'] is None else f"{dow['age_seconds']:.0f}s old"
+        print(f"Dow reference: {dow['value']:.2f} ({age}{', stale' if dow['stale'] else ''})")
+        if dow['last_error']:
+            print(f"Last Dow fetch error: {dow['last_error']}")
+        schedule = scheduler.stats()
+        print(f"Ticks: {schedule['ticks']} every {schedule['interval_ms']:.0f}ms ({schedule['policy']}), "
+              f"{schedule['missed']} missed in {schedule['overruns']} overruns")
+        if schedule['jitter_ms']:
+            jitter = schedule['jitter_ms']
+            print(f"Tick jitter: mean {jitter['mean']:.1f}ms, p99 {jitter['p99']:.1f}ms, max {jitter['max']:.1f}ms")
+        backlog = writes.stats()
+        print(f"Storage writes: {backlog['depth']} waiting, {backlog['lag_seconds']:.1f}s behind, "
+              f"{backlog['coalesced']} coalesced, {backlog['failures']} failed attempts")
+        if backlog['last_error']:
+            print(f"Last storage error: {backlog['last_error']}")
         if not market_open:
             print("\nClosing Prices:")
             for name, data in stocks.items():
@@ -558,22 +1058,26 @@ class StockConsole(cmd.Cmd):
             return
             
         print("\n=== Closing Market ===")
+        last_updated = now_ms()
+        updates = {'market_status': 'closed', 'heartbeat/market_status': 'closed'}
         for comp in stocks:
             # Save current price as closing price
             stocks[comp]['closing_price'] = stocks[comp]['price']
             
-            # Update Firebase with closing price and market status
+            # Queue closing price and market status for this stock
             safe_name = comp.replace(" ", "_").replace(".", "")
-            db.reference(f'stocks/{safe_name}').update({
-                'closing_price': str(stocks[comp]['closing_price']),
-                'market_status': 'closed',
-                'last_updated': datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-            })
-            print(f"Saved closing price for {comp}: ${stocks[comp]['closing_price']:.2f}")
+            updates[f"stocks/{safe_name}/{stock_field('closing_price')}"] = stocks[comp]['closing_price']
+            updates[f"stocks/{safe_name}/{stock_field('market_status')}"] = 'closed'
+            updates[f"stocks/{safe_name}/{stock_field('last_updated')}"] = last_updated
             
-        # Set global market status
+        price_book.close_market()
+        event_log.record(MARKET, int(time.time() * 1000), {'status': 'closed'})
+
+        # Save closing prices and global market status in one write
+        writes.put(updates)
+        for comp in stocks:
+            print(f"Saved closing price for {comp}: ${stocks[comp]['closing_price']:.2f}")
         market_open = False
-        db.reference('market_status').set('closed')
         print("\n✅ Market is now closed")
         
     def do_open_market(self, arg):
@@ -583,28 +1087,55 @@ class StockConsole(cmd.Cmd):
             print("❌ Market is already open")
             return
             
-        # Update market status in Firebase
-        db.reference('market_status').set('open')
-        
         # Reset previous prices to closing prices
+        last_updated = now_ms()
+        updates = {'market_status': 'open', 'heartbeat/market_status': 'open'}
         for comp in stocks:
             stocks[comp]['previous_price'] = stocks[comp]['closing_price']
             safe_name = comp.replace(" ", "_").replace(".", "")
-            db.reference(f'stocks/{safe_name}').update({
-                'previous_price': str(stocks[comp]['previous_price']),
-                'market_status': 'open',
-                'last_updated': datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-            })
+            updates[f"stocks/{safe_name}/{stock_field('previous_price')}"] = stocks[comp]['previous_price']
+            updates[f"stocks/{safe_name}/{stock_field('market_status')}"] = 'open'
+            updates[f"stocks/{safe_name}/{stock_field('last_updated')}"] = last_updated
         
+        price_book.open_market()
+        event_log.record(MARKET, int(time.time() * 1000), {'status': 'open'})
+
+        # Update market status and previous prices in Firebase in one write
+        writes.put(updates)
         market_open = True
         print("\n✅ Market is now open")
 
 def main():
-    # Load existing users from Firebase
-    global users
-    users = load_users_from_firebase()
-    print(f"Loaded {len(users)} users from database")
+    # Resume prices and market status from the local snapshot and event log
+    started = time.perf_counter()
+    restored, replayed = restore_state()
+    if restored:
+        print(f"Resumed from snapshot plus {replayed} events in {time.perf_counter() - started:.2f}s "
+              f"(market {'open' if market_open else 'closed'})")
+    elif replayed:
+        print(f"Replayed {replayed} logged events")
+    if restored or replayed:
+        # A snapshot can be taken while the tick's writes are still queued, so storage
+        # may be behind what was restored after a crash; bring it back in step
+        republish_state()
+    leaderboard.refresh_rows(holdings.revalue(price_book.price))
+
+    # Users are loaded when they log in; the leaderboard fills in from storage in the background
+    threading.Thread(target=load_accounts, daemon=True).start()
+    print(f"Restored {load_open_orders()} open orders")
+    print(f"Restored {load_open_triggers()} price triggers")
     
+    # Keep the Dow reference fresh and web requests collected without blocking the updater
+    dow_provider.start()
+    inbox.start()
+
+    if METRICS_PORT:
+        try:
+            start_http_server(METRICS_PORT)
+            print(f"📊 Metrics at http://127.0.0.1:{METRICS_PORT}/metrics")
+        except OSError as e:
+            print(f"⚠️ Metrics listener not started: {e}")
+
     # Start the stock update in a separate thread
     update_thread = threading.Thread(target=stock_updater, daemon=True)
     update_thread.start()
@@ -616,17 +1147,28 @@ def main():
     except KeyboardInterrupt:
         print("\nExiting FakeStockSim...")
 
+    # Store every queued write and snapshot, so the next start replays nothing
+    scheduler.stop()
+    inbox.stop()
+    settlement.shutdown(wait=True)
+    if not writes.flush(timeout=float(os.getenv('WRITE_QUEUE_DRAIN_TIMEOUT', 30.0))):
+        print(f"⚠️ {writes.stats()['depth']} writes were not stored: {writes.last_error}")
+    event_log.snapshot(capture_state())
+
+def run_tick(tick_number):
+    """Scheduled tick during market hours"""
+    try:
+        if market_open:
+            update_stocks(symbol_schedule.due(tick_number))
+    except Exception as e:
+        # Only print serious errors
+        TICK_ERRORS.inc()
+        print(f"\n🔥 Error in stock updater: {str(e)}")
+
 def stock_updater():
     """Background thread to update stocks"""
     print("🏦 Stock simulator running in background...")
-    while True:
-        try:
-            if market_open and market_open_now():
-                update_stocks()
-            time.sleep(1)
-        except Exception as e:
-            # Only print serious errors
-            print(f"\n🔥 Error in stock updater: {str(e)}")
+    scheduler.run(run_tick)
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
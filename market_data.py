@@ -0,0 +1,75 @@
+"""Stock table, special-event table and trading hours shared by the simulator and offline runs"""
+from datetime import time as dt_time
+
+# Market hours, turned into the tick scheduler's session deadlines
+MARKET_OPEN = dt_time(9, 0)
+MARKET_CLOSE = dt_time(16, 0)
+
+# Seconds between ticks for a symbol or a group from symbol_groups, e.g.
+# {'John Lawyers': 5} or {'slow': 10} with symbol_groups = {'slow': ['UMAE']};
+# anything not listed ticks every TICK_INTERVAL
+tick_intervals = {}
+symbol_groups = {}
+
+# Initial Stock Data
+stocks = {
+    'John Lawyers': {'name': 'John Lawyers', 'price': 94, 'previous_price': 94, 'closing_price': 94},
+    'Tidli Co': {'name': 'Tidli Co', 'price': 150, 'previous_price': 150, 'closing_price': 150},
+    'UMAE': {'name': 'UMAE', 'price': 500, 'previous_price': 500, 'closing_price': 500}
+}
+
+eevents = {
+    'John Lawyers': [
+        "launches strategic advertising campaign (+15%)",
+        "experiences critical equipment failure (-20%)",
+        "enters strategic partnership with Tesla (+25%)",
+        "secures victory in high-profile litigation (+30%)",
+        "suffers reputational damage from data breach (-40%)",
+        "completes merger with major competitor (+50%)"
+    ],
+    'Tidli Co': [
+        "successfully enters Tokyo market (+10%)",
+        "issues mass product recall due to safety concerns (-25%)",
+        "receives international environmental excellence award (+15%)",
+        "unveils groundbreaking product innovation (+40%)",
+        "faces leadership uncertainty after CEO resignation (-30%)",
+        "awarded high-value government infrastructure contract (+60%)"
+    ],
+    'UMAE': [
+        "launches Tokyo-based operations (+12%)",
+        "announces voluntary recall following product flaw (-22%)",
+        "recognized for sustainability innovation (+18%)",
+        "reveals breakthrough in renewable energy technology (+80%)",
+        "undergoes regulatory scrutiny amid compliance concerns (-45%)",
+        "forms alliance with SpaceX for joint development (+70%)"
+    ]
+}
+
+
+# Special event probabilities and impacts
+special_events = {
+    'John Lawyers': {
+        'probability': 0.05,  # 5% chance per update
+        'impacts': {
+            'wins major lawsuit': 0.30,  # +30%
+            'data breach scandal': -0.40,  # -40%
+            'merges with rival firm': 0.50  # +50%
+        }
+    },
+    'Tidli Co': {
+        'probability': 0.05,
+        'impacts': {
+            'launches revolutionary product': 0.40,
+            'CEO resigns': -0.30,
+            'secures government contract': 0.60
+        }
+    },
+    'UMAE': {
+        'probability': 0.05,
+        'impacts': {
+            'discovers new energy source': 0.80,
+            'regulatory investigation': -0.45,
+            'partners with SpaceX': 0.70
+        }
+    }
+}
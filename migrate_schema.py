@@ -0,0 +1,91 @@
+"""Rewrite stored records written in the version 1 string format (see schema.py).
+
+Converts the stock table to version 2 records, and user, trigger and
+notification times from '%Y-%m-%d %H:%M:%S' strings to epoch milliseconds.
+Readers accept both formats, so this can run while the simulator and the web
+app are up; records already in the new format are left alone, so it is safe
+to run again.
+
+    STORAGE_BACKEND=sqlite python migrate_schema.py --dry-run
+"""
+import argparse
+import os
+
+import firebase_admin
+from firebase_admin import credentials
+
+from schema import SCHEMA_VERSION, migrate_stock, parse_timestamp
+from storage import iter_child_pages, open_storage
+
+
+def migrate_stocks(store):
+    """{path: value} turning every version 1 stock record into version 2"""
+    updates = {}
+    for key, record in (store.get('stocks') or {}).items():
+        if isinstance(record, dict) and record.get('v', 1) < SCHEMA_VERSION:
+            updates[f'stocks/{key}'] = migrate_stock(record)
+    return updates
+
+
+def _timestamp_update(updates, path, value):
+    if isinstance(value, str):
+        timestamp = parse_timestamp(value)
+        if timestamp is not None:
+            updates[path] = timestamp
+
+
+def migrate_users(page):
+    updates = {}
+    for username, user_data in page.items():
+        if isinstance(user_data, dict):
+            _timestamp_update(updates, f'users/{username}/last_updated', user_data.get('last_updated'))
+    return updates
+
+
+def migrate_per_user(root, field, page):
+    """Timestamp updates for <root>/<user>/<id>/<field> across one page of users"""
+    updates = {}
+    for username, records in page.items():
+        for record_id, record in (records or {}).items():
+            if isinstance(record, dict):
+                _timestamp_update(updates, f'{root}/{username}/{record_id}/{field}', record.get(field))
+    return updates
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--page-size', type=int, default=500, help='users read and written per update')
+    parser.add_argument('--dry-run', action='store_true', help='count what would change without writing')
+    args = parser.parse_args()
+
+    backend = os.getenv('STORAGE_BACKEND', 'firebase')
+    if backend == 'firebase':
+        cred = credentials.Certificate(os.getenv('FIREBASE_CREDENTIALS_PATH',
+                                                 'FakeStockSim Firebase Service Account.json'))
+        firebase_admin.initialize_app(cred, {
+            'databaseURL': 'https://fakestocksim-default-rtdb.firebaseio.com'
+        })
+    store = open_storage(backend)
+
+    def apply(label, updates):
+        if updates and not args.dry_run:
+            store.update('', updates)
+        counts[label] = counts.get(label, 0) + len(updates)
+
+    counts = {}
+    apply('stocks', migrate_stocks(store))
+    for page in iter_child_pages(store, 'users', args.page_size):
+        apply('users', migrate_users(page))
+    for page in iter_child_pages(store, 'triggers', args.page_size):
+        apply('triggers', migrate_per_user('triggers', 'fired_at', page))
+    for page in iter_child_pages(store, 'notifications', args.page_size):
+        apply('notifications', migrate_per_user('notifications', 'timestamp', page))
+
+    verb = 'Would migrate' if args.dry_run else 'Migrated'
+    for label in ('stocks', 'users', 'triggers', 'notifications'):
+        print(f"{verb} {counts.get(label, 0)} {label} values")
+    print("✅ Done" if not args.dry_run else "Dry run, nothing written")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,162 @@
+"""Per-symbol limit/stop order books matched against each simulator tick.
+
+A resting order fires when the market price crosses its trigger price:
+
+    buy  limit  fires when price <= limit    sell limit  fires when price >= limit
+    sell stop   fires when price <= stop     buy  stop   fires when price >= stop
+
+So each book needs only two heaps: orders that fire at or below their price
+(a max-heap) and orders that fire at or above it (a min-heap). A tick pops
+just the crossed orders off the heap tops, O(k log n) for k fills, in
+price-time priority. Cancels are lazy: the order is marked and skipped when
+it reaches the top.
+"""
+import heapq
+import itertools
+import threading
+
+SIDES = ('buy', 'sell')
+KINDS = ('limit', 'stop')
+
+
+class Order:
+    __slots__ = ('id', 'owner', 'symbol', 'side', 'kind', 'price', 'quantity', 'source', 'seq', 'status')
+
+    def __init__(self, id, owner, symbol, side, kind, price, quantity, source='console'):
+        if side not in SIDES:
+            raise ValueError(f"side must be one of {', '.join(SIDES)}")
+        if kind not in KINDS:
+            raise ValueError(f"kind must be one of {', '.join(KINDS)}")
+        if price <= 0 or quantity <= 0:
+            raise ValueError("price and quantity must be positive")
+        self.id = id
+        self.owner = owner
+        self.symbol = symbol
+        self.side = side
+        self.kind = kind
+        self.price = float(price)
+        self.quantity = int(quantity)
+        self.source = source
+        self.seq = None
+        self.status = 'open'
+
+    @property
+    def fires_below(self):
+        return (self.side == 'buy') == (self.kind == 'limit')
+
+    def to_dict(self):
+        return {
+            'symbol': self.symbol, 'side': self.side, 'kind': self.kind, 'price': self.price,
+            'quantity': self.quantity, 'source': self.source, 'status': self.status,
+        }
+
+
+class OrderBook:
+    """Resting orders for one symbol"""
+
+    def __init__(self, symbol):
+        self.symbol = symbol
+        self.below = []  # (-price, seq, order): fires when market <= price
+        self.above = []  # (price, seq, order): fires when market >= price
+        self.live = 0
+        self.dead = 0
+
+    def add(self, order):
+        if order.fires_below:
+            heapq.heappush(self.below, (-order.price, order.seq, order))
+        else:
+            heapq.heappush(self.above, (order.price, order.seq, order))
+        self.live += 1
+
+    def cancelled(self):
+        """Account for one lazily cancelled order, compacting when half the heap is dead"""
+        self.live -= 1
+        self.dead += 1
+        if self.dead > self.live:
+            self.below = [entry for entry in self.below if entry[2].status == 'open']
+            self.above = [entry for entry in self.above if entry[2].status == 'open']
+            heapq.heapify(self.below)
+            heapq.heapify(self.above)
+            self.dead = 0
+
+    def match(self, price):
+        """Pop every open order crossed by price, in price-time priority"""
+        fired = []
+        below, above = self.below, self.above
+        while below and -below[0][0] >= price:
+            order = heapq.heappop(below)[2]
+            if order.status == 'open':
+                fired.append(order)
+            else:
+                self.dead -= 1
+        while above and above[0][0] <= price:
+            order = heapq.heappop(above)[2]
+            if order.status == 'open':
+                fired.append(order)
+            else:
+                self.dead -= 1
+        self.live -= len(fired)
+        if len(fired) > 1:
+            fired.sort(key=lambda o: o.seq)
+        return fired
+
+    def __len__(self):
+        return self.live
+
+
+class MatchingEngine:
+    """All order books plus an id index for cancels (safe to share between threads)"""
+
+    def __init__(self):
+        self.books = {}
+        self.orders = {}
+        self._seq = itertools.count()
+        self._lock = threading.Lock()
+        self.matched = 0
+
+    def place(self, order):
+        """Rest an order in its symbol's book"""
+        with self._lock:
+            if order.id in self.orders:
+                raise ValueError(f"Duplicate order id {order.id}")
+            order.seq = next(self._seq)
+            book = self.books.get(order.symbol)
+            if book is None:
+                book = self.books[order.symbol] = OrderBook(order.symbol)
+            book.add(order)
+            self.orders[order.id] = order
+        return order
+
+    def cancel(self, order_id, owner=None):
+        """Cancel an open order; returns the order or None if it can't be cancelled"""
+        with self._lock:
+            order = self.orders.get(order_id)
+            if order is None or order.status != 'open' or (owner is not None and order.owner != owner):
+                return None
+            order.status = 'cancelled'
+            del self.orders[order_id]
+            self.books[order.symbol].cancelled()
+        return order
+
+    def match(self, symbols, prices):
+        """Fire every order crossed by this tick's prices; returns [(order, price)]"""
+        fills = []
+        books = self.books
+        with self._lock:
+            for symbol, price in zip(symbols, prices):
+                book = books.get(symbol)
+                if book is None or not book.live:
+                    continue
+                for order in book.match(price):
+                    order.status = 'triggered'
+                    del self.orders[order.id]
+                    fills.append((order, price))
+            self.matched += len(fills)
+        return fills
+
+    def open_orders(self, owner=None):
+        with self._lock:
+            return [o for o in self.orders.values() if owner is None or o.owner == owner]
+
+    def __len__(self):
+        return len(self.orders)
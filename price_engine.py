@@ -0,0 +1,100 @@
+"""Array-backed price book that advances every ticker in one vectorized step"""
+from collections import namedtuple
+
+import numpy as np
+
+# Same bounds as the original per-company loop in update_stocks
+BASE_CHANGE_RANGE = (-0.2, 0.2)  # percent per tick
+DOW_FACTOR_RANGE = (0.9, 1.1)
+PRICE_FLOOR = 1
+
+Tick = namedtuple('Tick', ['old_prices', 'new_prices', 'event_mask', 'event_index'])
+
+
+class PriceBook:
+    """Prices, previous/closing prices and event tables for N symbols as NumPy arrays"""
+
+    def __init__(self, symbols, prices, probabilities, events, closing_prices=None):
+        self.symbols = list(symbols)
+        self.index = {symbol: i for i, symbol in enumerate(self.symbols)}
+        self.price = np.asarray(prices, dtype=np.float64).copy()
+        self.previous_price = self.price.copy()
+        self.closing_price = (self.price.copy() if closing_prices is None
+                              else np.asarray(closing_prices, dtype=np.float64).copy())
+        self.event_probability = np.asarray(probabilities, dtype=np.float64).copy()
+
+        # Ragged (name, impact) lists are padded into one impacts matrix
+        self.event_names = [[name for name, _ in symbol_events] for symbol_events in events]
+        self.event_count = np.array([len(symbol_events) for symbol_events in events], dtype=np.int64)
+        width = max(1, int(self.event_count.max(initial=0)))
+        self.event_impacts = np.zeros((len(self.symbols), width), dtype=np.float64)
+        for i, symbol_events in enumerate(events):
+            for j, (_, impact) in enumerate(symbol_events):
+                self.event_impacts[i, j] = impact
+        # Symbols without events can never trigger one
+        self.event_probability[self.event_count == 0] = 0.0
+
+    @classmethod
+    def from_tables(cls, stocks, special_events):
+        """Build a book from main.py's stocks and special_events dicts"""
+        symbols = list(stocks)
+        return cls(
+            symbols,
+            [stocks[s]['price'] for s in symbols],
+            [special_events.get(s, {}).get('probability', 0.0) for s in symbols],
+            [list(special_events.get(s, {}).get('impacts', {}).items()) for s in symbols],
+            closing_prices=[stocks[s]['closing_price'] for s in symbols],
+        )
+
+    @classmethod
+    def synthetic(cls, count, seed=None, probability=0.05,
+                  impacts=(('wins major lawsuit', 0.30), ('data breach scandal', -0.40),
+                           ('merges with rival firm', 0.50))):
+        """A universe of count made-up tickers priced between $10 and $1000"""
+        rng = np.random.default_rng(seed)
+        symbols = [f'SYN{i:05d}' for i in range(count)]
+        prices = np.round(rng.uniform(10, 1000, count), 2)
+        return cls(symbols, prices, np.full(count, probability), [list(impacts)] * count)
+
+    def __len__(self):
+        return len(self.symbols)
+
+    def tick(self, rng, due=None):
+        """Advance every price by one tick and return a Tick with what happened.
+
+        due is an optional boolean mask; symbols outside it keep their price
+        and cannot have an event this tick.
+        """
+        n = len(self.symbols)
+        old = self.price
+        # One batched draw: event test, event choice, base change, dow factor
+        draws = rng.random((4, n))
+
+        event_mask = draws[0] < self.event_probability
+        if due is not None:
+            event_mask &= due
+        event_index = np.minimum((draws[1] * self.event_count).astype(np.int64),
+                                 np.maximum(self.event_count - 1, 0))
+        impact = self.event_impacts[np.arange(n), event_index]
+
+        low, high = BASE_CHANGE_RANGE
+        base_change = low + (high - low) * draws[2]
+        low, high = DOW_FACTOR_RANGE
+        dow_factor = low + (high - low) * draws[3]
+
+        price_change = np.where(event_mask, old * impact, old * (base_change / 100) * dow_factor)
+        new = np.maximum(PRICE_FLOOR, np.round(old + price_change, 2))
+        if due is not None:
+            new = np.where(due, new, old)
+
+        self.previous_price = old
+        self.price = new
+        return Tick(old, new, event_mask, event_index)
+
+    def close_market(self):
+        """Record current prices as closing prices"""
+        self.closing_price = self.price.copy()
+
+    def open_market(self):
+        """Reset previous prices to the last closing prices"""
+        self.previous_price = self.closing_price.copy()
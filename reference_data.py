@@ -0,0 +1,156 @@
+"""Cached market reference data refreshed off the tick loop"""
+import json
+import threading
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from metrics import counter, gauge, histogram
+
+DOW_URL = "https://query1.finance.yahoo.com/v8/finance/chart/%5EDJI?range=1d&interval=1d"
+DOW_FALLBACK = 35000
+
+FETCH_SECONDS = histogram('reference_fetch_seconds', 'Reference data fetch latency', ['name'])
+FETCH_FAILURES = counter('reference_fetch_failures_total', 'Reference data fetches that failed', ['name'])
+REFERENCE_AGE = gauge('reference_age_seconds', 'Seconds since the last successful fetch (-1: never)', ['name'])
+
+
+def parse_chart_previous_close(data):
+    """Extract the previous close from a Yahoo chart API response"""
+    meta = data["chart"]["result"][0]["meta"]
+    return float(meta["chartPreviousClose"])
+
+
+class YahooChartSource:
+    """Fetches the previous close over one pooled, retrying HTTP session"""
+
+    def __init__(self, url=DOW_URL, timeout=10):
+        self.url = url
+        self.timeout = timeout
+        self.session = requests.Session()
+        self.session.headers['User-Agent'] = (
+            "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 "
+            "(KHTML, like Gecko) Chrome/113.0.0.0 Safari/537.36"
+        )
+        retries = Retry(total=3, backoff_factor=1, status_forcelist=[502, 503, 504])
+        self.session.mount('https://', HTTPAdapter(max_retries=retries, pool_maxsize=1))
+
+    def __call__(self):
+        response = self.session.get(self.url, timeout=self.timeout)
+        response.raise_for_status()
+        return parse_chart_previous_close(response.json())
+
+
+class FixtureSource:
+    """Offline source: a fixed number or a saved Yahoo chart JSON file"""
+
+    def __init__(self, fixture):
+        self.fixture = fixture
+
+    def __call__(self):
+        if isinstance(self.fixture, (int, float)):
+            return float(self.fixture)
+        with open(self.fixture, 'r') as f:
+            return parse_chart_previous_close(json.load(f))
+
+
+class ReferenceValue:
+    """A TTL-cached value that a background thread keeps fresh.
+
+    Readers call ``get()``, which only ever returns what is in memory (or the
+    fallback before the first successful fetch) and never waits on the source.
+    """
+
+    def __init__(self, source, ttl=3600, fallback=None, retry_interval=30, name='reference'):
+        self.source = source
+        self.ttl = ttl
+        self.fallback = fallback
+        self.retry_interval = retry_interval
+        self.name = name
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._thread = None
+        self._value = None
+        self._fetched_at = None
+        self.last_error = None
+        self.last_error_at = None
+        self.error_count = 0
+        REFERENCE_AGE.labels(name).set_function(lambda: -1 if self.age() is None else self.age())
+
+    def get(self):
+        """Return the cached value, or the fallback if nothing was fetched yet"""
+        value = self._value
+        return self.fallback if value is None else value
+
+    def age(self):
+        """Seconds since the last successful fetch (None if never fetched)"""
+        fetched_at = self._fetched_at
+        return None if fetched_at is None else time.monotonic() - fetched_at
+
+    def is_stale(self):
+        age = self.age()
+        return age is None or age > self.ttl
+
+    def refresh(self):
+        """Fetch from the source now; returns True on success"""
+        start = time.perf_counter()
+        try:
+            value = self.source()
+        except Exception as e:
+            FETCH_FAILURES.labels(self.name).inc()
+            with self._lock:
+                self.last_error = f"{type(e).__name__}: {e}"
+                self.last_error_at = time.time()
+                self.error_count += 1
+            return False
+        finally:
+            FETCH_SECONDS.labels(self.name).observe(time.perf_counter() - start)
+        with self._lock:
+            self._value = value
+            self._fetched_at = time.monotonic()
+        return True
+
+    def status(self):
+        """Snapshot of the cached value and its freshness/error state"""
+        age = self.age()
+        return {
+            'name': self.name,
+            'value': self.get(),
+            'using_fallback': self._value is None,
+            'age_seconds': None if age is None else round(age, 3),
+            'stale': self.is_stale(),
+            'last_error': self.last_error,
+            'last_error_at': self.last_error_at,
+            'error_count': self.error_count,
+        }
+
+    def start(self):
+        """Start the background refresher (idempotent)"""
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(target=self._run, name=f'{self.name}-refresher', daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self):
+        self._thread, thread = None, self._thread
+        self._wake.set()
+        if thread is not None:
+            thread.join(timeout=1)
+        self._wake.clear()
+
+    def _run(self):
+        thread = threading.current_thread()
+        while self._thread is thread:
+            if not self.is_stale() or self.refresh():
+                delay = max(self.ttl - (self.age() or 0), 0)
+            else:
+                delay = self.retry_interval
+            self._wake.wait(delay)
+
+
+def dow_reference(fixture=None, ttl=3600):
+    """Dow previous-close provider, using a local fixture when one is given"""
+    source = FixtureSource(fixture) if fixture is not None else YahooChartSource()
+    return ReferenceValue(source, ttl=ttl, fallback=DOW_FALLBACK, name='dow_previous_close')
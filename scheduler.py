@@ -0,0 +1,186 @@
+"""Fixed-rate tick scheduling on the monotonic clock.
+
+Tick k of a session is due at ``anchor + k * interval``, so time spent inside
+a tick never pushes later ticks back the way ``tick(); sleep(interval)`` does.
+When a tick overruns, the policy decides what happens to the deadlines that
+passed meanwhile:
+
+    skip      drop them and resume at the next deadline still ahead (default)
+    catch_up  run up to max_catch_up of them back to back, drop the rest
+
+Market hours are turned into monotonic open/close deadlines once per session
+instead of checking the wall clock every tick, and SymbolSchedule lets
+symbols or groups of symbols tick every few base ticks.
+"""
+import math
+import threading
+import time
+from collections import deque
+from datetime import datetime, timedelta
+
+import numpy as np
+
+SKIP = 'skip'
+CATCH_UP = 'catch_up'
+POLICIES = (SKIP, CATCH_UP)
+
+
+class SymbolSchedule:
+    """Which symbols are due on which base tick.
+
+    intervals maps a symbol, or a group name from groups, to its tick interval
+    in seconds; it is rounded to a whole number of base ticks. Symbols not
+    mentioned tick every base tick.
+    """
+
+    def __init__(self, symbols, base_interval, intervals=None, groups=None):
+        self.symbols = list(symbols)
+        groups = groups or {}
+        periods = {}
+        for key, seconds in (intervals or {}).items():
+            for symbol in groups.get(key, [key]):
+                if symbol not in self.symbols:
+                    raise ValueError(f"Unknown symbol in tick intervals: {symbol}")
+                periods[symbol] = max(1, round(seconds / base_interval))
+        self.periods = np.array([periods.get(symbol, 1) for symbol in self.symbols], dtype=np.int64)
+        self.uniform = bool((self.periods == 1).all())
+
+    def due(self, tick_number):
+        """Boolean mask of the symbols that tick on base tick tick_number (None: all of them)"""
+        if self.uniform:
+            return None
+        return tick_number % self.periods == 0
+
+
+class MarketHours:
+    """Daily open and close times as monotonic deadlines"""
+
+    def __init__(self, open_time, close_time, weekdays_only=False):
+        self.open_time = open_time
+        self.close_time = close_time
+        self.weekdays_only = weekdays_only
+
+    def next_session(self):
+        """(opens, closes) on the monotonic clock for the session in progress or the next one"""
+        now = datetime.now()
+        base = time.monotonic()
+        for offset in range(8):
+            day = now.date() + timedelta(days=offset)
+            if self.weekdays_only and day.weekday() >= 5:
+                continue
+            closes = datetime.combine(day, self.close_time)
+            if closes >= now:
+                opens = datetime.combine(day, self.open_time)
+                return base + (opens - now).total_seconds(), base + (closes - now).total_seconds()
+        raise ValueError("No trading day in the next week")
+
+
+class TickScheduler:
+    """Calls tick(tick_number) at a fixed rate; see the module docstring for policies.
+
+    on_missed(count, overrun) is told about deadlines dropped after a tick
+    overran by overrun seconds. The jitter percentiles in stats() are
+    recomputed at most every jitter_every seconds, so calling it every tick
+    stays cheap.
+    """
+
+    def __init__(self, interval, policy=SKIP, max_catch_up=10, hours=None, on_missed=None,
+                 window=3600, jitter_every=10.0):
+        if policy not in POLICIES:
+            raise ValueError(f"Unknown tick policy: {policy}")
+        self.interval = interval
+        self.policy = policy
+        self.max_catch_up = max_catch_up
+        self.hours = hours
+        self.on_missed = on_missed
+        self.session = None
+        self.ticks = 0
+        self.missed = 0
+        self.overruns = 0
+        self.last_duration = None
+        self.jitter_every = jitter_every
+        self._lateness = deque(maxlen=window)
+        self._lock = threading.Lock()
+        self._jitter = None
+        self._jitter_at = None
+        self._stop = threading.Event()
+        self._anchor = None
+        self._k = 0
+
+    def _start_session(self):
+        """Anchor tick 0 at the next open (or now, with no market hours)"""
+        now = time.monotonic()
+        if self.hours is None:
+            self._anchor, self._k = now, 0
+            return
+        self.session = self.hours.next_session()
+        self._anchor = self.session[0]
+        self._k = max(0, math.ceil((now - self._anchor) / self.interval))
+
+    def run(self, tick):
+        """Run until stop() is called"""
+        self._start_session()
+        while not self._stop.is_set():
+            deadline = self._anchor + self._k * self.interval
+            if self.session is not None and deadline > self.session[1]:
+                self._start_session()
+                continue
+
+            wait = deadline - time.monotonic()
+            if wait > 0 and self._stop.wait(wait):
+                break
+
+            started = time.monotonic()
+            with self._lock:
+                self._lateness.append(started - deadline)
+            tick(self._k)
+            finished = time.monotonic()
+            self.last_duration = finished - started
+            self.ticks += 1
+            self._k += 1
+
+            # Deadlines that passed while the tick ran
+            next_deadline = self._anchor + self._k * self.interval
+            if finished > next_deadline:
+                self.overruns += 1
+                behind = int((finished - next_deadline) // self.interval) + 1
+                dropped = behind if self.policy == SKIP else max(0, behind - self.max_catch_up)
+                if dropped:
+                    self._k += dropped
+                    self.missed += dropped
+                    if self.on_missed is not None:
+                        self.on_missed(dropped, finished - next_deadline)
+
+    def stop(self):
+        self._stop.set()
+
+    def jitter(self):
+        """How late ticks started (ms) over the recent window, at most jitter_every seconds old"""
+        now = time.monotonic()
+        if self._jitter_at is not None and now - self._jitter_at < self.jitter_every:
+            return self._jitter
+        with self._lock:
+            lateness = list(self._lateness)
+        lateness.sort()
+        if lateness:
+            self._jitter = {
+                'mean': round(sum(lateness) / len(lateness) * 1000, 3),
+                'p50': round(lateness[len(lateness) // 2] * 1000, 3),
+                'p99': round(lateness[min(len(lateness) - 1, int(len(lateness) * 0.99))] * 1000, 3),
+                'max': round(lateness[-1] * 1000, 3),
+            }
+            self._jitter_at = now
+        return self._jitter
+
+    def stats(self):
+        """Tick counts and how late ticks started (ms) over the recent window"""
+        jitter = self.jitter()
+        return {
+            'interval_ms': self.interval * 1000,
+            'policy': self.policy,
+            'ticks': self.ticks,
+            'missed': self.missed,
+            'overruns': self.overruns,
+            'last_duration_ms': None if self.last_duration is None else round(self.last_duration * 1000, 3),
+            'jitter_ms': jitter,
+        }
@@ -0,0 +1,137 @@
+"""Versioned storage format for stock records and timestamps.
+
+Version 1, the original format, stores display strings::
+
+    {'name': 'UMAE', 'price': '501.2345', 'change': '+0.25%',
+     'last_updated': '2024-05-01 10:00:00'}
+
+Version 2 stores numbers under short keys, the change as a fraction and
+times as integer epoch milliseconds::
+
+    {'v': 2, 'n': 'UMAE', 'p': 501.2345, 'c': 0.0025, 't': 1714557600000}
+
+plus 'pp' (previous close), 'cp' (closing price) and 'ms' (market status)
+once the market has been closed or opened. Formatting happens at render time.
+Readers accept either version, so the simulator, the web app and stored data
+can be upgraded in any order; migrate_schema.py rewrites old records.
+"""
+import time
+from datetime import datetime
+
+SCHEMA_VERSION = 2
+TIME_FORMAT = '%Y-%m-%d %H:%M:%S'
+
+# Version 2 key for each decoded field
+_SHORT_KEYS = {
+    'name': 'n',
+    'price': 'p',
+    'change': 'c',
+    'last_updated': 't',
+    'previous_price': 'pp',
+    'closing_price': 'cp',
+    'market_status': 'ms',
+}
+
+
+def now_ms():
+    return int(time.time() * 1000)
+
+
+def change_ratio(old_price, new_price):
+    """Fractional change from old_price to new_price"""
+    if old_price == 0:
+        return 0.0
+    return (new_price - old_price) / old_price
+
+
+def encode_stock(name, price, change, timestamp_ms):
+    """The version 2 record a tick writes for one stock.
+
+    Prices keep 4 decimals and changes 6 (a hundredth of a basis point), far
+    below what is displayed or traded on, instead of 17 digits of float repr.
+    """
+    return {'v': SCHEMA_VERSION, 'n': name, 'p': round(price, 4), 'c': round(change, 6), 't': timestamp_ms}
+
+
+def stock_field(field):
+    """Version 2 key of a stock field, for partial updates like stocks/<name>/<key>"""
+    return _SHORT_KEYS[field]
+
+
+def parse_timestamp(value):
+    """Epoch ms from epoch ms or a version 1 TIME_FORMAT string; None if unreadable"""
+    if value is None or isinstance(value, bool):
+        return None
+    if isinstance(value, (int, float)):
+        return int(value)
+    try:
+        return int(datetime.strptime(value, TIME_FORMAT).timestamp() * 1000)
+    except (TypeError, ValueError):
+        return None
+
+
+def _number(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _change(value):
+    """Fractional change from a fraction or a version 1 '+0.25%' string"""
+    if isinstance(value, str):
+        number = _number(value.strip().rstrip('%'))
+        return None if number is None else number / 100
+    return _number(value)
+
+
+def decode_stock(record):
+    """{name, price, change, last_updated, ...} with numbers and epoch ms, from either version.
+
+    Fields a record does not have are left out; unreadable values are None.
+    """
+    if not isinstance(record, dict):
+        return {}
+    if record.get('v', 1) >= 2:
+        return {field: record[key] for field, key in _SHORT_KEYS.items() if key in record}
+
+    stock = {}
+    for field in _SHORT_KEYS:
+        if field not in record:
+            continue
+        value = record[field]
+        if field in ('price', 'previous_price', 'closing_price'):
+            value = _number(value)
+        elif field == 'change':
+            value = _change(value)
+        elif field == 'last_updated':
+            value = parse_timestamp(value)
+        stock[field] = value
+    return stock
+
+
+def migrate_stock(record):
+    """A version 2 record with the same content as record"""
+    stock = decode_stock(record)
+    migrated = {'v': SCHEMA_VERSION}
+    for field, value in stock.items():
+        if value is not None:
+            migrated[_SHORT_KEYS[field]] = value
+    return migrated
+
+
+def format_change(change):
+    """'+0.25%' for a fractional change"""
+    if change is None:
+        return ''
+    return f"{'+' if change >= 0 else ''}{change * 100:.2f}%"
+
+
+def format_timestamp(value):
+    """Local TIME_FORMAT text for epoch ms (version 1 strings pass through)"""
+    if isinstance(value, str):
+        return value
+    timestamp = parse_timestamp(value)
+    if timestamp is None:
+        return ''
+    return datetime.fromtimestamp(timestamp / 1000).strftime(TIME_FORMAT)
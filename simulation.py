@@ -0,0 +1,218 @@
+"""Offline Monte Carlo runs of the live price model on a virtual clock.
+
+Runs PriceBook.tick, the same step update_stocks takes once a second, over
+many independent price paths at once: each path is a copy of the stock table
+laid side by side in one book, so a tick advances every path together. Paths
+are split into chunks across a process pool, each chunk seeded from one
+SeedSequence so results do not depend on the worker count.
+
+    python simulation.py --paths 1000 --days 5 --probability 0.01
+
+reports daily and horizon return distributions, intraday max drawdowns (one
+per path per day, measured from that session's open), event frequencies and
+how often a price hit the floor, per stock.
+"""
+import argparse
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date, datetime, timedelta
+
+import numpy as np
+
+from market_data import MARKET_CLOSE, MARKET_OPEN, special_events, stocks
+from price_engine import PRICE_FLOOR, PriceBook
+
+
+class VirtualClock:
+    """Trading days and ticks of the live schedule, without waiting for them"""
+
+    def __init__(self, start=None, market_open=MARKET_OPEN, market_close=MARKET_CLOSE, tick_seconds=1):
+        self.start = start or date.today()
+        self.market_open = market_open
+        self.market_close = market_close
+        self.tick_seconds = tick_seconds
+
+    @property
+    def ticks_per_day(self):
+        """Ticks between the open and the close, both inclusive like the live session"""
+        opened = datetime.combine(self.start, self.market_open)
+        closed = datetime.combine(self.start, self.market_close)
+        return int((closed - opened).total_seconds() // self.tick_seconds) + 1
+
+    def trading_days(self, count):
+        """The next count weekdays from start"""
+        day = self.start
+        days = []
+        while len(days) < count:
+            if day.weekday() < 5:
+                days.append(day)
+            day += timedelta(days=1)
+        return days
+
+
+def book_tables(probabilities=None):
+    """(symbols, prices, probabilities, events) from the stock table, with overrides"""
+    symbols = list(stocks)
+    prices = [stocks[s]['price'] for s in symbols]
+    events = [list(special_events.get(s, {}).get('impacts', {}).items()) for s in symbols]
+    chances = [special_events.get(s, {}).get('probability', 0.0) for s in symbols]
+    for symbol, probability in (probabilities or {}).items():
+        targets = symbols if symbol is None else [symbol]
+        for target in targets:
+            chances[symbols.index(target)] = probability
+    return symbols, prices, chances, events
+
+
+def simulate_chunk(tables, paths, days, ticks_per_day, seed):
+    """Run paths independent paths of days trading days; returns per-path arrays"""
+    symbols, prices, chances, events = tables
+    n = len(symbols)
+    book = PriceBook(symbols * paths, prices * paths, chances * paths, events * paths)
+    rng = np.random.default_rng(seed)
+
+    start = book.price.copy()
+    lowest = start.copy()
+    event_count = np.zeros(len(start), dtype=np.int64)
+    closes = np.empty((days, len(start)))
+    drawdowns = np.empty((days, len(start)))
+
+    with np.errstate(over='ignore', invalid='ignore'):
+        for day in range(days):
+            book.open_market()
+            # Drawdowns are intraday: each session measures from its own opening price
+            peak = book.price.copy()
+            worst_ratio = np.ones_like(peak)
+            for _ in range(ticks_per_day):
+                tick = book.tick(rng)
+                price = tick.new_prices
+                np.maximum(peak, price, out=peak)
+                np.minimum(worst_ratio, price / peak, out=worst_ratio)
+                np.minimum(lowest, price, out=lowest)
+                event_count += tick.event_mask
+            book.close_market()
+            closes[day] = book.price
+            drawdowns[day] = 1 - worst_ratio
+
+    return {
+        'start': start.reshape(paths, n),
+        'closes': closes.reshape(days, paths, n),
+        'max_drawdown': drawdowns.reshape(days, paths, n),
+        'floor_hit': (lowest <= PRICE_FLOOR).reshape(paths, n),
+        'events': event_count.reshape(paths, n),
+    }
+
+
+def spread(values):
+    """mean/p5/p50/p95 of the finite values in a 1-d array"""
+    finite = values[np.isfinite(values)]
+    if not len(finite):
+        return {'mean': None, 'p5': None, 'p50': None, 'p95': None}
+    p5, p50, p95 = np.percentile(finite, [5, 50, 95]).tolist()
+    return {'mean': float(finite.mean()), 'p5': p5, 'p50': p50, 'p95': p95}
+
+
+def summarize(tables, results, days, ticks_per_day):
+    """Per-stock statistics over every path of every chunk"""
+    symbols, _, chances, _ = tables
+    start = np.concatenate([r['start'] for r in results])
+    closes = np.concatenate([r['closes'] for r in results], axis=1)
+    max_drawdown = np.concatenate([r['max_drawdown'] for r in results], axis=1)
+    floor_hit = np.concatenate([r['floor_hit'] for r in results])
+    events = np.concatenate([r['events'] for r in results])
+
+    opens = np.concatenate([start[None], closes[:-1]])
+    with np.errstate(over='ignore', invalid='ignore', divide='ignore'):
+        daily_returns = closes / opens - 1
+        horizon_returns = closes[-1] / start - 1
+
+    report = {}
+    for i, symbol in enumerate(symbols):
+        report[symbol] = {
+            'daily_return': spread(daily_returns[:, :, i].ravel()),
+            'horizon_return': spread(horizon_returns[:, i]),
+            'max_drawdown': spread(max_drawdown[:, :, i].ravel()),
+            'events_per_day': float(events[:, i].mean() / days),
+            'expected_events_per_day': chances[i] * ticks_per_day,
+            'floor_hit_probability': float(floor_hit[:, i].mean()),
+            'overflow_probability': float(np.mean(~np.isfinite(closes[-1, :, i]))),
+        }
+    return report
+
+
+def parse_probabilities(values):
+    """--probability 0.01 (every stock) or --probability UMAE=0.01"""
+    probabilities = {}
+    for value in values or []:
+        symbol, _, probability = value.rpartition('=')
+        if symbol and symbol not in stocks:
+            raise SystemExit(f"❌ Unknown stock '{symbol}'")
+        probabilities[symbol or None] = float(probability)
+    return probabilities
+
+
+def percent(value):
+    """Fixed-width percentage, switching to a growth multiple once it stops fitting"""
+    if value is None:
+        return '     n/a'
+    if abs(value) >= 100:
+        return f"{value + 1:>7.1e}x"
+    return f"{value * 100:>7.2f}%"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--paths', type=int, default=1000, help='independent price paths')
+    parser.add_argument('--days', type=int, default=5, help='trading days per path')
+    parser.add_argument('--tick-seconds', type=float, default=1, help='virtual seconds between ticks')
+    parser.add_argument('--probability', action='append', metavar='[STOCK=]P',
+                        help='override the special-event probability (repeatable)')
+    parser.add_argument('--workers', type=int, default=os.cpu_count())
+    parser.add_argument('--chunk', type=int, default=250, help='paths per process-pool task')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', help='write the report as JSON to this file')
+    args = parser.parse_args()
+
+    clock = VirtualClock(tick_seconds=args.tick_seconds)
+    ticks_per_day = clock.ticks_per_day
+    tables = book_tables(parse_probabilities(args.probability))
+    sizes = [min(args.chunk, args.paths - i) for i in range(0, args.paths, args.chunk)]
+    seeds = np.random.SeedSequence(args.seed).spawn(len(sizes))
+    trading_days = args.paths * args.days
+    print(f"Simulating {trading_days:,} trading days ({args.paths} paths x {args.days} days, "
+          f"{ticks_per_day:,} ticks/day) on {args.workers} workers...")
+
+    started = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=args.workers) as pool:
+        futures = [pool.submit(simulate_chunk, tables, size, args.days, ticks_per_day, seed)
+                   for size, seed in zip(sizes, seeds)]
+        results = [future.result() for future in futures]
+    elapsed = time.perf_counter() - started
+
+    report = summarize(tables, results, args.days, ticks_per_day)
+    simulated_seconds = trading_days * ticks_per_day * args.tick_seconds
+    print(f"Done in {elapsed:.1f}s ({simulated_seconds / elapsed:,.0f}x real time)\n")
+
+    print(f"{'stock':<14} {'day p50':>8} {'day p95':>8} {'run p50':>8} {'max dd':>8} "
+          f"{'events/d':>9} {'floor':>8} {'overflow':>8}")
+    for symbol, stats in report.items():
+        print(f"{symbol:<14} {percent(stats['daily_return']['p50'])} {percent(stats['daily_return']['p95'])} "
+              f"{percent(stats['horizon_return']['p50'])} {percent(stats['max_drawdown']['p50'])} "
+              f"{stats['events_per_day']:>9.1f} {percent(stats['floor_hit_probability'])} "
+              f"{percent(stats['overflow_probability'])}")
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({
+                'config': vars(args),
+                'ticks_per_day': ticks_per_day,
+                'trading_days': [d.isoformat() for d in clock.trading_days(args.days)],
+                'elapsed_s': elapsed,
+                'stocks': report,
+            }, f, indent=2)
+        print(f"\n✅ Report written to {args.output}")
+
+
+if __name__ == '__main__':
+    main()
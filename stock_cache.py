@@ -0,0 +1,117 @@
+"""Per-worker, versioned snapshot of the stock table with single-flight refresh"""
+import threading
+import time
+
+from schema import decode_stock
+
+
+class StockSnapshot:
+    """One immutable read of the stock table.
+
+    ``raw`` is the stored records, ``stocks`` the same records decoded (see
+    schema.decode_stock) and keyed by storage name, ``by_name`` the decoded
+    records by display name, and ``prices`` the float price per display name.
+    """
+
+    def __init__(self, version, raw, to_display):
+        self.version = version
+        self.fetched_at = time.monotonic()
+        self.raw = raw
+        self.stocks = {key: decode_stock(stock) for key, stock in raw.items()}
+        self.by_name = {to_display(key): stock for key, stock in self.stocks.items()}
+        self.prices = {name: stock['price'] for name, stock in self.by_name.items()
+                       if stock.get('price') is not None}
+
+    def age(self):
+        return time.monotonic() - self.fetched_at
+
+
+class _Flight:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class StockCache:
+    """Serves the latest snapshot while it is younger than ttl.
+
+    When it expires, the first caller refreshes it and every concurrent caller
+    waits for that same read instead of issuing its own.
+    """
+
+    def __init__(self, fetch, to_display, ttl=1.0):
+        self.fetch = fetch
+        self.to_display = to_display
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._snapshot = None
+        self._flight = None
+        self._version = 0
+        self.hits = 0
+        self.misses = 0
+        self.refreshes = 0
+        self.refresh_errors = 0
+
+    def get(self, max_age=None):
+        """A snapshot no older than max_age seconds (defaults to ttl)"""
+        max_age = self.ttl if max_age is None else max_age
+        snapshot = self._snapshot
+        if snapshot is not None and snapshot.age() <= max_age:
+            self.hits += 1
+            return snapshot
+
+        with self._lock:
+            snapshot = self._snapshot
+            if snapshot is not None and snapshot.age() <= max_age:
+                self.hits += 1
+                return snapshot
+            self.misses += 1
+            flight = self._flight
+            leader = flight is None
+            if leader:
+                flight = self._flight = _Flight()
+
+        if leader:
+            try:
+                flight.result = self._store(self.fetch() or {})
+            except Exception as e:
+                self.refresh_errors += 1
+                flight.error = e
+            finally:
+                with self._lock:
+                    self._flight = None
+                flight.done.set()
+        else:
+            flight.done.wait()
+
+        if flight.error is not None:
+            raise flight.error
+        return flight.result
+
+    def _store(self, raw):
+        with self._lock:
+            self._version += 1
+            snapshot = StockSnapshot(self._version, raw, self.to_display)
+            self._snapshot = snapshot
+            self.refreshes += 1
+        return snapshot
+
+    def notify(self, raw):
+        """Install data that arrived through a change notification"""
+        return self._store(raw or {})
+
+    def invalidate(self):
+        with self._lock:
+            self._snapshot = None
+
+    def stats(self):
+        snapshot = self._snapshot
+        return {
+            'version': self._version,
+            'age_seconds': None if snapshot is None else round(snapshot.age(), 3),
+            'hits': self.hits,
+            'misses': self.misses,
+            'refreshes': self.refreshes,
+            'refresh_errors': self.refresh_errors,
+        }
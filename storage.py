@@ -0,0 +1,615 @@
+"""Storage backends with Firebase Realtime Database path semantics"""
+import hashlib
+import json
+import os
+import random
+import sqlite3
+import threading
+import time
+
+from firebase_admin import db
+
+from metrics import counter, histogram
+
+PUSH_CHARS = '-0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZ_abcdefghijklmnopqrstuvwxyz'
+
+
+def split_path(path):
+    """Split a slash separated path into its segments"""
+    return [part for part in str(path or '').split('/') if part]
+
+
+def join_path(*parts):
+    """Join path segments, ignoring empty ones"""
+    return '/'.join(seg for part in parts for seg in split_path(part))
+
+
+def normalize(value):
+    """Convert a value to the shape Firebase stores (no empty containers, lists as index maps)"""
+    if isinstance(value, (list, tuple)):
+        value = {str(i): item for i, item in enumerate(value)}
+    if isinstance(value, dict):
+        result = {}
+        for key, item in value.items():
+            item = normalize(item)
+            if item is not None:
+                result[str(key)] = item
+        return result or None
+    return value
+
+
+def _is_array_key(key):
+    return key.isdigit() and (key == '0' or not key.startswith('0'))
+
+
+def denormalize(value):
+    """Return index maps as lists, the same way Firebase does on read"""
+    if not isinstance(value, dict):
+        return value
+    result = {key: denormalize(item) for key, item in value.items()}
+    if result and all(_is_array_key(key) for key in result):
+        top = max(int(key) for key in result)
+        if len(result) * 2 > top:
+            items = [None] * (top + 1)
+            for key, item in result.items():
+                items[int(key)] = item
+            return items
+    return result
+
+
+def check_update_paths(paths):
+    """Reject multi-path updates where one path is an ancestor of another"""
+    ordered = sorted(tuple(split_path(path)) for path in paths)
+    for prev, cur in zip(ordered, ordered[1:]):
+        if cur[:len(prev)] == prev:
+            raise ValueError(f"Conflicting update paths: {'/'.join(prev)} and {'/'.join(cur)}")
+
+
+def select_keys(keys, start_at=None, end_at=None, limit_to_first=None, limit_to_last=None):
+    """Apply key-ordered query bounds to an already sorted list of keys.
+
+    Local backends order keys as strings; for the fixed-width keys used here
+    (push IDs, epoch seconds) that is the same order Firebase uses.
+    """
+    if start_at is not None:
+        keys = [key for key in keys if key >= start_at]
+    if end_at is not None:
+        keys = [key for key in keys if key <= end_at]
+    if limit_to_first is not None:
+        keys = keys[:limit_to_first]
+    if limit_to_last is not None:
+        keys = keys[-limit_to_last:] if limit_to_last else []
+    return keys
+
+
+def child_page(store, path, start_at=None, limit=1000):
+    """(children, next_start_at) for up to limit children of path from start_at on.
+
+    next_start_at is None on the last page, so pages can be walked without
+    ever reading the whole node.
+    """
+    children = store.query(path, start_at=start_at, limit_to_first=limit + 1)
+    keys = sorted(children)
+    next_start_at = keys[limit] if len(keys) > limit else None
+    return {key: children[key] for key in keys[:limit]}, next_start_at
+
+
+def iter_child_pages(store, path, page_size=1000):
+    """Yield the children of path one page at a time, in key order"""
+    start_at = None
+    while True:
+        children, start_at = child_page(store, path, start_at, page_size)
+        if children:
+            yield children
+        if start_at is None:
+            return
+
+
+def content_etag(value):
+    """ETag for a stored value: a hash of its canonical JSON"""
+    encoded = json.dumps(value, sort_keys=True, separators=(',', ':'))
+    return hashlib.sha1(encoded.encode('utf-8')).hexdigest()
+
+
+class ConflictError(Exception):
+    """A conditional write kept losing to concurrent writers"""
+
+
+class PushIdGenerator:
+    """Chronologically ordered 20 character keys, compatible with Firebase push IDs"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._last_time = 0
+        self._last_random = [0] * 12
+
+    def __call__(self):
+        with self._lock:
+            now = int(time.time() * 1000)
+            if now == self._last_time:
+                # Same millisecond: increment the random part so keys keep sorting
+                for i in range(11, -1, -1):
+                    if self._last_random[i] != 63:
+                        self._last_random[i] += 1
+                        break
+                    self._last_random[i] = 0
+            else:
+                self._last_time = now
+                self._last_random = [random.randrange(64) for _ in range(12)]
+
+            stamp = []
+            for _ in range(8):
+                stamp.append(PUSH_CHARS[now % 64])
+                now //= 64
+            return ''.join(reversed(stamp)) + ''.join(PUSH_CHARS[i] for i in self._last_random)
+
+
+# Client-side key generator shared by every backend (and by callers that need
+# keys for a multi-path update)
+new_push_id = PushIdGenerator()
+
+
+class Storage:
+    """Common interface for every storage backend"""
+
+    def get(self, path='', shallow=False):
+        """Read the value at path (None if missing)"""
+        raise NotImplementedError
+
+    def set(self, path, value):
+        """Replace the value at path; None deletes it"""
+        raise NotImplementedError
+
+    def update(self, path, values):
+        """Atomically write several children of path; keys may be nested paths"""
+        raise NotImplementedError
+
+    def push(self, path, value):
+        """Append value under a new chronologically ordered key and return the key"""
+        raise NotImplementedError
+
+    def query(self, path, start_at=None, end_at=None, limit_to_first=None, limit_to_last=None):
+        """Children of path ordered by key, optionally bounded and limited"""
+        raise NotImplementedError
+
+    def get_with_etag(self, path):
+        """Read the value at path together with an ETag for set_if_unchanged"""
+        raise NotImplementedError
+
+    def set_if_unchanged(self, path, value, etag):
+        """Write value only if path still matches etag; returns True on success"""
+        raise NotImplementedError
+
+    def delete(self, path):
+        """Remove the value at path"""
+        self.set(path, None)
+
+    def transaction(self, path, update_fn, max_attempts=10, base_delay=0.005):
+        """Optimistic read-modify-write of path.
+
+        update_fn receives the current value and returns the new one. If another
+        writer changes path in between, the write is retried with jittered
+        exponential backoff. Returns ``(new_value, attempts)`` or raises
+        ConflictError after max_attempts.
+        """
+        for attempt in range(1, max_attempts + 1):
+            value, etag = self.get_with_etag(path)
+            new_value = update_fn(value)
+            if self.set_if_unchanged(path, new_value, etag):
+                return new_value, attempt
+            time.sleep(random.uniform(0, base_delay * 2 ** (attempt - 1)))
+        raise ConflictError(f"Gave up writing {path} after {max_attempts} attempts")
+
+
+class FirebaseStorage(Storage):
+    """Firebase Realtime Database backend (firebase_admin must already be initialized)"""
+
+    def __init__(self, app=None):
+        self.app = app
+
+    def _ref(self, path):
+        return db.reference('/' + join_path(path), app=self.app)
+
+    def get(self, path='', shallow=False):
+        return self._ref(path).get(shallow=shallow)
+
+    def set(self, path, value):
+        ref = self._ref(path)
+        if value is None:
+            ref.delete()
+        else:
+            ref.set(value)
+
+    def update(self, path, values):
+        if values:
+            self._ref(path).update(values)
+
+    def push(self, path, value):
+        return self._ref(path).push(value).key
+
+    def query(self, path, start_at=None, end_at=None, limit_to_first=None, limit_to_last=None):
+        query = self._ref(path).order_by_key()
+        if start_at is not None:
+            query = query.start_at(start_at)
+        if end_at is not None:
+            query = query.end_at(end_at)
+        if limit_to_first is not None:
+            query = query.limit_to_first(limit_to_first)
+        if limit_to_last is not None:
+            query = query.limit_to_last(limit_to_last)
+        return dict(query.get() or {})
+
+    def get_with_etag(self, path):
+        return self._ref(path).get(etag=True)
+
+    def set_if_unchanged(self, path, value, etag):
+        success, _, _ = self._ref(path).set_if_unchanged(etag, value)
+        return success
+
+
+class MemoryStorage(Storage):
+    """In-process tree with the same path semantics as Firebase"""
+
+    def __init__(self, data=None):
+        self._lock = threading.RLock()
+        self._root = normalize(data) or {}
+
+    def _node(self, parts):
+        node = self._root
+        for part in parts:
+            if not isinstance(node, dict) or part not in node:
+                return None
+            node = node[part]
+        return node
+
+    def _write(self, parts, value):
+        if not parts:
+            self._root = value if isinstance(value, dict) else {}
+            return
+
+        # Walk down, recording the trail so empty parents can be pruned
+        trail = []
+        node = self._root
+        for part in parts[:-1]:
+            child = node.get(part)
+            if not isinstance(child, dict):
+                if value is None:
+                    return
+                child = node[part] = {}
+            trail.append((node, part))
+            node = child
+
+        if value is None:
+            node.pop(parts[-1], None)
+        else:
+            node[parts[-1]] = value
+
+        for parent, part in reversed(trail):
+            if parent[part]:
+                break
+            del parent[part]
+
+    def get(self, path='', shallow=False):
+        with self._lock:
+            node = self._node(split_path(path))
+            if shallow and isinstance(node, dict):
+                return {key: True if isinstance(item, dict) else item for key, item in node.items()}
+            # Round-trip through JSON so callers never hold references into the tree
+            return denormalize(json.loads(json.dumps(node)))
+
+    def set(self, path, value):
+        value = normalize(json.loads(json.dumps(value)))
+        with self._lock:
+            self._write(split_path(path), value)
+
+    def update(self, path, values):
+        check_update_paths(values)
+        base = split_path(path)
+        values = {key: normalize(json.loads(json.dumps(item))) for key, item in values.items()}
+        with self._lock:
+            for key, item in values.items():
+                self._write(base + split_path(key), item)
+
+    def push(self, path, value):
+        key = new_push_id()
+        self.set(join_path(path, key), value)
+        return key
+
+    def query(self, path, start_at=None, end_at=None, limit_to_first=None, limit_to_last=None):
+        with self._lock:
+            node = self._node(split_path(path))
+            if not isinstance(node, dict):
+                return {}
+            keys = select_keys(sorted(node), start_at, end_at, limit_to_first, limit_to_last)
+            return {key: denormalize(json.loads(json.dumps(node[key]))) for key in keys}
+
+    def get_with_etag(self, path):
+        with self._lock:
+            node = self._node(split_path(path))
+            return denormalize(json.loads(json.dumps(node))), content_etag(node)
+
+    def set_if_unchanged(self, path, value, etag):
+        value = normalize(json.loads(json.dumps(value)))
+        parts = split_path(path)
+        with self._lock:
+            if content_etag(self._node(parts)) != etag:
+                return False
+            self._write(parts, value)
+            return True
+
+
+def _flatten(prefix, value, out):
+    if isinstance(value, dict):
+        for key, item in value.items():
+            _flatten(f'{prefix}/{key}' if prefix else key, item, out)
+    else:
+        out.append((prefix, json.dumps(value)))
+    return out
+
+
+_KEY_ORDER = "replace(path, '/', char(1))"
+
+
+class SQLiteStorage(Storage):
+    """File-backed tree stored as one row per leaf, shareable between processes"""
+
+    def __init__(self, filename):
+        self.filename = filename
+        self._lock = threading.RLock()
+        self._conn = sqlite3.connect(filename, timeout=30, isolation_level=None, check_same_thread=False)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute('PRAGMA synchronous=NORMAL')
+        self._conn.execute('CREATE TABLE IF NOT EXISTS nodes (path TEXT PRIMARY KEY, value TEXT NOT NULL) WITHOUT ROWID')
+        # Keys may hold characters that sort below '/' ('bob-2' before 'bob/...'), so queries
+        # order paths with '/' mapped to \x01, below every character a key can contain
+        self._conn.execute(f'CREATE INDEX IF NOT EXISTS nodes_by_key ON nodes ({_KEY_ORDER})')
+
+    def _rows(self, path):
+        if not path:
+            return self._conn.execute('SELECT path, value FROM nodes').fetchall()
+        # '0' sorts right after '/', so this range is exactly the subtree
+        return self._conn.execute(
+            'SELECT path, value FROM nodes WHERE path = ? OR (path > ? AND path < ?)',
+            (path, path + '/', path + '0')
+        ).fetchall()
+
+    def _write(self, path, value):
+        parts = split_path(path)
+        path = '/'.join(parts)
+        if path:
+            self._conn.execute('DELETE FROM nodes WHERE path = ? OR (path > ? AND path < ?)',
+                               (path, path + '/', path + '0'))
+            # A leaf stored at an ancestor would shadow the new children
+            ancestors = ['/'.join(parts[:i]) for i in range(1, len(parts))]
+            if ancestors and value is not None:
+                self._conn.executemany('DELETE FROM nodes WHERE path = ?', [(a,) for a in ancestors])
+        else:
+            self._conn.execute('DELETE FROM nodes')
+        if value is not None:
+            self._conn.executemany('INSERT INTO nodes (path, value) VALUES (?, ?)', _flatten(path, value, []))
+
+    def get(self, path='', shallow=False):
+        path = join_path(path)
+        with self._lock:
+            rows = self._rows(path)
+        return self._tree(path, rows, shallow)
+
+    def _tree(self, path, rows, shallow=False):
+        if not rows:
+            return None
+
+        depth = len(split_path(path))
+        tree = {}
+        for row_path, raw in rows:
+            parts = split_path(row_path)[depth:]
+            if not parts:
+                return json.loads(raw)
+            if shallow:
+                tree[parts[0]] = True if len(parts) > 1 else json.loads(raw)
+                continue
+            node = tree
+            for part in parts[:-1]:
+                node = node.setdefault(part, {})
+            node[parts[-1]] = json.loads(raw)
+        return tree if shallow else denormalize(tree)
+
+    def _transaction(self, writes):
+        with self._lock:
+            self._conn.execute('BEGIN IMMEDIATE')
+            try:
+                for path, value in writes:
+                    self._write(path, value)
+            except Exception:
+                self._conn.execute('ROLLBACK')
+                raise
+            self._conn.execute('COMMIT')
+
+    def set(self, path, value):
+        self._transaction([(path, normalize(value))])
+
+    def update(self, path, values):
+        check_update_paths(values)
+        self._transaction([(join_path(path, key), normalize(item)) for key, item in values.items()])
+
+    def push(self, path, value):
+        key = new_push_id()
+        self.set(join_path(path, key), value)
+        return key
+
+    def get_with_etag(self, path):
+        path = join_path(path)
+        with self._lock:
+            rows = self._rows(path)
+        value = self._tree(path, rows)
+        return value, content_etag(value)
+
+    def set_if_unchanged(self, path, value, etag):
+        path = join_path(path)
+        value = normalize(value)
+        with self._lock:
+            # The write lock is held from the comparison until the commit
+            self._conn.execute('BEGIN IMMEDIATE')
+            try:
+                if content_etag(self._tree(path, self._rows(path))) != etag:
+                    self._conn.execute('ROLLBACK')
+                    return False
+                self._write(path, value)
+            except Exception:
+                self._conn.execute('ROLLBACK')
+                raise
+            self._conn.execute('COMMIT')
+            return True
+
+    def query(self, path, start_at=None, end_at=None, limit_to_first=None, limit_to_last=None):
+        base = join_path(path)
+        prefix = base + '/' if base else ''
+        # Bounds in the index's order, where '/' is \x01 and so \x02 ends a subtree
+        ordered = prefix.replace('/', '\x01')
+        low = ordered + (start_at or '')
+        high = ordered + end_at + '\x02' if end_at is not None else (ordered[:-1] + '\x02' if base else None)
+        descending = limit_to_last is not None and limit_to_first is None
+        limit = limit_to_last if descending else limit_to_first
+
+        sql = f'SELECT path, value FROM nodes WHERE {_KEY_ORDER} >= ?'
+        params = [low]
+        if high is not None:
+            sql += f' AND {_KEY_ORDER} < ?'
+            params.append(high)
+        sql += f' ORDER BY {_KEY_ORDER} DESC' if descending else f' ORDER BY {_KEY_ORDER}'
+
+        # Stream rows child by child and stop once enough children were seen
+        children = {}
+        with self._lock:
+            for row_path, raw in self._conn.execute(sql, params):
+                parts = split_path(row_path[len(prefix):])
+                key = parts[0]
+                if (start_at is not None and key < start_at) or (end_at is not None and key > end_at):
+                    continue
+                if key not in children:
+                    if limit is not None and len(children) == limit:
+                        break
+                    children[key] = {}
+                if len(parts) == 1:
+                    children[key] = json.loads(raw)
+                    continue
+                node = children[key]
+                for part in parts[1:-1]:
+                    node = node.setdefault(part, {})
+                node[parts[-1]] = json.loads(raw)
+
+        keys = select_keys(sorted(children), None, None, limit_to_first, limit_to_last)
+        return {key: denormalize(children[key]) for key in keys}
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+class DelayedStorage(Storage):
+    """Adds a fixed round-trip delay to every call of another backend.
+
+    Local backends answer in microseconds; this makes them behave like a
+    remote database when measuring how the servers cope with slow storage.
+    """
+
+    def __init__(self, inner, delay):
+        self.inner = inner
+        self.delay = delay
+
+    def get(self, path='', shallow=False):
+        time.sleep(self.delay)
+        return self.inner.get(path, shallow)
+
+    def set(self, path, value):
+        time.sleep(self.delay)
+        self.inner.set(path, value)
+
+    def update(self, path, values):
+        time.sleep(self.delay)
+        self.inner.update(path, values)
+
+    def push(self, path, value):
+        time.sleep(self.delay)
+        return self.inner.push(path, value)
+
+    def query(self, path, start_at=None, end_at=None, limit_to_first=None, limit_to_last=None):
+        time.sleep(self.delay)
+        return self.inner.query(path, start_at, end_at, limit_to_first, limit_to_last)
+
+    def get_with_etag(self, path):
+        time.sleep(self.delay)
+        return self.inner.get_with_etag(path)
+
+    def set_if_unchanged(self, path, value, etag):
+        time.sleep(self.delay)
+        return self.inner.set_if_unchanged(path, value, etag)
+
+
+STORAGE_SECONDS = histogram('storage_operation_seconds', 'Storage call latency by operation and top-level path',
+                            ['operation', 'path'])
+STORAGE_ERRORS = counter('storage_errors_total', 'Storage calls that raised', ['operation', 'path'])
+
+
+class InstrumentedStorage(Storage):
+    """Records the latency and failures of every call of another backend.
+
+    Calls are labelled with the first path segment (users, stocks, ...), or
+    root for multi-path updates, which keeps the number of series small.
+    """
+
+    def __init__(self, inner):
+        self.inner = inner
+
+    def _call(self, operation, path, method, *args):
+        parts = split_path(path)
+        label = parts[0] if parts else 'root'
+        start = time.perf_counter()
+        try:
+            return method(path, *args)
+        except Exception:
+            STORAGE_ERRORS.labels(operation, label).inc()
+            raise
+        finally:
+            STORAGE_SECONDS.labels(operation, label).observe(time.perf_counter() - start)
+
+    def get(self, path='', shallow=False):
+        return self._call('get', path, self.inner.get, shallow)
+
+    def set(self, path, value):
+        self._call('set', path, self.inner.set, value)
+
+    def update(self, path, values):
+        self._call('update', path, self.inner.update, values)
+
+    def push(self, path, value):
+        return self._call('push', path, self.inner.push, value)
+
+    def query(self, path, start_at=None, end_at=None, limit_to_first=None, limit_to_last=None):
+        return self._call('query', path, self.inner.query, start_at, end_at, limit_to_first, limit_to_last)
+
+    def get_with_etag(self, path):
+        return self._call('get_with_etag', path, self.inner.get_with_etag)
+
+    def set_if_unchanged(self, path, value, etag):
+        return self._call('set_if_unchanged', path, self.inner.set_if_unchanged, value, etag)
+
+
+def open_storage(backend=None, path=None):
+    """Create the backend named by STORAGE_BACKEND (firebase, memory or sqlite).
+
+    STORAGE_LATENCY_MS adds that much delay to every call, for benchmarks.
+    Every call is timed into the storage metrics.
+    """
+    backend = backend or os.getenv('STORAGE_BACKEND', 'firebase')
+    if backend == 'firebase':
+        store = FirebaseStorage()
+    elif backend == 'memory':
+        store = MemoryStorage()
+    elif backend == 'sqlite':
+        store = SQLiteStorage(path or os.getenv('STORAGE_PATH', 'fakestocksim.db'))
+    else:
+        raise ValueError(f"Unknown storage backend: {backend}")
+    latency_ms = float(os.getenv('STORAGE_LATENCY_MS', 0))
+    if latency_ms > 0:
+        store = DelayedStorage(store, latency_ms / 1000)
+    return InstrumentedStorage(store)
@@ -0,0 +1,150 @@
+"""Fan-out of live price changes from one shared upstream read to many clients"""
+import json
+import queue
+import threading
+import time
+
+from schema import format_change
+
+
+def format_event(event, data):
+    """Encode one Server-Sent Events message"""
+    return f"event: {event}\ndata: {json.dumps(data, separators=(',', ':'))}\n\n"
+
+
+class Subscription:
+    """One connected client: a bounded queue of (event, data) messages"""
+
+    def __init__(self, size, wake=None):
+        self.queue = queue.Queue(maxsize=size)
+        self.wake = wake
+        self.connected_at = time.time()
+        self.resyncs = 0
+
+    def get(self, timeout):
+        return self.queue.get(timeout=timeout)
+
+
+class PriceBroadcaster:
+    """Polls the stock table once per interval and pushes only what changed.
+
+    The upstream thread runs only while at least one client is subscribed, so
+    the read cost is one fetch per interval per worker no matter how many
+    viewers there are. A client whose queue fills up is dropped back to a
+    single full snapshot instead of letting messages pile up. Past max_clients
+    subscribe() refuses new clients, which poll current() instead.
+    """
+
+    def __init__(self, fetch, interval=1.0, queue_size=32, max_clients=None):
+        self.fetch = fetch
+        self.interval = interval
+        self.queue_size = queue_size
+        self.max_clients = max_clients
+        self._lock = threading.Lock()
+        self._wake = threading.Condition(self._lock)
+        self._subscribers = set()
+        self._latest = None
+        self._thread = None
+        self.upstream_reads = 0
+        self.upstream_errors = 0
+        self.messages_sent = 0
+        self.resyncs = 0
+        self.rejected = 0
+
+    def _read(self):
+        data = self.fetch() or {}
+        self.upstream_reads += 1
+        return {
+            stock.get('name') or key: {'price': stock.get('price'), 'change': format_change(stock.get('change'))}
+            for key, stock in data.items()
+        }
+
+    def snapshot(self):
+        """The latest known prices (fetched once if nothing is cached yet)"""
+        latest = self._latest
+        if latest is None:
+            latest = self._latest = self._read()
+        return latest
+
+    def current(self):
+        """Fresh prices for a client polling instead of streaming"""
+        return self._read()
+
+    def subscribe(self, wake=None):
+        """A new client's subscription, or None when max_clients are already connected.
+
+        wake, if given, is called after every message queued for this client,
+        for readers that wait on an event loop rather than on the queue.
+        """
+        subscription = Subscription(self.queue_size, wake)
+        with self._lock:
+            if self.max_clients is not None and len(self._subscribers) >= self.max_clients:
+                self.rejected += 1
+                return None
+            self._subscribers.add(subscription)
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name='price-broadcaster', daemon=True)
+                self._thread.start()
+            self._wake.notify()
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            self._subscribers.discard(subscription)
+
+    def stats(self):
+        with self._lock:
+            depths = [s.queue.qsize() for s in self._subscribers]
+        return {
+            'clients': len(depths),
+            'max_clients': self.max_clients,
+            'rejected': self.rejected,
+            'max_queue_depth': max(depths, default=0),
+            'upstream_reads': self.upstream_reads,
+            'upstream_errors': self.upstream_errors,
+            'messages_sent': self.messages_sent,
+            'resyncs': self.resyncs,
+        }
+
+    def publish(self, event, data):
+        with self._lock:
+            subscribers = list(self._subscribers)
+        for subscription in subscribers:
+            try:
+                subscription.queue.put_nowait((event, data))
+                self.messages_sent += 1
+            except queue.Full:
+                self._resync(subscription)
+            if subscription.wake is not None:
+                subscription.wake()
+
+    def _resync(self, subscription):
+        """Slow consumer: discard its backlog and queue one full snapshot"""
+        try:
+            while True:
+                subscription.queue.get_nowait()
+        except queue.Empty:
+            pass
+        subscription.resyncs += 1
+        self.resyncs += 1
+        subscription.queue.put_nowait(('snapshot', self._latest))
+
+    def _run(self):
+        while True:
+            with self._lock:
+                while not self._subscribers:
+                    self._wake.wait()
+
+            started = time.monotonic()
+            try:
+                current = self._read()
+            except Exception as e:
+                self.upstream_errors += 1
+                print(f"Error reading prices for stream: {str(e)}")
+            else:
+                previous = self._latest or {}
+                changes = {name: values for name, values in current.items() if previous.get(name) != values}
+                self._latest = current
+                if changes:
+                    self.publish('prices', changes)
+            time.sleep(max(0.0, self.interval - (time.monotonic() - started)))
@@ -0,0 +1,69 @@
+"""Web app routes, run against the in-memory storage backend"""
+import os
+import time
+
+import pytest
+
+os.environ['STORAGE_BACKEND'] = 'memory'
+os.environ.setdefault('FLASK_SECRET_KEY', 'tests')
+
+import app as web  # noqa: E402
+from tick_history import TickHistory  # noqa: E402
+
+
+@pytest.fixture
+def client():
+    web.app.config['TESTING'] = True
+    return web.app.test_client()
+
+
+@pytest.fixture
+def history(tmp_path, monkeypatch):
+    writer = TickHistory(str(tmp_path), symbols=['Acme Corp'], capacity=100)
+    monkeypatch.setattr(web, 'tick_history', TickHistory(str(tmp_path)))
+    return writer
+
+
+def test_history_returns_the_recorded_ticks_in_range(client, history):
+    now = int(time.time() * 1000)
+    for i in range(5):
+        history.append(now - 5000 + i * 1000, [100.0 + i])
+    history.flush()
+    response = client.get(f'/api/history/Acme_Corp?start={now - 3500}&end={now}')
+    assert response.status_code == 200
+    assert [price for _, price in response.json['points']] == [102.0, 103.0, 104.0]
+
+
+@pytest.mark.parametrize('start, end', [
+    (10 ** 20, 10 ** 20 + 1),  # both past the last date datetime can represent
+    (int(time.time() * 1000) + 86400 * 1000, 10 ** 15),
+])
+def test_history_starting_after_now_is_empty(client, history, start, end):
+    response = client.get(f'/api/history/Acme_Corp?start={start}&end={end}')
+    assert response.status_code == 200
+    assert response.json['points'] == []
+    assert response.json['start'] == response.json['end'] <= int(time.time() * 1000)
+
+
+def test_history_range_is_capped(client, history):
+    response = client.get('/api/history/Acme_Corp?start=0')
+    assert response.status_code == 200
+    assert response.json['end'] - response.json['start'] == int(web.HISTORY_MAX_DAYS * 86400 * 1000)
+
+
+@pytest.mark.parametrize('query', ['start=-1', 'start=5&end=4', 'start=soon'])
+def test_history_rejects_bad_ranges(client, history, query):
+    assert client.get(f'/api/history/Acme_Corp?{query}').status_code == 400
+
+
+def test_register_creates_the_account_and_logs_in(client):
+    response = client.post('/register', data={'username': 'reg-new'})
+    assert response.status_code == 302 and response.location.endswith('/dashboard')
+    assert web.store.get('users/reg-new/cash_balance') == 10000.0
+
+
+def test_register_never_overwrites_an_existing_account(client):
+    web.store.set('users/reg-taken', {'username': 'reg-taken', 'cash_balance': 5.0, 'revision': 3})
+    response = client.post('/register', data={'username': 'reg-taken'}, follow_redirects=True)
+    assert b'Username already exists' in response.data
+    assert web.store.get('users/reg-taken') == {'username': 'reg-taken', 'cash_balance': 5.0, 'revision': 3}
@@ -0,0 +1,100 @@
+"""Event log records, snapshots, recovery and pruning"""
+import os
+
+from event_log import MARKET, TICK, TRADE, EventLog
+
+
+def files(root, prefix):
+    return sorted(name for name in os.listdir(root) if name.startswith(prefix))
+
+
+def test_records_round_trip(tmp_path):
+    log = EventLog(str(tmp_path))
+    log.tick(1000, [1.5, 2.25])
+    log.record(TRADE, 2000, {'user': 'bob', 'cash': 10.0})
+    log.close()
+
+    state, events = EventLog(str(tmp_path)).recover()
+    assert state is None
+    assert events == [(TICK, 1000, [1.5, 2.25]), (TRADE, 2000, {'user': 'bob', 'cash': 10.0})]
+
+
+def test_recover_loads_the_snapshot_and_replays_only_later_events(tmp_path):
+    log = EventLog(str(tmp_path), snapshot_every=2)
+    log.tick(1, [1.0])
+    assert not log.due()
+    log.tick(2, [2.0])
+    assert log.due()
+    log.snapshot({'price': [2.0]})
+    assert not log.due()
+    log.tick(3, [3.0])
+    log.record(MARKET, 4, {'status': 'closed'})
+    log.close()
+
+    recovered = EventLog(str(tmp_path))
+    state, events = recovered.recover()
+    assert state == {'price': [2.0]}
+    assert events == [(TICK, 3, [3.0]), (MARKET, 4, {'status': 'closed'})]
+    assert (recovered.snapshot_seq, recovered.seq) == (2, 4)
+
+
+def test_a_torn_record_is_dropped_and_logging_continues_in_a_new_segment(tmp_path):
+    log = EventLog(str(tmp_path))
+    log.tick(1, [1.0])
+    log.tick(2, [2.0])
+    log.close()
+    segment = os.path.join(str(tmp_path), files(str(tmp_path), 'events')[0])
+    with open(segment, 'r+b') as f:
+        f.truncate(os.path.getsize(segment) - 3)  # crash halfway through the second tick
+
+    log = EventLog(str(tmp_path))
+    _, events = log.recover()
+    assert events == [(TICK, 1, [1.0])]
+    log.tick(3, [3.0])
+    log.close()
+    assert len(files(str(tmp_path), 'events')) == 2
+
+    _, events = EventLog(str(tmp_path)).recover()
+    assert events == [(TICK, 1, [1.0]), (TICK, 3, [3.0])]
+
+
+def test_prune_keeps_the_newest_snapshots_and_the_segments_they_need(tmp_path):
+    root = str(tmp_path)
+    log = EventLog(root, keep=2)
+    for i in range(4):
+        log.tick(i, [float(i)])
+        log.snapshot({'n': i})
+    log.tick(99, [99.0])
+    log.close()
+
+    assert files(root, 'snapshot') == ['snapshot-000000000003.pkl', 'snapshot-000000000004.pkl']
+    assert files(root, 'events') == ['events-000000000003.log', 'events-000000000004.log']
+    state, events = EventLog(root).recover()
+    assert state == {'n': 3}
+    assert events == [(TICK, 99, [99.0])]
+
+
+def test_an_unreadable_snapshot_falls_back_to_the_one_before(tmp_path):
+    root = str(tmp_path)
+    log = EventLog(root, keep=2)
+    log.tick(1, [1.0])
+    log.snapshot({'n': 1})
+    log.tick(2, [2.0])
+    log.snapshot({'n': 2})
+    log.tick(3, [3.0])
+    log.close()
+    with open(os.path.join(root, files(root, 'snapshot')[-1]), 'wb') as f:
+        f.write(b'not a pickle')
+
+    state, events = EventLog(root).recover()
+    assert state == {'n': 1}
+    assert events == [(TICK, 2, [2.0]), (TICK, 3, [3.0])]
+
+
+def test_snapshot_files_are_written_atomically(tmp_path):
+    root = str(tmp_path)
+    log = EventLog(root)
+    log.tick(1, [1.0])
+    log.snapshot({'n': 1})
+    log.close()
+    assert not [name for name in os.listdir(root) if name.endswith('.tmp')]
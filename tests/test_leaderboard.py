@@ -0,0 +1,70 @@
+"""Ranking of account values taken from the holdings matrix"""
+import numpy as np
+
+from leaderboard import Leaderboard, account_from_document
+from valuation import HoldingsMatrix
+
+
+def board(accounts, **options):
+    matrix = HoldingsMatrix(['A'], [10.0])
+    leaderboard = Leaderboard(matrix, **options)
+    leaderboard.refresh(matrix.add_missing(accounts))
+    return matrix, leaderboard
+
+
+def test_accounts_rank_by_value_then_name():
+    _, leaderboard = board({'carol': (50.0, {}), 'bob': (0.0, {'A': 5}), 'ann': (50.0, {}), 'dan': (1.0, {})})
+    assert leaderboard.top(3) == [(1, 'ann', 50.0), (2, 'bob', 50.0), (3, 'carol', 50.0)]
+    assert leaderboard.rank('dan') == (4, 1.0)
+    assert leaderboard.rank('nobody') is None
+    assert [username for _, username, _ in leaderboard.standings()] == ['ann', 'bob', 'carol', 'dan']
+
+
+def test_a_trade_moves_only_that_account():
+    matrix, leaderboard = board({'ann': (100.0, {}), 'bob': (50.0, {})})
+    matrix.set_account('bob', 0.0, {'A': 20})
+    leaderboard.refresh(['bob'])
+    assert leaderboard.top(2) == [(1, 'bob', 200.0), (2, 'ann', 100.0)]
+
+
+def test_removed_accounts_leave_the_board():
+    matrix, leaderboard = board({'ann': (100.0, {}), 'bob': (50.0, {})})
+    matrix.remove('ann')
+    leaderboard.refresh(['ann'])
+    assert leaderboard.top(5) == [(1, 'bob', 50.0)]
+    assert len(leaderboard) == 1 and leaderboard.value('ann') is None
+
+
+def test_a_tick_re_ranks_the_accounts_it_moved():
+    for fraction in (1.0, 0.0):  # one entry at a time, and the merge of many moved entries
+        matrix, leaderboard = board({'ann': (100.0, {}), 'bob': (0.0, {'A': 5}), 'cy': (0.0, {'A': 9})},
+                                    rebuild_fraction=fraction)
+        assert leaderboard.refresh_rows(matrix.revalue([20.0])) == 2
+        assert leaderboard.top(3) == [(1, 'cy', 180.0), (2, 'ann', 100.0), (3, 'bob', 100.0)]
+
+
+def test_matches_a_full_sort_after_many_ticks_and_trades():
+    rng = np.random.default_rng(7)
+    symbols = [f'S{i}' for i in range(10)]
+    matrix = HoldingsMatrix(symbols, rng.uniform(1, 100, 10))
+    leaderboard = Leaderboard(matrix, rebuild_fraction=0.2)
+    accounts = {f'u{i}': (float(rng.uniform(0, 500)), {symbols[int(rng.integers(10))]: int(rng.integers(1, 9))})
+                for i in range(200)}
+    leaderboard.refresh(matrix.add_missing(accounts))
+    for _ in range(30):
+        prices = matrix.prices.copy()
+        prices[rng.choice(10, 2, replace=False)] *= rng.uniform(0.9, 1.1, 2)
+        leaderboard.refresh_rows(matrix.revalue(prices))
+        username = f'u{int(rng.integers(200))}'
+        matrix.set_account(username, float(rng.uniform(0, 500)), {})
+        leaderboard.refresh([username])
+
+    expected = sorted((-matrix.value(u), u) for u in accounts)
+    assert [(u, v) for _, u, v in leaderboard.standings()] == [(u, -v) for v, u in expected]
+
+
+def test_account_from_document_reads_console_and_web_documents():
+    assert account_from_document({'cash': 5, 'portfolio': {'A': 2, 'B': 0}}) == (5.0, {'A': 2})
+    web = {'cash_balance': 7.5, 'portfolio': {'A': {'quantity': 3, 'current_price': 1.0}}}
+    assert account_from_document(web) == (7.5, {'A': 3})
+    assert account_from_document({}) == (0.0, {})
@@ -0,0 +1,78 @@
+"""Limit/stop order matching against simulator ticks"""
+import pytest
+
+from order_book import MatchingEngine, Order
+
+
+def order(id, side, kind, price, symbol='A', owner='bob', quantity=1):
+    return Order(id, owner, symbol, side, kind, price, quantity)
+
+
+def fired(fills):
+    return [(o.id, price) for o, price in fills]
+
+
+@pytest.mark.parametrize('side, kind, price, fires_at, holds_at', [
+    ('buy', 'limit', 100, 100, 100.01),
+    ('sell', 'limit', 100, 100, 99.99),
+    ('sell', 'stop', 100, 100, 100.01),
+    ('buy', 'stop', 100, 100, 99.99),
+])
+def test_each_order_type_fires_when_the_price_crosses_it(side, kind, price, fires_at, holds_at):
+    engine = MatchingEngine()
+    engine.place(order(1, side, kind, price))
+    assert engine.match(['A'], [holds_at]) == []
+    assert fired(engine.match(['A'], [fires_at])) == [(1, fires_at)]
+    assert engine.match(['A'], [fires_at]) == []
+    assert len(engine) == 0
+
+
+def test_one_tick_fills_crossed_orders_in_time_priority():
+    engine = MatchingEngine()
+    engine.place(order(1, 'buy', 'limit', 95))
+    engine.place(order(2, 'buy', 'limit', 99))
+    engine.place(order(3, 'buy', 'limit', 90))
+    engine.place(order(4, 'sell', 'stop', 97))
+    assert fired(engine.match(['A'], [96])) == [(2, 96), (4, 96)]
+    assert fired(engine.match(['A'], [80])) == [(1, 80), (3, 80)]
+
+
+def test_orders_only_match_their_own_symbol():
+    engine = MatchingEngine()
+    engine.place(order(1, 'buy', 'limit', 100, symbol='A'))
+    engine.place(order(2, 'buy', 'limit', 100, symbol='B'))
+    assert fired(engine.match(['A', 'C'], [50, 50])) == [(1, 50)]
+    assert [o.id for o in engine.open_orders()] == [2]
+
+
+def test_cancelled_orders_never_fire():
+    engine = MatchingEngine()
+    for i in range(10):
+        engine.place(order(i, 'buy', 'limit', 100 + i))
+    assert engine.cancel(3, owner='carol') is None
+    for i in range(0, 10, 2):
+        assert engine.cancel(i).status == 'cancelled'
+    assert engine.cancel(0) is None
+    assert len(engine.books['A']) == 5
+    assert fired(engine.match(['A'], [1])) == [(i, 1) for i in range(1, 10, 2)]
+    assert engine.matched == 5
+
+
+def test_triggered_orders_are_marked_and_forgotten():
+    engine = MatchingEngine()
+    placed = engine.place(order(1, 'sell', 'limit', 10, owner='carol'))
+    engine.match(['A'], [11])
+    assert placed.status == 'triggered'
+    assert engine.open_orders('carol') == []
+    assert engine.cancel(1) is None
+
+
+def test_invalid_orders_are_rejected():
+    engine = MatchingEngine()
+    engine.place(order(1, 'buy', 'limit', 10))
+    with pytest.raises(ValueError):
+        engine.place(order(1, 'buy', 'limit', 10))
+    for side, kind, price, quantity in [('hold', 'limit', 1, 1), ('buy', 'market', 1, 1),
+                                        ('buy', 'limit', 0, 1), ('buy', 'limit', 1, 0)]:
+        with pytest.raises(ValueError):
+            order(2, side, kind, price, quantity=quantity)
@@ -0,0 +1,52 @@
+"""Fixed-rate tick scheduling: overrun policies and stopping while waiting"""
+import threading
+import time
+
+from scheduler import CATCH_UP, SKIP, TickScheduler
+
+
+class ClosedUntilTomorrow:
+    def next_session(self):
+        now = time.monotonic()
+        return now + 3600, now + 7200
+
+
+def run_overrunning(policy, **options):
+    missed = []
+    scheduler = TickScheduler(0.01, policy=policy, on_missed=lambda count, overrun: missed.append(count), **options)
+    ticks = []
+
+    def tick(k):
+        ticks.append(k)
+        if k == 0:
+            time.sleep(0.055)
+        if len(ticks) == 3:
+            scheduler.stop()
+
+    scheduler.run(tick)
+    return ticks, missed, scheduler
+
+
+def test_skip_drops_the_deadlines_an_overrun_tick_missed():
+    ticks, missed, scheduler = run_overrunning(SKIP)
+    assert ticks[0] == 0 and ticks[1] >= 5
+    assert scheduler.missed == sum(missed) == ticks[1] - 1
+    assert scheduler.overruns == 1
+
+
+def test_catch_up_runs_missed_deadlines_back_to_back():
+    ticks, missed, scheduler = run_overrunning(CATCH_UP, max_catch_up=10)
+    assert ticks == [0, 1, 2]
+    assert missed == [] and scheduler.missed == 0
+
+
+def test_stop_interrupts_the_wait_for_the_next_session():
+    scheduler = TickScheduler(1.0, hours=ClosedUntilTomorrow())
+    ticks = []
+    runner = threading.Thread(target=scheduler.run, args=(ticks.append,))
+    runner.start()
+    time.sleep(0.05)
+    scheduler.stop()
+    runner.join(timeout=1)
+    assert not runner.is_alive()
+    assert ticks == []
@@ -0,0 +1,170 @@
+"""Firebase path semantics and query bounds, on every local backend"""
+import pytest
+
+from storage import ConflictError, MemoryStorage, SQLiteStorage, child_page, iter_child_pages
+
+
+@pytest.fixture(params=['memory', 'sqlite'])
+def store(request, tmp_path):
+    if request.param == 'memory':
+        yield MemoryStorage()
+    else:
+        store = SQLiteStorage(str(tmp_path / 'store.db'))
+        yield store
+        store.close()
+
+
+def test_nested_set_and_get(store):
+    store.set('a/b/c', 1)
+    store.set('a/d', 'x')
+    assert store.get('a') == {'b': {'c': 1}, 'd': 'x'}
+    assert store.get('a/b/c') == 1
+    assert store.get('/a/b/') == {'c': 1}
+    assert store.get('a/missing') is None
+
+
+def test_set_replaces_the_whole_subtree(store):
+    store.set('a', {'b': 1, 'c': 2})
+    store.set('a', {'d': 3})
+    assert store.get('a') == {'d': 3}
+
+
+def test_writing_below_a_leaf_replaces_it(store):
+    store.set('a', 1)
+    store.set('a/b', 2)
+    assert store.get('a') == {'b': 2}
+
+
+def test_none_deletes_and_empty_parents_disappear(store):
+    store.set('a/b/c', 1)
+    store.set('a/b/c', None)
+    assert store.get('a') is None
+    assert store.get('') in (None, {})
+
+
+def test_empty_containers_are_not_stored(store):
+    store.set('a', {'b': {}, 'c': []})
+    assert store.get('a') is None
+
+
+def test_lists_are_stored_as_index_maps(store):
+    store.set('a', [10, 20, 30])
+    assert store.get('a') == [10, 20, 30]
+    assert store.get('a/1') == 20
+    store.set('b', {'0': 'x', '1': 'y'})
+    assert store.get('b') == ['x', 'y']
+
+
+def test_shallow_get(store):
+    store.set('a', {'b': {'c': 1}, 'd': 2})
+    assert store.get('a', shallow=True) == {'b': True, 'd': 2}
+
+
+def test_update_writes_every_path_and_deletes_nones(store):
+    store.set('a', {'keep': 1, 'drop': 2})
+    store.update('', {'a/drop': None, 'a/new': 3, 'b/c': 4})
+    assert store.get('') == {'a': {'keep': 1, 'new': 3}, 'b': {'c': 4}}
+
+
+def test_update_rejects_overlapping_paths(store):
+    with pytest.raises(ValueError):
+        store.update('', {'a': 1, 'a/b': 2})
+    assert store.get('a') is None
+
+
+def test_push_keys_sort_in_insertion_order(store):
+    keys = [store.push('log', i) for i in range(20)]
+    assert keys == sorted(keys)
+    assert list(store.get('log').values()) == list(range(20))
+
+
+KEYS = [f'{i:02d}' for i in range(1, 11)]
+
+
+@pytest.mark.parametrize('bounds, expected', [
+    ({}, KEYS),
+    ({'start_at': '04'}, KEYS[3:]),
+    ({'end_at': '04'}, KEYS[:4]),
+    ({'start_at': '03', 'end_at': '05'}, ['03', '04', '05']),
+    ({'start_at': '035', 'end_at': '051'}, ['04', '05']),
+    ({'limit_to_first': 3}, KEYS[:3]),
+    ({'limit_to_last': 3}, KEYS[-3:]),
+    ({'limit_to_last': 0}, []),
+    ({'start_at': '04', 'limit_to_first': 2}, ['04', '05']),
+    ({'end_at': '07', 'limit_to_last': 2}, ['06', '07']),
+    ({'start_at': '11'}, []),
+])
+def test_query_bounds(store, bounds, expected):
+    store.set('q', {key: {'n': int(key)} for key in KEYS})
+    result = store.query('q', **bounds)
+    assert list(result) == expected
+    assert all(result[key] == {'n': int(key)} for key in expected)
+
+
+def test_query_orders_keys_that_share_a_prefix(store):
+    # 'bob-2' sorts after 'bob', even though 'bob-2/...' sorts before 'bob/...' as a path
+    store.set('users', {'bob': {'cash': 1}, 'bob-2': {'cash': 2}, 'a b': {'cash': 3}, 'carol': {'cash': 4}})
+    assert list(store.query('users')) == ['a b', 'bob', 'bob-2', 'carol']
+    assert list(store.query('users', start_at='b', limit_to_first=1)) == ['bob']
+    assert list(store.query('users', end_at='bob', limit_to_last=1)) == ['bob']
+    assert list(store.query('users', start_at='bob', end_at='bob-2')) == ['bob', 'bob-2']
+
+
+def test_query_stays_inside_its_path(store):
+    store.set('user/x', 1)
+    store.set('users/y', 2)
+    store.set('usersx/z', 3)
+    assert store.query('users') == {'y': 2}
+    assert store.query('missing') == {}
+    assert store.query('users/y') == {}
+
+
+def test_child_pages_visit_every_child_once(store):
+    names = [f'user{i:03d}' for i in range(25)] + ['user-x', 'user 1']
+    store.set('users', {name: {'cash': 1.0} for name in names})
+    page, cursor = child_page(store, 'users', None, 10)
+    assert list(page) == sorted(names)[:10] and cursor == sorted(names)[10]
+    seen = [name for page in iter_child_pages(store, 'users', 10) for name in page]
+    assert seen == sorted(names)
+
+
+def test_set_if_unchanged_detects_a_concurrent_write(store):
+    store.set('a', {'n': 1})
+    value, etag = store.get_with_etag('a')
+    assert value == {'n': 1}
+    store.set('a/n', 2)
+    assert not store.set_if_unchanged('a', {'n': 10}, etag)
+    assert store.get('a') == {'n': 2}
+    _, etag = store.get_with_etag('a')
+    assert store.set_if_unchanged('a', {'n': 3}, etag)
+    assert store.get('a') == {'n': 3}
+
+
+def test_set_if_unchanged_creates_a_missing_path(store):
+    value, etag = store.get_with_etag('new')
+    assert value is None
+    assert store.set_if_unchanged('new', 1, etag)
+    assert not store.set_if_unchanged('new', 2, etag)
+
+
+def test_transaction_retries_until_its_read_is_current(store):
+    store.set('counter', 0)
+    calls = []
+
+    def increment(value):
+        calls.append(value)
+        if len(calls) == 1:
+            store.set('counter', 5)  # another writer gets in between
+        return value + 1
+
+    assert store.transaction('counter', increment) == (6, 2)
+    assert calls == [0, 5]
+
+
+def test_transaction_gives_up(store):
+    def always_conflicts(value):
+        store.set('a', (value or 0) + 1)
+        return -1
+
+    with pytest.raises(ConflictError):
+        store.transaction('a', always_conflicts, max_attempts=3, base_delay=0)
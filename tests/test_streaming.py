@@ -0,0 +1,34 @@
+"""Price stream fan-out and its per-worker client cap"""
+from streaming import PriceBroadcaster
+
+
+def broadcaster(**options):
+    return PriceBroadcaster(lambda: {'A': {'name': 'A', 'price': 1.5, 'change': 0.0025}}, interval=60, **options)
+
+
+def test_clients_past_the_cap_are_turned_away_until_one_leaves():
+    prices = broadcaster(max_clients=2)
+    first, second = prices.subscribe(), prices.subscribe()
+    assert first is not None and second is not None
+    assert prices.subscribe() is None
+    prices.unsubscribe(first)
+    assert prices.subscribe() is not None
+    assert prices.stats()['clients'] == 2
+    assert prices.stats()['rejected'] == 1
+
+
+def test_polling_clients_get_the_same_prices_as_the_stream():
+    prices = broadcaster(max_clients=0)
+    assert prices.subscribe() is None
+    assert prices.current() == {'A': {'price': 1.5, 'change': '+0.25%'}}
+
+
+def test_a_slow_client_is_resynced_with_one_snapshot():
+    prices = broadcaster(queue_size=2)
+    client = prices.subscribe()
+    prices.snapshot()
+    for i in range(3):
+        prices.publish('prices', {'A': {'price': float(i)}})
+    assert client.queue.qsize() == 1
+    assert client.get(timeout=1)[0] == 'snapshot'
+    assert prices.stats()['resyncs'] == 1
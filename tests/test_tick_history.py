@@ -0,0 +1,44 @@
+"""Tick history segments: range queries and the open-segment LRU"""
+from datetime import datetime, timedelta
+
+from tick_history import TickHistory
+
+
+def noon(day):
+    return int((datetime(2026, 1, 5, 12) + timedelta(days=day)).timestamp() * 1000)
+
+
+def record(root, days):
+    writer = TickHistory(str(root), symbols=['A'], capacity=10)
+    for day in range(days):
+        writer.append(noon(day), [100.0 + day])
+    writer.flush()
+    return writer
+
+
+def test_reader_keeps_at_most_max_open_segments_mapped(tmp_path):
+    record(tmp_path, 6)
+    reader = TickHistory(str(tmp_path), max_open=3)
+    timestamps, prices = reader.query('A', noon(0), noon(5))
+    assert list(prices) == [100.0, 101.0, 102.0, 103.0, 104.0, 105.0]
+    assert list(reader._segments) == ['2026-01-08', '2026-01-09', '2026-01-10']
+
+
+def test_recently_queried_days_are_evicted_last(tmp_path):
+    record(tmp_path, 4)
+    reader = TickHistory(str(tmp_path), max_open=2)
+    reader.query('A', noon(0), noon(0))
+    reader.query('A', noon(1), noon(1))
+    reader.query('A', noon(0), noon(0))
+    reader.query('A', noon(2), noon(2))
+    assert list(reader._segments) == ['2026-01-05', '2026-01-07']
+
+
+def test_writer_keeps_appending_after_its_segment_is_evicted(tmp_path):
+    writer = record(tmp_path, 3)
+    writer.max_open = 1
+    writer.query('A', noon(0), noon(1))
+    assert '2026-01-07' not in writer._segments
+    writer.append(noon(2) + 1000, [200.0])
+    writer.flush()
+    assert list(TickHistory(str(tmp_path)).query('A', noon(2), noon(3))[1]) == [102.0, 200.0]
@@ -0,0 +1,83 @@
+"""Price triggers fired by the levels a tick crosses"""
+import pytest
+
+from triggers import Trigger, TriggerIndex
+
+
+def trigger(id, kind, level, symbol='A', owner='bob'):
+    return Trigger(id, owner, symbol, kind, level, quantity=0 if kind == 'alert' else 1)
+
+
+def fired(fires):
+    return sorted((t.id, price) for t, price in fires)
+
+
+def test_stop_loss_fires_on_a_move_down_to_its_level():
+    index = TriggerIndex()
+    index.add(trigger(1, 'stop_loss', 90))
+    assert index.fire(['A'], [100], [95]) == []
+    assert index.fire(['A'], [95], [120]) == []
+    assert fired(index.fire(['A'], [120], [90])) == [(1, 90)]
+    assert len(index) == 0
+
+
+def test_take_profit_fires_on_a_move_up_to_its_level():
+    index = TriggerIndex()
+    index.add(trigger(1, 'take_profit', 110))
+    assert index.fire(['A'], [100], [50]) == []
+    assert fired(index.fire(['A'], [50], [110])) == [(1, 110)]
+
+
+def test_alerts_fire_on_a_move_through_them_either_way():
+    index = TriggerIndex()
+    index.add(trigger(1, 'alert', 105))
+    index.add(trigger(2, 'alert', 95))
+    assert fired(index.fire(['A'], [100], [106])) == [(1, 106)]
+    assert fired(index.fire(['A'], [106], [94])) == [(2, 94)]
+
+
+def test_a_tick_fires_only_the_levels_between_the_two_prices():
+    index = TriggerIndex()
+    for i, level in enumerate([80, 90, 95, 100]):
+        index.add(trigger(i, 'stop_loss', level))
+    # The starting price itself is excluded on the way down, the new price included
+    assert fired(index.fire(['A'], [100], [90])) == [(1, 90), (2, 90)]
+    assert [t.id for t in index.open_triggers()] == [0, 3]
+
+
+def test_triggers_only_fire_for_their_own_symbol():
+    index = TriggerIndex()
+    index.add(trigger(1, 'stop_loss', 90, symbol='A'))
+    index.add(trigger(2, 'stop_loss', 90, symbol='B'))
+    assert fired(index.fire(['A', 'B'], [100, 100], [80, 100])) == [(1, 80)]
+
+
+def test_a_trigger_already_satisfied_fires_on_the_next_tick():
+    index = TriggerIndex()
+    index.add(trigger(1, 'stop_loss', 90), current_price=85)
+    index.add(trigger(2, 'take_profit', 110), current_price=100)
+    assert fired(index.fire(['A'], [85], [85])) == [(1, 85)]
+    assert index.fire(['A'], [85], [85]) == []
+
+
+def test_cancelled_triggers_never_fire():
+    index = TriggerIndex()
+    index.add(trigger(1, 'stop_loss', 90))
+    index.add(trigger(2, 'stop_loss', 90))
+    index.add(trigger(3, 'alert', 90), current_price=90)
+    assert index.cancel(1, owner='carol') is None
+    assert index.cancel(1).status == 'cancelled'
+    assert index.cancel(3).status == 'cancelled'
+    assert index.cancel(1) is None
+    assert fired(index.fire(['A'], [100], [80])) == [(2, 80)]
+    assert index.fired == 1
+
+
+def test_invalid_triggers_are_rejected():
+    index = TriggerIndex()
+    index.add(trigger(1, 'alert', 10))
+    with pytest.raises(ValueError):
+        index.add(trigger(1, 'alert', 10))
+    for kind, level, quantity in [('trailing', 10, 1), ('alert', 0, 0), ('stop_loss', 10, 0)]:
+        with pytest.raises(ValueError):
+            Trigger(2, 'bob', 'A', kind, level, quantity)
@@ -0,0 +1,34 @@
+"""Console account cache: loading, eviction and refreshes from web trades"""
+from user_cache import UserCache
+
+
+def account(cash, revision):
+    return {'cash': cash, 'portfolio': {}, 'revision': revision}
+
+
+def test_accounts_load_once_and_the_least_recent_is_evicted():
+    loads = []
+    cache = UserCache(lambda name: loads.append(name) or account(1.0, 1), capacity=2)
+    cache.get('a'), cache.get('b'), cache.get('a'), cache.get('c')
+    assert loads == ['a', 'b', 'c']
+    cache.get('b')
+    assert loads == ['a', 'b', 'c', 'b'] and cache.evictions == 2
+
+
+def test_refresh_replaces_a_cached_account_unless_it_is_older():
+    cache = UserCache(lambda name: account(1.0, 1))
+    cache.get('a')
+    cache.refresh('a', account(2.0, 2))
+    assert cache.get('a')['cash'] == 2.0
+    cache.refresh('a', account(1.5, 1))  # a web re-read that lost a race with a console trade
+    assert cache.get('a')['cash'] == 2.0
+
+
+def test_refresh_leaves_uncached_accounts_out_and_drops_deleted_ones():
+    cache = UserCache(lambda name: None if name == 'gone' else account(1.0, 1))
+    cache.refresh('b', account(5.0, 9))
+    assert len(cache) == 0
+    cache.get('a')
+    cache.refresh('a', None)
+    assert len(cache) == 0
+    assert cache.get('gone') is None
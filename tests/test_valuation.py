@@ -0,0 +1,67 @@
+"""Mark-to-market of every account in the holdings matrix"""
+import numpy as np
+import pytest
+
+from valuation import HoldingsMatrix
+
+
+def test_accounts_are_valued_at_the_last_prices_as_soon_as_they_are_set():
+    matrix = HoldingsMatrix(['A', 'B'], [10.0, 20.0])
+    assert matrix.set_account('bob', 5.0, {'A': 2, 'B': 1}) == 45.0
+    assert matrix.value('bob') == 45.0
+    assert matrix.value('nobody') is None
+
+
+def test_revalue_returns_only_the_rows_whose_value_changed():
+    matrix = HoldingsMatrix(['A', 'B'], [10.0, 20.0])
+    matrix.set_account('holds-a', 0.0, {'A': 1})
+    matrix.set_account('holds-b', 0.0, {'B': 1})
+    matrix.set_account('cash-only', 100.0, {})
+    moved = matrix.revalue([11.0, 20.0])
+    assert matrix.accounts(moved) == [('holds-a', 11.0)]
+    assert matrix.revalue([11.0, 20.0]).tolist() == []
+
+
+def test_unknown_symbols_are_ignored_and_rows_are_reused():
+    matrix = HoldingsMatrix(['A'], [2.0], capacity=1)
+    matrix.set_account('a', 1.0, {'A': 1, 'ZZZ': 100})
+    matrix.set_account('b', 0.0, {'A': 3})  # grows past the initial capacity
+    assert (matrix.value('a'), matrix.value('b')) == (3.0, 6.0)
+    matrix.remove('a')
+    matrix.set_account('c', 7.0, {})
+    assert matrix.rows['c'] == 0 and len(matrix) == 2
+    assert matrix.accounts(np.arange(2)) == [('c', 7.0), ('b', 6.0)]
+
+
+def test_add_missing_leaves_existing_accounts_alone():
+    matrix = HoldingsMatrix(['A'], [1.0])
+    matrix.set_account('a', 50.0, {})
+    assert matrix.add_missing({'a': (1.0, {}), 'b': (2.0, {'A': 1})}) == ['b']
+    assert (matrix.value('a'), matrix.value('b')) == (50.0, 3.0)
+
+
+def test_only_values_that_moved_a_cent_are_written_back():
+    matrix = HoldingsMatrix(['A'], [10.0])
+    matrix.set_account('a', 0.0, {'A': 1})
+    matrix.set_account('b', 0.0, {'A': 100})
+    rows = matrix.stale()
+    assert [username for username, _ in matrix.accounts(rows)] == ['a', 'b']
+    matrix.mark_written(rows)
+    matrix.revalue([10.0001])
+    assert [username for username, _ in matrix.accounts(matrix.stale())] == ['b']
+
+
+def test_matches_a_per_account_loop():
+    rng = np.random.default_rng(3)
+    symbols = [f'S{i}' for i in range(20)]
+    matrix = HoldingsMatrix(symbols, rng.uniform(1, 100, 20), capacity=8)
+    accounts = {f'u{i}': (float(rng.uniform(0, 1000)),
+                          {s: int(rng.integers(1, 50)) for s in rng.choice(symbols, 3, replace=False)})
+                for i in range(50)}
+    matrix.add_missing(accounts)
+    prices = rng.uniform(1, 100, 20)
+    matrix.revalue(prices)
+    by_symbol = dict(zip(symbols, prices))
+    for username, (cash, positions) in accounts.items():
+        expected = cash + sum(by_symbol[s] * q for s, q in positions.items())
+        assert matrix.value(username) == pytest.approx(expected)
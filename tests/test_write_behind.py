@@ -0,0 +1,123 @@
+"""Coalescing of pending writes and the write-behind queue in front of storage"""
+import threading
+
+import pytest
+
+from storage import MemoryStorage
+from write_behind import PendingWrites, WriteBehindQueue
+
+
+def test_a_path_keeps_only_its_newest_value():
+    pending = PendingWrites()
+    assert not pending.put('stocks/A', 1)
+    assert pending.put('stocks/A', 2)
+    assert pending.values == {'stocks/A': 2}
+
+
+def test_a_write_below_a_pending_path_is_folded_into_it():
+    pending = PendingWrites()
+    pending.put('users/bob', {'cash': 1, 'portfolio': {'A': 1}})
+    assert pending.put('users/bob/portfolio/B', 2)
+    assert pending.put('users/bob/cash', None)
+    assert pending.values == {'users/bob': {'portfolio': {'A': 1, 'B': 2}}}
+
+
+def test_a_write_above_pending_paths_replaces_them():
+    pending = PendingWrites()
+    pending.put('orders/bob/1/status', 'open')
+    pending.put('orders/bob/2/status', 'open')
+    pending.put('orders/carol/3/status', 'open')
+    assert pending.put('orders/bob', None)
+    assert pending.values == {'orders/bob': None, 'orders/carol/3/status': 'open'}
+    # The replaced paths are forgotten, so writing one again folds into the new parent
+    assert pending.put('orders/bob/1/status', 'filled')
+    assert pending.values['orders/bob'] == {'1': {'status': 'filled'}}
+
+
+def test_no_pending_path_is_below_another():
+    pending = PendingWrites()
+    for path in ['a/b/c', 'a/b/d', 'a/e', 'a/b', 'x/y', 'a/b/c/d', 'x', 'a/e/f']:
+        pending.put(path, 1)
+        paths = sorted(pending.values)
+        assert not any(other.startswith(path + '/') for path in paths for other in paths)
+
+
+def test_paths_are_normalized():
+    pending = PendingWrites()
+    pending.put('/a//b/', 1)
+    assert pending.put('a/b', 2)
+    assert pending.values == {'a/b': 2}
+    with pytest.raises(ValueError):
+        pending.put('/', 1)
+
+
+def test_affecting_finds_writes_above_at_and_below_a_path():
+    pending = PendingWrites()
+    pending.put('stocks/A', {'p': 1, 't': 2})
+    pending.put('orders/bob/1', {'status': 'open'})
+    assert pending.affecting('stocks/A/p') == [((), 1)]
+    assert pending.affecting('stocks/B') == []
+    assert pending.affecting('orders') == [(('bob', '1'), {'status': 'open'})]
+    assert pending.affecting('users') == []
+
+
+def test_reads_see_queued_writes_before_they_are_stored():
+    store = MemoryStorage({'stocks': {'A': {'p': 1}, 'B': {'p': 2}}})
+    release = threading.Event()
+    original_update = store.update
+    store.update = lambda path, values: (release.wait(5), original_update(path, values))
+    writes = WriteBehindQueue(store)
+
+    writes.put({'stocks/A/p': 10, 'stocks/C': {'p': 3}, 'stocks/B': None})
+    assert writes.get('stocks') == {'A': {'p': 10}, 'C': {'p': 3}}
+    assert writes.get('stocks/A/p') == 10
+    assert store.get('stocks/A/p') == 1
+
+    release.set()
+    assert writes.flush(timeout=5)
+    assert store.get('stocks') == {'A': {'p': 10}, 'C': {'p': 3}}
+    assert writes.stats()['depth'] == 0
+
+
+def test_writes_queued_during_a_send_are_coalesced_into_the_next_one():
+    store = MemoryStorage()
+    sent = []
+    started, release = threading.Event(), threading.Event()
+
+    def update(path, values):
+        sent.append(dict(values))
+        started.set()
+        release.wait(5)
+        MemoryStorage.update(store, path, values)
+
+    store.update = update
+    writes = WriteBehindQueue(store)
+    writes.put({'tick': 1})
+    assert started.wait(5)
+    for i in range(2, 6):
+        writes.put({'tick': i})
+    release.set()
+    assert writes.flush(timeout=5)
+    assert sent == [{'tick': 1}, {'tick': 5}]
+    assert writes.coalesced == 3
+
+
+def test_a_failed_send_is_retried_under_newer_writes():
+    store = MemoryStorage()
+    failures = []
+    calls = {'n': 0}
+
+    def update(path, values):
+        calls['n'] += 1
+        if calls['n'] == 1:
+            writes.put({'a/b': 'newer', 'c': 3})
+            raise ConnectionError('storage down')
+        MemoryStorage.update(store, path, values)
+
+    store.update = update
+    writes = WriteBehindQueue(store, base_delay=0.001, on_error=lambda e, attempt, delay: failures.append(attempt))
+    writes.put({'a': {'b': 'older', 'x': 1}})
+    assert writes.flush(timeout=5)
+    assert store.get('') == {'a': {'b': 'newer', 'x': 1}, 'c': 3}
+    assert failures == [1]
+    assert writes.stats()['failures'] == 1
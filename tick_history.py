@@ -0,0 +1,217 @@
+"""Memory-mapped, columnar tick history with one segment per trading day.
+
+Each day lives in its own directory::
+
+    <root>/2026-01-05/meta.json        symbols and capacity
+    <root>/2026-01-05/timestamps.i8    int64 row count, then epoch-ms per tick
+    <root>/2026-01-05/prices.f8        float64 [symbol, tick] matrix
+
+Files are preallocated (sparse) so appends never resize them, and a symbol's
+prices for the day are one contiguous row that range queries slice without
+copying. A day that outgrows its capacity (a short tick interval, catch-up
+ticks) continues in <root>/2026-01-05.1, .2 and so on. The row count is written after the data, so a reader in another
+process (app.py) never sees a half-written tick. Open segments are kept in
+an LRU of at most max_open mappings, so a long-running reader does not hold
+one for every day it has ever been asked about.
+"""
+import json
+import math
+import os
+import threading
+from collections import OrderedDict
+from datetime import datetime, timedelta
+
+import numpy as np
+
+DAY_CAPACITY = 86400  # one tick per second for a whole day
+MAX_OPEN_SEGMENTS = 64  # two months of days, more than one history request spans
+
+
+def day_capacity(interval, session_seconds=86400):
+    """Segment size for one session of ticks every interval seconds"""
+    return max(1, math.ceil(session_seconds / interval))
+
+
+def day_key(timestamp_ms):
+    """Segment name (local date) for an epoch-millisecond timestamp"""
+    return datetime.fromtimestamp(timestamp_ms / 1000).strftime('%Y-%m-%d')
+
+
+class DaySegment:
+    """One day of ticks for a fixed list of symbols"""
+
+    def __init__(self, path, symbols=None, capacity=DAY_CAPACITY):
+        self.path = path
+        meta_path = os.path.join(path, 'meta.json')
+        writable = symbols is not None
+
+        if writable and not os.path.exists(meta_path):
+            os.makedirs(path, exist_ok=True)
+            with open(meta_path, 'w') as f:
+                json.dump({'version': 1, 'symbols': list(symbols), 'capacity': capacity}, f)
+            mode = 'w+'
+        else:
+            mode = 'r+' if writable else 'r'
+
+        with open(meta_path, 'r') as f:
+            meta = json.load(f)
+        if writable and meta['symbols'] != list(symbols):
+            raise ValueError(f"Segment {path} was created for a different symbol list")
+
+        self.symbols = meta['symbols']
+        self.capacity = meta['capacity']
+        self.index = {symbol: i for i, symbol in enumerate(self.symbols)}
+        self.timestamps = np.memmap(os.path.join(path, 'timestamps.i8'), dtype=np.int64,
+                                    mode=mode, shape=(self.capacity + 1,))
+        self.prices = np.memmap(os.path.join(path, 'prices.f8'), dtype=np.float64,
+                                mode=mode, shape=(len(self.symbols), self.capacity))
+
+    def __len__(self):
+        return int(self.timestamps[0])
+
+    def full(self):
+        return len(self) >= self.capacity
+
+    def append(self, timestamp_ms, prices):
+        row = len(self)
+        if row >= self.capacity:
+            raise OverflowError(f"Segment {self.path} is full ({self.capacity} ticks)")
+        self.prices[:, row] = prices
+        self.timestamps[row + 1] = timestamp_ms
+        self.timestamps[0] = row + 1
+
+    def range(self, symbol, start_ms, end_ms):
+        """Views of (timestamps, prices) for start_ms <= t <= end_ms"""
+        count = len(self)
+        timestamps = self.timestamps[1:count + 1]
+        lo = int(np.searchsorted(timestamps, start_ms, side='left'))
+        hi = int(np.searchsorted(timestamps, end_ms, side='right'))
+        return timestamps[lo:hi], self.prices[self.index[symbol], lo:hi]
+
+    def flush(self):
+        self.prices.flush()
+        self.timestamps.flush()
+
+
+class TickHistory:
+    """Appends ticks into daily segments and answers range queries across them.
+
+    Pass ``symbols`` to open for writing (the simulator); omit it for a
+    read-only view (the web app). Segments evicted from the max_open LRU
+    are unmapped once no query result still refers to them; the segment
+    being written is held on to separately and never closed by eviction.
+    """
+
+    def __init__(self, root, symbols=None, capacity=DAY_CAPACITY, max_open=MAX_OPEN_SEGMENTS):
+        self.root = root
+        self.symbols = None if symbols is None else list(symbols)
+        self.capacity = capacity
+        self.max_open = max(1, max_open)
+        self._segments = OrderedDict()
+        self._lock = threading.Lock()
+        self._current = None
+
+    def _segment(self, key, create=False):
+        with self._lock:
+            segment = self._segments.get(key)
+            if segment is not None:
+                self._segments.move_to_end(key)
+                return segment
+            path = os.path.join(self.root, key)
+            if not (create and self.symbols is not None) and not os.path.exists(os.path.join(path, 'meta.json')):
+                return None
+            segment = DaySegment(path, self.symbols, self.capacity)
+            self._segments[key] = segment
+            while len(self._segments) > self.max_open:
+                self._segments.popitem(last=False)
+            return segment
+
+    def _forget(self, key):
+        with self._lock:
+            self._segments.pop(key, None)
+
+    def _parts(self, day):
+        """Segment names for one day, in order: the day, then its overflow parts"""
+        yield day
+        part = 1
+        while True:
+            yield f'{day}.{part}'
+            part += 1
+
+    def append(self, timestamp_ms, prices):
+        """Record one tick of prices (ordered like the symbols list)"""
+        day = day_key(timestamp_ms)
+        if self._current is None or self._current[0] != day or self._current[2].full():
+            # Rotate: release the previous segment's mapping, then find the day's first part with room
+            if self._current is not None:
+                self._current[2].flush()
+                self._forget(self._current[1])
+            for key in self._parts(day):
+                segment = self._segment(key, create=True)
+                if not segment.full():
+                    break
+                self._forget(key)
+            self._current = (day, key, segment)
+        self._current[2].append(timestamp_ms, prices)
+
+    def query(self, symbol, start_ms, end_ms):
+        """Timestamps and prices for one symbol; zero-copy within a single day"""
+        parts = []
+        day = datetime.fromtimestamp(start_ms / 1000).date()
+        last_day = datetime.fromtimestamp(end_ms / 1000).date()
+        while day <= last_day:
+            for key in self._parts(day.strftime('%Y-%m-%d')):
+                segment = self._segment(key)
+                if segment is None:
+                    break
+                if symbol in segment.index:
+                    timestamps, prices = segment.range(symbol, start_ms, end_ms)
+                    if len(timestamps):
+                        parts.append((timestamps, prices))
+            day += timedelta(days=1)
+
+        if not parts:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float64)
+        if len(parts) == 1:
+            return parts[0]
+        return (np.concatenate([p[0] for p in parts]), np.concatenate([p[1] for p in parts]))
+
+    def flush(self):
+        if self._current is not None:
+            self._current[2].flush()
+
+
+def lttb(x, y, threshold):
+    """Largest-Triangle-Three-Buckets: indices of the points to keep"""
+    n = len(x)
+    if threshold >= n or threshold < 3:
+        return np.arange(n)
+
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    every = (n - 2) / (threshold - 2)
+    indices = np.empty(threshold, dtype=np.int64)
+    indices[0], indices[-1] = 0, n - 1
+
+    a = 0
+    for i in range(threshold - 2):
+        start = int(i * every) + 1
+        end = int((i + 1) * every) + 1
+        next_end = min(int((i + 2) * every) + 1, n)
+        avg_x = x[end:next_end].mean()
+        avg_y = y[end:next_end].mean()
+
+        # Keep the point forming the largest triangle with the last kept point
+        # and the average of the next bucket
+        areas = np.abs((x[a] - avg_x) * (y[start:end] - y[a]) - (x[a] - x[start:end]) * (avg_y - y[a]))
+        a = start + int(areas.argmax())
+        indices[i + 1] = a
+    return indices
+
+
+def downsample(timestamps, prices, points):
+    """Reduce a series to at most `points` points with LTTB"""
+    keep = lttb(timestamps, prices, points)
+    if len(keep) == len(timestamps):
+        return timestamps, prices
+    return timestamps[keep], prices[keep]
@@ -0,0 +1,176 @@
+"""Sorted price-level index for stop-loss, take-profit and price-alert triggers.
+
+Each symbol keeps three sorted arrays of trigger levels: levels that fire on
+a move down (stop-loss), on a move up (take-profit) and on a move through
+them in either direction (alerts). A tick from p to q fires exactly the
+levels between the two prices, which two binary searches find and one slice
+delete removes: O(log n + k) per symbol, no matter how many triggers rest.
+"""
+import bisect
+import itertools
+import threading
+from array import array
+
+# Direction of the move that fires each kind of trigger
+KINDS = {'stop_loss': 'down', 'take_profit': 'up', 'alert': 'both'}
+
+
+class Trigger:
+    __slots__ = ('id', 'owner', 'symbol', 'kind', 'level', 'quantity', 'source', 'status')
+
+    def __init__(self, id, owner, symbol, kind, level, quantity=0, source='console'):
+        if kind not in KINDS:
+            raise ValueError(f"kind must be one of {', '.join(KINDS)}")
+        if level <= 0:
+            raise ValueError("level must be positive")
+        if kind != 'alert' and int(quantity) <= 0:
+            raise ValueError("stop-loss and take-profit need a positive quantity")
+        self.id = id
+        self.owner = owner
+        self.symbol = symbol
+        self.kind = kind
+        self.level = float(level)
+        self.quantity = int(quantity)
+        self.source = source
+        self.status = 'open'
+
+    def to_dict(self):
+        return {
+            'symbol': self.symbol, 'kind': self.kind, 'level': self.level,
+            'quantity': self.quantity, 'source': self.source, 'status': self.status,
+        }
+
+
+class LevelIndex:
+    """Parallel sorted arrays of levels and integer trigger keys"""
+
+    def __init__(self):
+        self.levels = array('d')
+        self.keys = array('q')
+
+    def add(self, level, key):
+        i = bisect.bisect_right(self.levels, level)
+        self.levels.insert(i, level)
+        self.keys.insert(i, key)
+
+    def remove(self, level, key):
+        i = bisect.bisect_left(self.levels, level)
+        j = bisect.bisect_right(self.levels, level)
+        for k in range(i, j):
+            if self.keys[k] == key:
+                del self.levels[k]
+                del self.keys[k]
+                return True
+        return False
+
+    def take(self, low, high, low_inclusive, high_inclusive):
+        """Remove and return the keys with levels between low and high"""
+        levels = self.levels
+        i = bisect.bisect_left(levels, low) if low_inclusive else bisect.bisect_right(levels, low)
+        j = bisect.bisect_right(levels, high) if high_inclusive else bisect.bisect_left(levels, high)
+        if i >= j:
+            return []
+        keys = self.keys[i:j].tolist()
+        del levels[i:j]
+        del self.keys[i:j]
+        return keys
+
+    def __len__(self):
+        return len(self.levels)
+
+
+class TriggerIndex:
+    """Every open trigger, indexed by symbol and level (safe to share between threads)"""
+
+    def __init__(self):
+        self._books = {}
+        self._by_key = {}
+        self._key_of = {}
+        self._immediate = []
+        self._next_key = itertools.count()
+        self._lock = threading.Lock()
+        self.fired = 0
+
+    def _book(self, symbol):
+        book = self._books.get(symbol)
+        if book is None:
+            book = self._books[symbol] = {'down': LevelIndex(), 'up': LevelIndex(), 'both': LevelIndex()}
+        return book
+
+    def add(self, trigger, current_price=None):
+        """Register a trigger; one already satisfied by current_price fires next tick"""
+        direction = KINDS[trigger.kind]
+        with self._lock:
+            if trigger.id in self._key_of:
+                raise ValueError(f"Duplicate trigger id {trigger.id}")
+            key = next(self._next_key)
+            self._by_key[key] = trigger
+            self._key_of[trigger.id] = key
+            if current_price is not None and (
+                    (direction == 'down' and current_price <= trigger.level) or
+                    (direction == 'up' and current_price >= trigger.level) or
+                    (direction == 'both' and current_price == trigger.level)):
+                self._immediate.append(key)
+            else:
+                self._book(trigger.symbol)[direction].add(trigger.level, key)
+        return trigger
+
+    def cancel(self, trigger_id, owner=None):
+        """Cancel an open trigger; returns it or None"""
+        with self._lock:
+            key = self._key_of.get(trigger_id)
+            if key is None:
+                return None
+            trigger = self._by_key[key]
+            if owner is not None and trigger.owner != owner:
+                return None
+            if key in self._immediate:
+                self._immediate.remove(key)
+            else:
+                self._books[trigger.symbol][KINDS[trigger.kind]].remove(trigger.level, key)
+            del self._by_key[key]
+            del self._key_of[trigger_id]
+        trigger.status = 'cancelled'
+        return trigger
+
+    def fire(self, symbols, old_prices, new_prices):
+        """Remove and return [(trigger, price)] for every level this tick crossed"""
+        fired_keys = []
+        prices = {}
+        books = self._books
+        with self._lock:
+            for key in self._immediate:
+                fired_keys.append(key)
+            self._immediate = []
+
+            for symbol, old, new in zip(symbols, old_prices, new_prices):
+                book = books.get(symbol)
+                if book is None or old == new:
+                    continue
+                if new < old:
+                    # Moving down fires levels in [new, old)
+                    crossed = book['down'].take(new, old, True, False) + book['both'].take(new, old, True, False)
+                else:
+                    # Moving up fires levels in (old, new]
+                    crossed = book['up'].take(old, new, False, True) + book['both'].take(old, new, False, True)
+                if crossed:
+                    fired_keys.extend(crossed)
+                    prices[symbol] = new
+
+            fired = []
+            for key in fired_keys:
+                trigger = self._by_key.pop(key)
+                del self._key_of[trigger.id]
+                trigger.status = 'fired'
+                fired.append(trigger)
+            self.fired += len(fired)
+
+        lookup = dict(zip(symbols, new_prices)) if len(prices) < len(fired) else prices
+        return [(trigger, lookup.get(trigger.symbol, trigger.level)) for trigger in fired]
+
+    def open_triggers(self, owner=None):
+        with self._lock:
+            return [t for t in self._by_key.values() if owner is None or t.owner == owner]
+
+    def __len__(self):
+        return len(self._by_key)
@@ -0,0 +1,74 @@
+"""Bounded LRU cache of console user accounts, loaded on demand.
+
+Accounts are read from storage the first time they are used and kept while
+they stay hot. Changes are written to storage first, with a conditional
+write, and only then put here, so an entry is never ahead of storage and
+eviction just drops it; memory is bounded by the cache size, not the number
+of users.
+"""
+import threading
+from collections import OrderedDict
+
+
+class UserCache:
+    """username -> account dict, least recently used evicted first (thread safe)"""
+
+    def __init__(self, load, capacity=1024):
+        self.load = load
+        self.capacity = capacity
+        self._entries = OrderedDict()
+        self._lock = threading.RLock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, username):
+        """The account for username, loading it on a miss; None if there is no such user"""
+        with self._lock:
+            account = self._entries.get(username)
+            if account is not None:
+                self._entries.move_to_end(username)
+                self.hits += 1
+                return account
+            self.misses += 1
+            account = self.load(username)
+            if account is not None:
+                self._entries[username] = account
+                self._evict()
+            return account
+
+    def __getitem__(self, username):
+        account = self.get(username)
+        if account is None:
+            raise KeyError(username)
+        return account
+
+    def put(self, username, account):
+        """Insert or replace an account, as stored"""
+        with self._lock:
+            self._entries[username] = account
+            self._entries.move_to_end(username)
+            self._evict()
+
+    def refresh(self, username, account):
+        """Replace a cached account changed elsewhere, unless the cached copy is newer.
+
+        Accounts that aren't cached stay out, so other users' trades never
+        evict the console's. account None drops the entry.
+        """
+        with self._lock:
+            current = self._entries.get(username)
+            if current is None:
+                return
+            if account is None:
+                del self._entries[username]
+            elif account.get('revision', 0) >= current.get('revision', 0):
+                self._entries[username] = account
+
+    def _evict(self):
+        while len(self._entries) > self.capacity:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def __len__(self):
+        return len(self._entries)
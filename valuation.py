@@ -0,0 +1,126 @@
+"""Mark-to-market of every account with one matrix-vector product per tick.
+
+HoldingsMatrix keeps a dense users x symbols array of share counts plus a
+cash vector, updated row by row as accounts trade. Revaluing everyone is then
+``cash + shares @ prices``, and only the rows whose value moved by at least a
+cent since they were last written need to go back to storage. It is the one
+place account values are computed: the leaderboard ranks the values kept here.
+"""
+import threading
+
+import numpy as np
+
+
+class HoldingsMatrix:
+    """Share counts per user and symbol, in the column order of symbols (thread safe)"""
+
+    def __init__(self, symbols, prices=None, capacity=1024, tolerance=0.005):
+        self.symbols = list(symbols)
+        self.columns = {symbol: i for i, symbol in enumerate(self.symbols)}
+        self.tolerance = tolerance
+        self.rows = {}
+        self.usernames = []
+        self._free = []
+        self.prices = np.zeros(len(self.symbols)) if prices is None else np.array(prices, dtype=float)
+        self.cash = np.zeros(capacity)
+        self.shares = np.zeros((capacity, len(self.symbols)))
+        self.values = np.zeros(capacity)
+        self.written = np.full(capacity, np.nan)
+        self._lock = threading.Lock()
+
+    def _grow(self):
+        capacity = len(self.cash) * 2
+        self.cash = np.resize(self.cash, capacity)
+        self.values = np.resize(self.values, capacity)
+        self.written = np.concatenate([self.written, np.full(capacity - len(self.written), np.nan)])
+        shares = np.zeros((capacity, len(self.symbols)))
+        shares[:len(self.shares)] = self.shares
+        self.shares = shares
+
+    def set_account(self, username, cash, holdings):
+        """Write one account's cash and share counts into its row; returns its value at the last prices"""
+        with self._lock:
+            return self._set_account(username, cash, holdings)
+
+    def add_missing(self, accounts):
+        """Add the accounts of {username: (cash, holdings)} that have no row yet; returns their names"""
+        with self._lock:
+            added = []
+            for username, (cash, holdings) in accounts.items():
+                if username not in self.rows:
+                    self._set_account(username, cash, holdings)
+                    added.append(username)
+            return added
+
+    def _set_account(self, username, cash, holdings):
+        row = self.rows.get(username)
+        if row is None:
+            if self._free:
+                row = self._free.pop()
+                self.usernames[row] = username
+            else:
+                row = len(self.usernames)
+                if row == len(self.cash):
+                    self._grow()
+                self.usernames.append(username)
+            self.rows[username] = row
+            self.written[row] = np.nan
+        self.cash[row] = cash
+        self.shares[row] = 0.0
+        for symbol, quantity in holdings.items():
+            column = self.columns.get(symbol)
+            if column is not None:
+                self.shares[row, column] = quantity
+        self.values[row] = cash + self.shares[row] @ self.prices
+        return float(self.values[row])
+
+    def remove(self, username):
+        with self._lock:
+            row = self.rows.pop(username, None)
+            if row is None:
+                return
+            self.usernames[row] = None
+            self.cash[row] = 0.0
+            self.shares[row] = 0.0
+            self.values[row] = 0.0
+            self.written[row] = np.nan
+            self._free.append(row)
+
+    def revalue(self, prices):
+        """Value every row at prices (ordered like symbols); returns the rows whose value changed"""
+        prices = np.array(prices, dtype=float)
+        with self._lock:
+            n = len(self.usernames)
+            values = self.cash[:n] + self.shares[:n] @ prices
+            moved = np.flatnonzero(values != self.values[:n])
+            self.values[:n] = values
+            self.prices = prices
+            return moved
+
+    def value(self, username):
+        """Latest value of one user, or None"""
+        with self._lock:
+            row = self.rows.get(username)
+            if row is None:
+                return None
+            return float(self.values[row])
+
+    def stale(self):
+        """Rows whose value moved since they were last written"""
+        with self._lock:
+            n = len(self.usernames)
+            return np.flatnonzero(~(np.abs(self.values[:n] - self.written[:n]) < self.tolerance))
+
+    def accounts(self, rows):
+        """[(username, value)] for the live accounts among rows"""
+        with self._lock:
+            usernames = self.usernames
+            return [(usernames[row], value) for row, value in zip(rows.tolist(), self.values[rows].tolist())
+                    if usernames[row] is not None]
+
+    def mark_written(self, rows):
+        with self._lock:
+            self.written[rows] = self.values[rows]
+
+    def __len__(self):
+        return len(self.rows)
@@ -0,0 +1,221 @@
+"""Write-behind queue for the simulator's storage writes.
+
+put() takes a multi-path update, as for ``store.update('', ...)``, merges it
+into the pending writes and returns at once; a flusher thread sends
+everything pending as one update. A path written again before it is sent
+keeps only its newest value, so a slow backend costs freshness rather than
+tick time, and the backlog is bounded by the number of distinct paths.
+Failed updates are retried with exponential backoff, with newer writes
+layered on top. get() reads through the queue, so the simulator sees its
+own writes before they are stored.
+"""
+import random
+import threading
+import time
+
+from storage import split_path
+
+
+def _child(node, parts):
+    """The value parts below node, or None"""
+    for part in parts:
+        if not isinstance(node, dict):
+            return None
+        node = node.get(part)
+    return node
+
+
+def _with_child(node, parts, value):
+    """Copy of node with value written parts below it (None deletes)"""
+    node = dict(node) if isinstance(node, dict) else {}
+    if len(parts) == 1:
+        if value is None:
+            node.pop(parts[0], None)
+        else:
+            node[parts[0]] = value
+    else:
+        node[parts[0]] = _with_child(node.get(parts[0]), parts[1:], value)
+    return node
+
+
+class PendingWrites:
+    """Latest value per path, with no path pending below another.
+
+    Firebase rejects an update that writes both a path and one below it, so
+    a write below a pending path is folded into that path's value and a
+    write above pending paths replaces them.
+    """
+
+    def __init__(self):
+        self.values = {}
+        self._below = {}  # path -> pending paths under it
+
+    def __len__(self):
+        return len(self.values)
+
+    def put(self, path, value):
+        """Add one write; True if it replaced or folded into a pending one"""
+        parts = split_path(path)
+        if not parts:
+            raise ValueError("Queued writes need a path below the root")
+        for i in range(1, len(parts)):
+            ancestor = '/'.join(parts[:i])
+            if ancestor in self.values:
+                self.values[ancestor] = _with_child(self.values[ancestor], parts[i:], value)
+                return True
+
+        key = '/'.join(parts)
+        coalesced = key in self.values
+        for descendant in self._below.pop(key, ()):
+            del self.values[descendant]
+            self._unindex(descendant)
+            coalesced = True
+        if key not in self.values:
+            for i in range(1, len(parts)):
+                self._below.setdefault('/'.join(parts[:i]), set()).add(key)
+        self.values[key] = value
+        return coalesced
+
+    def _unindex(self, path):
+        parts = split_path(path)
+        for i in range(1, len(parts)):
+            ancestor = '/'.join(parts[:i])
+            below = self._below.get(ancestor)
+            if below is not None:
+                below.discard(path)
+                if not below:
+                    del self._below[ancestor]
+
+    def affecting(self, path):
+        """The writes that change a read of path: [(parts below path, value)]"""
+        parts = split_path(path)
+        for i in range(len(parts), 0, -1):
+            ancestor = '/'.join(parts[:i])
+            if ancestor in self.values:
+                return [((), _child(self.values[ancestor], parts[i:]))]
+        keys = self.values if not parts else self._below.get('/'.join(parts), ())
+        return [(tuple(split_path(key)[len(parts):]), self.values[key]) for key in keys]
+
+
+class WriteBehindQueue:
+    """Coalescing write-behind buffer in front of a storage backend.
+
+    put() blocks only while max_paths distinct paths are waiting. on_error
+    (error, attempt, delay) and on_recover(attempts) report failed updates
+    and the first success after them.
+    """
+
+    def __init__(self, store, max_paths=100_000, base_delay=0.1, max_delay=30.0, on_error=None, on_recover=None):
+        self.store = store
+        self.max_paths = max_paths
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.on_error = on_error
+        self.on_recover = on_recover
+        self._cond = threading.Condition()
+        self._pending = PendingWrites()
+        self._sending = PendingWrites()
+        self._pending_since = None
+        self._sending_since = None
+        self._queued_seq = 0
+        self._stored_seq = 0
+        self._thread = None
+        self.writes = 0
+        self.coalesced = 0
+        self.flushes = 0
+        self.failures = 0
+        self.last_error = None
+
+    def start(self):
+        """Start the flusher (idempotent; put() calls it)"""
+        with self._cond:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name='write-behind', daemon=True)
+                self._thread.start()
+        return self
+
+    def put(self, updates):
+        """Queue a multi-path update"""
+        if not updates:
+            return
+        if self._thread is None:
+            self.start()
+        with self._cond:
+            self._cond.wait_for(lambda: len(self._pending) < self.max_paths)
+            for path, value in updates.items():
+                if self._pending.put(path, value):
+                    self.coalesced += 1
+            self.writes += len(updates)
+            self._queued_seq += 1
+            if self._pending_since is None:
+                self._pending_since = time.monotonic()
+            self._cond.notify_all()
+
+    def get(self, path=''):
+        """store.get(path) with the writes not yet stored applied"""
+        with self._cond:
+            writes = self._sending.affecting(path) + self._pending.affecting(path)
+        value = self.store.get(path)
+        for parts, write in writes:
+            value = _with_child(value, parts, write) if parts else write
+        return None if value == {} else value
+
+    def flush(self, timeout=None):
+        """Wait until everything queued so far is stored; False on timeout"""
+        with self._cond:
+            target = self._queued_seq
+            return self._cond.wait_for(lambda: self._stored_seq >= target, timeout)
+
+    def _run(self):
+        attempt = 0
+        while True:
+            with self._cond:
+                self._cond.wait_for(lambda: len(self._pending) > 0)
+                batch, self._pending = self._pending, PendingWrites()
+                self._sending, self._sending_since = batch, self._pending_since
+                self._pending_since = None
+                seq = self._queued_seq
+                self._cond.notify_all()
+
+            try:
+                self.store.update('', dict(batch.values))
+            except Exception as e:
+                with self._cond:
+                    # Put the batch back underneath whatever was queued meanwhile
+                    newer, self._pending = self._pending, batch
+                    for path, value in newer.values.items():
+                        self._pending.put(path, value)
+                    self._pending_since = self._sending_since
+                    self._sending, self._sending_since = PendingWrites(), None
+                    self.failures += 1
+                    self.last_error = f"{type(e).__name__}: {e}"
+                attempt += 1
+                delay = min(self.max_delay, self.base_delay * 2 ** (attempt - 1)) * random.uniform(0.5, 1.0)
+                if self.on_error is not None:
+                    self.on_error(e, attempt, delay)
+                time.sleep(delay)
+                continue
+
+            with self._cond:
+                self._sending, self._sending_since = PendingWrites(), None
+                self._stored_seq = seq
+                self.flushes += 1
+                self._cond.notify_all()
+            if attempt and self.on_recover is not None:
+                self.on_recover(attempt)
+            attempt = 0
+
+    def stats(self):
+        """Backlog size and age, and what the flusher has done so far"""
+        with self._cond:
+            since = self._sending_since or self._pending_since
+            depth = len(self._pending) + len(self._sending)
+        return {
+            'depth': depth,
+            'lag_seconds': 0.0 if since is None else round(time.monotonic() - since, 3),
+            'writes': self.writes,
+            'coalesced': self.coalesced,
+            'flushes': self.flushes,
+            'failures': self.failures,
+            'last_error': self.last_error,
+        }